@@ -0,0 +1,261 @@
+"""告警规则引擎：在探针里直接判断“CPU 连续 5 分钟超过 90%”这类条件
+
+每秒拿采集器的快照喂给引擎，规则写成一行文本：
+    cpu > 90 for 5m        每个样本都满足条件，并且已经持续 5 分钟
+    ram > 85 avg 1m        最近 1 分钟的平均值满足条件（还支持 max / min / p50 / p95 / p99 ...）
+每条规则只维护自己需要的滚动聚合，每个样本的开销和窗口长度无关：
+  - 平均值：滑动窗口里的累加和，O(1)
+  - 最大 / 最小值：单调队列，均摊 O(1)
+  - 分位数：对数分桶的直方图（相对误差约 1%），桶号有序维护，查询从近的一端数桶；桶数只和数值范围有关
+状态变化（触发 / 恢复）记成事件放进有界队列，/alerts?since= 按游标拉取；
+也可以订阅推送流（stats_stream 的 /alerts），只推状态有变化的规则。
+"""
+import bisect
+import math
+import re
+import threading
+import time
+from collections import deque
+
+DEFAULT_RULES = ("cpu > 90 for 5m", "ram > 85 avg 1m")
+
+_RULE_RE = re.compile(
+    r'^\s*(?P<metric>[A-Za-z_][\w.]*)\s*(?P<op>>=|<=|>|<)\s*(?P<threshold>-?\d+(?:\.\d+)?)'
+    r'\s+(?P<mode>for|avg|mean|max|min|p\d{1,2})\s+(?P<window>\d+(?:\.\d+)?)\s*(?P<unit>s|m|h)?\s*$'
+)
+_UNITS = {None: 1, 's': 1, 'm': 60, 'h': 3600}
+_OPS = {
+    '>': lambda v, t: v > t,
+    '>=': lambda v, t: v >= t,
+    '<': lambda v, t: v < t,
+    '<=': lambda v, t: v <= t,
+}
+
+
+class QuantileSketch:
+    """对数分桶直方图：add / remove 只动一个桶（桶号用 bisect 保持有序），quantile 只和桶数有关"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.keys = []  # 有样本的桶号，从小到大
+        self.zeros = 0
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        # 桶 (gamma^(k-1), gamma^k] 的中点，相对误差不超过 relative_accuracy
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = self._key(value)
+        n = self.buckets.get(key)
+        if n is None:
+            bisect.insort(self.keys, key)
+            n = 0
+        self.buckets[key] = n + 1
+
+    def remove(self, value):
+        self.count -= 1
+        if value <= 0:
+            self.zeros -= 1
+            return
+        key = self._key(value)
+        left = self.buckets[key] - 1
+        if left:
+            self.buckets[key] = left
+        else:
+            del self.buckets[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def quantile(self, q):
+        """第 int(q * (count - 1)) 小的样本所在的桶；从离它近的一端开始数，p95 / p99 只看最上面几个桶"""
+        if not self.count:
+            return None
+        index = int(q * (self.count - 1))
+        if index < self.zeros:
+            return 0.0
+        if index < self.count // 2:
+            seen = self.zeros
+            for key in self.keys:
+                seen += self.buckets[key]
+                if index < seen:
+                    return self._value(key)
+        else:
+            above = self.count - 1 - index  # 比它大的样本数
+            seen = 0
+            for key in reversed(self.keys):
+                seen += self.buckets[key]
+                if above < seen:
+                    return self._value(key)
+        return 0.0
+
+
+class RollingWindow:
+    """最近 seconds 秒的样本，只维护 kind 需要的那一种聚合"""
+
+    def __init__(self, seconds, kind):
+        self.seconds = seconds
+        self.kind = kind
+        self.samples = deque()
+        self.first = None
+        self._sum = 0.0
+        self._extremes = deque()  # max / min 的单调队列：(t, v)
+        self._sketch = QuantileSketch() if kind.startswith('p') else None
+
+    def add(self, t, value):
+        if self.first is None:
+            self.first = t
+        self.samples.append((t, value))
+        if self.kind in ('avg', 'mean'):
+            self._sum += value
+        elif self.kind in ('max', 'min'):
+            worse = (lambda old: old <= value) if self.kind == 'max' else (lambda old: old >= value)
+            while self._extremes and worse(self._extremes[-1][1]):
+                self._extremes.pop()
+            self._extremes.append((t, value))
+        elif self._sketch is not None:
+            self._sketch.add(value)
+        self._expire(t)
+
+    def _expire(self, now):
+        horizon = now - self.seconds
+        while self.samples and self.samples[0][0] <= horizon:
+            t, value = self.samples.popleft()
+            if self.kind in ('avg', 'mean'):
+                self._sum -= value
+            elif self._sketch is not None:
+                self._sketch.remove(value)
+        while self._extremes and self._extremes[0][0] <= horizon:
+            self._extremes.popleft()
+
+    def full(self, now):
+        """观察时间够不够一个窗口（刚启动时一个样本的平均值说明不了什么）"""
+        return self.first is not None and now - self.first >= self.seconds
+
+    def value(self):
+        if not self.samples:
+            return None
+        if self.kind in ('avg', 'mean'):
+            return self._sum / len(self.samples)
+        if self.kind in ('max', 'min'):
+            return self._extremes[0][1]
+        return self._sketch.quantile(int(self.kind[1:]) / 100)
+
+
+class Rule:
+    def __init__(self, text):
+        m = _RULE_RE.match(text)
+        if not m:
+            raise ValueError(f"bad alert rule: {text!r} (expected e.g. 'cpu > 90 for 5m' or 'ram > 85 avg 1m')")
+        self.text = " ".join(text.split())
+        self.metric = m['metric']
+        self.op = m['op']
+        self.threshold = float(m['threshold'])
+        self.mode = m['mode']
+        self.seconds = float(m['window']) * _UNITS[m['unit']]
+        self.window = None if self.mode == 'for' else RollingWindow(self.seconds, self.mode)
+        self.firing = False
+        self.since = None  # for 模式：条件从什么时候开始一直成立
+        self.value = None
+
+    def observe(self, t, value):
+        """喂一个样本，返回这条规则现在是否处于告警状态（数据不够时保持原状态）"""
+        holds = _OPS[self.op]
+        if self.window is None:
+            self.value = value
+            if holds(value, self.threshold):
+                if self.since is None:
+                    self.since = t
+                return t - self.since >= self.seconds
+            self.since = None
+            return False
+        self.window.add(t, value)
+        self.value = self.window.value()
+        if not self.window.full(t):
+            return self.firing
+        return holds(self.value, self.threshold)
+
+    def state(self):
+        return {"rule": self.text, "metric": self.metric, "state": "firing" if self.firing else "ok",
+                "value": round(self.value, 2) if self.value is not None else None}
+
+
+class AlertEngine:
+    """规则集合 + 事件队列；observe() 在采集线程里调用，其它方法可以在任意线程调用"""
+
+    def __init__(self, rules=DEFAULT_RULES, max_events=500, on_event=None):
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=max_events)
+        self.last_id = 0
+        self.on_event = on_event
+        self.rules = [Rule(text) for text in rules]
+
+    @staticmethod
+    def validate(rules):
+        """解析一遍，格式不对抛 ValueError；返回规范化后的文本"""
+        return [Rule(text).text for text in rules]
+
+    def _event(self, rule, t, **extra):
+        self.last_id += 1
+        event = dict(rule.state(), id=self.last_id, t=t, threshold=rule.threshold, **extra)
+        self.events.append(event)
+        return event
+
+    def set_rules(self, rules, t=None):
+        """换一套规则：文本（规范化后）没变的规则保留窗口和状态；被删掉的正在告警的规则
+        记一条恢复事件（removed=True），按游标拉取 / 订阅推送的客户端不会一直显示它在告警
+        """
+        parsed = [Rule(text) for text in rules]
+        t = time.time() if t is None else t
+        with self._lock:
+            old = {rule.text: rule for rule in self.rules}
+            self.rules = [old.pop(rule.text, rule) for rule in parsed]
+            resolved = []
+            for rule in old.values():
+                if rule.firing:
+                    rule.firing = False
+                    resolved.append(self._event(rule, t, removed=True))
+        if self.on_event:
+            for event in resolved:
+                self.on_event(event)
+        return resolved
+
+    def observe(self, t, snapshot):
+        fired = []
+        with self._lock:
+            for rule in self.rules:
+                value = snapshot.get(rule.metric)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                firing = rule.observe(t, float(value))
+                if firing != rule.firing:
+                    rule.firing = firing
+                    fired.append(self._event(rule, t))
+        if self.on_event:
+            for event in fired:
+                self.on_event(event)
+        return fired
+
+    def active(self):
+        with self._lock:
+            return [rule.state() for rule in self.rules if rule.firing]
+
+    def states(self):
+        """{规则文本: 状态}（给推送流用）"""
+        with self._lock:
+            return {rule.text: rule.state() for rule in self.rules}
+
+    def since(self, event_id=0):
+        with self._lock:
+            events = [e for e in self.events if e["id"] > event_id]
+            return {"cursor": self.last_id, "events": events,
+                    "active": [rule.state() for rule in self.rules if rule.firing],
+                    "rules": [rule.text for rule in self.rules]}
@@ -0,0 +1,1048 @@
+"""性能基准脚本（本地跑，不依赖 Windows / GUI）
+
+用法：
+    python benchmark.py --list
+    python benchmark.py download --size-mb 256
+    python benchmark.py input --events 2000
+    python benchmark.py rate
+    python benchmark.py video --footage desktop.mp4
+    python benchmark.py http --clients 64
+    python benchmark.py screen-startup
+    python benchmark.py startup --budget-ms 400
+    python benchmark.py sysfs --ticks 20000
+    python benchmark.py wire --batch 60
+    python benchmark.py breakdown --cores 64
+    python benchmark.py alerts
+    python benchmark.py fleet --hosts 100
+    python benchmark.py discovery --probes 100000
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS = {}
+
+
+def benchmark(name, *arguments):
+    """注册一个基准：arguments 是 ((flags...), kwargs) 形式的 argparse 参数"""
+    def decorator(func):
+        BENCHMARKS[name] = (func, arguments, (func.__doc__ or "").strip().splitlines()[0])
+        return func
+    return decorator
+
+
+def _serve_flask(app):
+    """后台线程起一个多线程 werkzeug 服务器，返回 (server, port)"""
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_port
+
+
+def _fetch(port, url, headers=None):
+    """下载一个 URL，返回 (状态码, 线上字节数, 耗时秒)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    conn.request('GET', url, headers=headers or {})
+    resp = conn.getresponse()
+    total = 0
+    while True:
+        chunk = resp.read(1024 * 1024)
+        if not chunk:
+            break
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return resp.status, total, elapsed
+
+
+def _write_file(path, size, text=False):
+    line = b"2026-01-01 12:00:00 INFO worker-3 processed request id=123456 status=200 took=12ms\n"
+    block = line * (1024 * 1024 // len(line)) if text else os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block)
+            written += len(block)
+
+
+@benchmark("download",
+           (("--size-mb",), {"type": int, "default": 256, "help": "测试文件大小 (MB)"}))
+def bench_download(args):
+    """/download 吞吐量：旧 send_file vs 断点续传 / gzip / 文件夹 zip"""
+    from flask import Flask, request, send_file
+    import transfers
+
+    app = Flask(__name__)
+
+    @app.route('/legacy')
+    def legacy():
+        return send_file(request.args['path'], as_attachment=True)
+
+    @app.route('/download')
+    def download():
+        path = request.args['path']
+        if os.path.isdir(path):
+            return transfers.stream_zip(path)
+        if not request.headers.get('Range'):
+            encoding = transfers.pick_encoding(path, request.args.get('compress'),
+                                               request.headers.get('Accept-Encoding', ''))
+            if encoding:
+                return transfers.send_compressed(path, encoding)
+        return transfers.send_ranged(path)
+
+    server, port = _serve_flask(app)
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_path = os.path.join(tmp, 'data.bin')
+        log_path = os.path.join(tmp, 'app.log')
+        _write_file(bin_path, size)
+        _write_file(log_path, size // 4, text=True)
+
+        def report(label, status, nbytes, elapsed, raw=None):
+            mbps = (raw or nbytes) / elapsed / 1024 / 1024
+            print(f"  {label:<28} {status}  wire={nbytes / 1024 / 1024:8.1f} MB  "
+                  f"{elapsed * 1000:8.1f} ms  {mbps:8.1f} MB/s")
+
+        print(f"download benchmark, {args.size_mb} MB binary / {args.size_mb // 4} MB text")
+        report("legacy send_file", *_fetch(port, f'/legacy?path={bin_path}'))
+        report("ranged send_file", *_fetch(port, f'/download?path={bin_path}'))
+
+        # 模拟断线后从一半续传
+        etag = '"' + transfers.file_etag(os.stat(bin_path)) + '"'
+        report("resume from 50% (If-Range)", *_fetch(
+            port, f'/download?path={bin_path}', {'Range': f'bytes={size // 2}-', 'If-Range': etag}))
+
+        raw_text = os.path.getsize(log_path)
+        report("text, identity", *_fetch(port, f'/download?path={log_path}'))
+        status, nbytes, elapsed = _fetch(port, f'/download?path={log_path}&compress=gzip',
+                                         {'Accept-Encoding': 'gzip'})
+        report("text, gzip", status, nbytes, elapsed, raw=raw_text)
+        if transfers.zstandard is not None:
+            status, nbytes, elapsed = _fetch(port, f'/download?path={log_path}&compress=zstd',
+                                             {'Accept-Encoding': 'zstd'})
+            report("text, zstd", status, nbytes, elapsed, raw=raw_text)
+        report("folder as zip (stored)", *_fetch(port, f'/download?path={tmp}'))
+    server.shutdown()
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return "n/a"
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return f"p50={pick(0.5):7.3f} ms  p99={pick(0.99):7.3f} ms  max={values[-1] * 1000:7.3f} ms"
+
+
+class _TimestampBackend:
+    """假注入后端：记录每个绝对坐标事件被注入的时刻"""
+
+    def __init__(self):
+        self.injected = {}
+
+    def size(self):
+        return 65535, 65535  # 坐标与事件编号一一对应
+
+    def move_to(self, x, y):
+        self.injected[x] = time.perf_counter()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+
+@benchmark("input",
+           (("--events",), {"type": int, "default": 2000, "help": "每种通道发送的事件数"}),
+           (("--gap-us",), {"type": int, "default": 500, "help": "UDP 事件间隔 (微秒)"}))
+def bench_input(args):
+    """输入延迟：HTTP /mouse vs UDP 二进制通道（从发出事件到注入）"""
+    from flask import Flask, jsonify, request
+    from input_control import InputDispatcher
+    import input_channel
+
+    n = min(args.events, 65535)
+    code = "bench"
+
+    # 1. HTTP：每个事件一次请求 / 响应（keep-alive）
+    backend = _TimestampBackend()
+    dispatcher = InputDispatcher(backend)
+    app = Flask(__name__)
+
+    @app.route('/mouse', methods=['POST'])
+    def mouse():
+        dispatcher.apply(request.json)
+        return jsonify({"status": "success"})
+
+    server, port = _serve_flask(app)
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    sent = {}
+    for i in range(1, n):
+        body = json.dumps({"action": "absolute_move", "x": i / 65535, "y": 0})
+        sent[i] = time.perf_counter()
+        conn.request('POST', '/mouse', body, {'Content-Type': 'application/json'})
+        conn.getresponse().read()
+    conn.close()
+    server.shutdown()
+    lat = [backend.injected[i] - t for i, t in sent.items() if i in backend.injected]
+    print(f"HTTP /mouse   events={len(sent):6d} injected={len(lat):6d}  {_percentiles(lat)}")
+
+    # 2. UDP：发完就走，服务端合并积压的包
+    backend = _TimestampBackend()
+    channel = input_channel.InputChannel(InputDispatcher(backend), lambda: code, '127.0.0.1', 0).bind()
+    threading.Thread(target=channel.serve_forever, daemon=True).start()
+    client = input_channel.InputClient(code, port=channel.port)
+    sent = {}
+    for i in range(1, n):
+        sent[i] = time.perf_counter()
+        client.send(input_channel.OP_ABS_MOVE, i, 0)
+        deadline = sent[i] + args.gap_us / 1e6
+        while time.perf_counter() < deadline:
+            pass
+    time.sleep(0.2)
+    lat = [backend.injected[i] - t for i, t in sent.items() if i in backend.injected]
+    print(f"UDP channel   events={len(sent):6d} injected={len(lat):6d}  {_percentiles(lat)}"
+          f"  (stale moves coalesced: {len(sent) - len(lat)})")
+
+
+class _SimulatedLink:
+    """模拟网络：固定带宽的先进先出链路 + 固定往返时延 + 发送缓冲，时钟是虚拟的"""
+
+    def __init__(self, rtt=0.02, buffer_bytes=1 << 20):
+        self.rtt = rtt
+        self.buffer_bytes = buffer_bytes
+        self.free_at = 0.0
+
+    def writable_at(self, now, bandwidth):
+        """缓冲区里积压超过 buffer_bytes 时 send 会阻塞，返回可以写入的时刻"""
+        return max(now, self.free_at - self.buffer_bytes * 8 / bandwidth)
+
+    def send(self, now, nbytes, bandwidth):
+        """返回这一帧被客户端收到的时刻"""
+        self.free_at = max(now, self.free_at) + nbytes * 8 / bandwidth
+        return self.free_at + self.rtt / 2
+
+
+def _frame_bytes(quality, width):
+    # 桌面画面 JPEG 大约每像素 0.07 ~ 0.12 字节，质量越高越大
+    return width * width * 9 / 16 * (0.01 + quality / 800)
+
+
+@benchmark("rate",
+           (("--phase",), {"type": float, "default": 20.0, "help": "每种带宽持续的秒数（虚拟时间）"}))
+def bench_rate(args):
+    """自适应码率：模拟带宽 100 → 5 → 1.5 → 50 Mbit/s，看延迟和档位怎么变"""
+    from collections import deque
+    from screen_rate import RateController
+
+    phases = (100e6, 5e6, 1.5e6, 50e6)
+    for adaptive in (False, True):
+        now = [0.0]
+        rate = RateController(clock=lambda: now[0])
+        link = _SimulatedLink()
+        acks = deque()
+        print(f"{'adaptive' if adaptive else 'fixed (old)':<12}")
+        for i, bandwidth in enumerate(phases):
+            end = (i + 1) * args.phase
+            latencies, frames, levels = [], 0, set()
+            t = now[0]
+            while t < end:
+                # 先处理这一刻之前到达的 ack
+                while acks and acks[0] <= t:
+                    now[0] = acks.popleft()
+                    rate.on_ack()
+                now[0] = t
+                if adaptive and not rate.can_send():
+                    # 窗口满了：等下一个 ack（槽位里的帧会被更新的覆盖）
+                    t = acks[0] if acks else t + rate.interval
+                    continue
+                quality, width = rate.profile()
+                written = link.writable_at(t, bandwidth)
+                received = link.send(written, _frame_bytes(quality, width), bandwidth)
+                acks.append(received + link.rtt / 2)
+                rate.on_sent(written - t)
+                if adaptive:
+                    rate.update()
+                latencies.append(received - t)
+                frames += 1
+                levels.add(rate.level)
+                t = max(written, t + rate.interval)
+            now[0] = t
+            print(f"  {bandwidth / 1e6:6.1f} Mbit/s  fps={frames / args.phase:5.1f}  "
+                  f"levels={sorted(levels)}  latency {_percentiles(latencies)}")
+
+
+def _desktop_frames(count, width=1920, height=1080):
+    """合成的桌面画面：静止背景 + 一个滚动的文本窗口 + 移动的光标 + 偶尔拖动窗口"""
+    import cv2
+    import numpy as np
+
+    base = np.zeros((height, width, 4), np.uint8)
+    base[:] = (90, 60, 30, 255)
+    base[height - 48:] = (40, 40, 40, 255)  # 任务栏
+    lines = [f"{i:04d}  def handler(request): return jsonify(status=ok, took={i % 97}ms)" for i in range(400)]
+    for i in range(count):
+        frame = base.copy()
+        x = 200 + (i // 90 % 2) * (i % 90) * 4  # 每 3 秒拖一次窗口
+        y = 120
+        cv2.rectangle(frame, (x, y), (x + 1100, y + 700), (250, 250, 250, 255), -1)
+        cv2.rectangle(frame, (x, y), (x + 1100, y + 32), (200, 120, 40, 255), -1)
+        top = i // 3  # 文本每 3 帧滚动一行
+        for row in range(24):
+            cv2.putText(frame, lines[(top + row) % len(lines)], (x + 16, y + 60 + row * 27),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (30, 30, 30, 255), 1, cv2.LINE_AA)
+        cx, cy = 600 + int(300 * np.cos(i / 20)), 500 + int(200 * np.sin(i / 20))
+        cv2.circle(frame, (cx, cy), 8, (0, 0, 0, 255), -1)
+        yield frame
+
+
+def _footage_frames(path, count):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    for _ in range(count):
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield frame
+    capture.release()
+
+
+@benchmark("video",
+           (("--seconds",), {"type": float, "default": 10.0, "help": "画面长度（秒，按 --fps 折算帧数）"}),
+           (("--fps",), {"type": int, "default": 30, "help": "画面帧率"}),
+           (("--footage",), {"help": "录好的桌面视频文件（默认用合成画面）"}))
+def bench_video(args):
+    """投屏编码：JPEG / 分块 / H.264 / VP8 的每秒字节数和每帧编码耗时"""
+    import screen_video
+    from screen_pipeline import make_prepare
+    from screen_tiles import JpegEncoder, TileEncoder
+
+    count = int(args.seconds * args.fps)
+    source = _footage_frames(args.footage, count) if args.footage else _desktop_frames(count)
+    prepare = make_prepare(1920)
+    frames = [prepare(frame) for frame in source]
+    duration = len(frames) / args.fps
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]} @ {args.fps} fps "
+          f"({'footage' if args.footage else 'synthetic desktop'})")
+
+    # 虚拟时钟：按帧率推进，关键帧间隔和时间戳与真实播放一致
+    tick = [0.0]
+    clock = lambda: tick[0]
+    encoders = [("jpeg q88 (current)", lambda: JpegEncoder(88)),
+                ("tiles q88", lambda: TileEncoder(quality=88, clock=clock))]
+    for mode in screen_video.CODECS:
+        if screen_video.available(mode):
+            encoders.append((f"{mode} (q88)", lambda mode=mode: screen_video.VideoEncoder(
+                mode, quality=88, fps=args.fps, clock=clock)))
+        else:
+            print(f"  {mode:<20} skipped (pip install av)")
+
+    for label, factory in encoders:
+        tick[0] = 0.0
+        encoder = factory()
+        total, times = 0, []
+        for i, frame in enumerate(frames):
+            tick[0] = i / args.fps
+            start = time.perf_counter()
+            data = encoder.encode(frame)
+            times.append(time.perf_counter() - start)
+            total += len(data) if data else 0
+        print(f"  {label:<20} {total / duration / 1024:9.1f} KB/s  ({total * 8 / duration / 1e6:6.2f} Mbit/s)  "
+              f"encode {sum(times) / len(times) * 1000:6.2f} ms/frame  {_percentiles(times)}")
+
+
+def _load_test_app(download_path):
+    """和 main_server 路由形状相同的小应用：轻量 JSON、带一点阻塞的查询、POST、大文件"""
+    from flask import Flask, jsonify, request, send_file
+
+    app = Flask(__name__)
+    stats = {"cpu": 12.5, "ram": 48.1, "disk": 71.0, "gpu": 3, "gpu_temp": 45, "net_up": 12.0, "net_down": 340.5}
+
+    @app.route('/status')
+    def status():
+        return jsonify(stats)
+
+    @app.route('/processes')
+    def processes():
+        time.sleep(0.005)  # psutil 查询之类的阻塞调用
+        return jsonify([{"pid": i, "name": f"proc{i}", "cpu": 0.1, "memory": 1.0} for i in range(50)])
+
+    @app.route('/mouse', methods=['POST'])
+    def mouse():
+        request.get_json()
+        return jsonify({"status": "success"})
+
+    @app.route('/download')
+    def download():
+        return send_file(download_path)
+
+    return app
+
+
+def _load_test_server(kind, download_path, ports):
+    """子进程入口：压测时服务端和压测客户端不抢同一个 GIL"""
+    app = _load_test_app(download_path)
+    if kind == 'werkzeug':
+        from werkzeug.serving import make_server
+        import logging
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        ports.put(server.server_port)
+        server.serve_forever()
+    else:
+        import asyncio
+        import wsgi_server
+
+        async def serve():
+            server = await wsgi_server.WSGIServer(app, '127.0.0.1', 0).start()
+            ports.put(server.port)
+            await server.serve()
+        asyncio.run(serve())
+
+
+async def _load_client(port, requests, deadline, latencies):
+    """一个客户端，按顺序循环发 requests 里的请求直到 deadline；
+    服务端回 Connection: close 时像真实客户端一样重新连接（重连耗时算进下一个请求）
+    """
+    import asyncio
+
+    reader = writer = None
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body = requests[i % len(requests)]
+            i += 1
+            head = f"{method} {path} HTTP/1.1\r\nHost: bench\r\n"
+            if body:
+                head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            start = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write((head + "\r\n").encode('latin-1') + body)
+            response = await reader.readuntil(b"\r\n\r\n")
+            length, close = 0, False
+            for line in response.lower().split(b"\r\n"):
+                if line.startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+                elif line.startswith(b"connection:"):
+                    close = b"close" in line
+            while length:
+                length -= len(await reader.read(min(length, 1024 * 1024)))
+            latencies.setdefault(path, []).append(time.perf_counter() - start)
+            if close:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+@benchmark("http",
+           (("--clients",), {"type": int, "default": 64, "help": "并发的 API 连接数"}),
+           (("--downloads",), {"type": int, "default": 4, "help": "同时进行的大文件下载数"}),
+           (("--seconds",), {"type": float, "default": 5.0, "help": "每种服务器压测时长"}))
+def bench_http(args):
+    """HTTP 压测：Werkzeug 开发服务器 vs asyncio + 有界线程池（req/s 和 p99）"""
+    import asyncio
+    import multiprocessing
+
+    api = [('GET', '/status', b''), ('POST', '/mouse', b'{"action":"move","dx":1,"dy":1}'),
+           ('GET', '/status', b''), ('GET', '/processes', b'')]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.bin')
+        _write_file(path, 64 * 1024 * 1024)
+        for kind in ('werkzeug', 'async'):
+            ports = multiprocessing.Queue()
+            proc = multiprocessing.Process(target=_load_test_server, args=(kind, path, ports), daemon=True)
+            proc.start()
+            port = ports.get(timeout=30)
+
+            async def run():
+                latencies = {}
+                deadline = time.perf_counter() + args.seconds
+                await asyncio.gather(
+                    *(_load_client(port, api, deadline, latencies) for _ in range(args.clients)),
+                    *(_load_client(port, [('GET', '/download', b'')], deadline, latencies)
+                      for _ in range(args.downloads)))
+                return latencies
+
+            latencies = asyncio.run(run())
+            proc.terminate()
+            proc.join()
+            done = sum(len(v) for k, v in latencies.items() if k != '/download')
+            print(f"{kind:<9} {done / args.seconds:8.1f} req/s  "
+                  f"({args.clients} clients + {args.downloads} downloads)")
+            for key in ('/status', '/mouse', '/processes', '/download'):
+                print(f"  {key:<11} n={len(latencies.get(key, [])):6d}  {_percentiles(latencies.get(key, []))}")
+
+
+_SCREEN_STARTUP_PROBE = r"""
+import os, sys, time, json, asyncio, threading
+import psutil
+rss = lambda: psutil.Process().memory_info().rss
+base = rss()
+start = time.perf_counter()
+if sys.argv[1] == 'eager':
+    import mss, numpy, cv2, screen_tiles, screen_pipeline  # 旧版 screen_server 顶部的导入
+import screen_server
+ready = threading.Event()
+
+async def serve():
+    import websockets
+    async with websockets.serve(screen_server.stream_screen, '127.0.0.1', 0):
+        ready.set()
+        await asyncio.Future()
+
+threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+ready.wait()
+listening = time.perf_counter() - start
+idle = rss()
+start = time.perf_counter()
+import mss, numpy, cv2, screen_tiles, screen_pipeline, screen_video  # 第一个观看者连上时
+first_viewer = time.perf_counter() - start
+print(json.dumps({"interpreter": base, "listening": listening, "idle": idle,
+                  "first_viewer": first_viewer, "viewing": rss()}))
+"""
+
+
+@benchmark("screen-startup",
+           (("--runs",), {"type": int, "default": 5, "help": "重复次数，取中位数"}))
+def bench_screen_startup(args):
+    """投屏引擎启动：独立进程 + 顶部导入 vs 进程内懒加载（耗时和内存）"""
+    import statistics
+    import subprocess
+
+    def probe(mode):
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, '-c', _SCREEN_STARTUP_PROBE, mode], capture_output=True,
+                                 text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        return {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+    mb = lambda n: f"{n / 1024 / 1024:6.1f} MB"
+    old, new = probe('eager'), probe('lazy')
+    print("old: screen_server.py as a second process, everything imported up front")
+    print(f"  second interpreter       {mb(old['interpreter'])}")
+    print(f"  ready to accept viewers  {old['listening'] * 1000:7.1f} ms after imports start, "
+          f"process RSS {mb(old['idle'])}  (all of it extra)")
+    print("new: in-process on the shared loop, heavy imports deferred to the first viewer")
+    print(f"  ready to accept viewers  {new['listening'] * 1000:7.1f} ms, "
+          f"RSS added while nobody watches {mb(new['idle'] - new['interpreter'])}")
+    print(f"  first viewer connects    {new['first_viewer'] * 1000:7.1f} ms of imports, "
+          f"RSS added {mb(new['viewing'] - new['interpreter'])}")
+
+
+# 这些只在第一次用到时才导入（界面、托盘、键鼠注入、GPUtil / WMI、投屏采集编码），出现在 import main_server 里就算回归
+_DEFERRED_MODULES = ('monitor_ui', 'customtkinter', 'PIL', 'pystray', 'pyautogui', 'pyperclip',
+                     'GPUtil', 'wmi', 'mss', 'numpy', 'cv2', 'av')
+
+_STATUS_PROBE = r"""
+import asyncio, json, socket, sys, threading, time, urllib.request
+start = time.perf_counter()
+import main_server
+imported = time.perf_counter() - start
+with socket.socket() as s:
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+main_server.stats_stream.STREAM_PORT = 0
+threading.Thread(target=lambda: asyncio.run(main_server.serve_async(port, lambda code: True, screen=False)),
+                 daemon=True).start()
+request = urllib.request.Request(f"http://127.0.0.1:{port}/status",
+                                 headers={"X-Secret-Code": main_server.SECRET_CODE})
+while True:
+    try:
+        urllib.request.urlopen(request, timeout=1).read()
+        break
+    except OSError:
+        time.sleep(0.005)
+status = time.perf_counter() - start
+# 再把采集器跑起来，等每个采集器都至少跑完一轮：运行中的探针也不该加载延迟导入的库
+threading.Thread(target=main_server.monitor_loop, daemon=True).start()
+deadline = time.monotonic() + 15
+while time.monotonic() < deadline:
+    health = main_server.SCHEDULER.health()
+    if health and all(c["runs"] for c in health.values()):
+        break
+    time.sleep(0.05)
+print(json.dumps({"imported": imported, "status": status, "collectors": len(main_server.SCHEDULER.health()),
+                  "loaded": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+def _import_times(code, cwd):
+    """python -X importtime 跑一段代码，返回 [(深度, 模块, 累计微秒)]（按导入完成的先后）"""
+    import subprocess
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True,
+                         text=True, cwd=cwd)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), int(cumulative)))
+    return out.returncode, rows, out.stderr
+
+
+@benchmark("startup",
+           (("--runs",), {"type": int, "default": 5, "help": "重复次数，取中位数"}),
+           (("--top",), {"type": int, "default": 10, "help": "列出最慢的几个直接导入"}),
+           (("--budget-ms",), {"type": float, "default": None, "help": "import main_server 超过这个时间就返回非 0"}))
+def bench_startup(args):
+    """冷启动：-X importtime 统计 import main_server，检查重库有没有被放回顶部（导入时和采集器跑起来之后），
+    测 /status 多久能应答"""
+    import statistics
+    import subprocess
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    totals, children = [], {}
+    for _ in range(args.runs):
+        code, rows, stderr = _import_times("import main_server", cwd)
+        if code != 0:
+            print(stderr.strip().splitlines()[-1] if stderr.strip() else "import main_server failed")
+            return 1
+        end = next(i for i, (depth, name, _) in enumerate(rows) if depth == 0 and name == 'main_server')
+        totals.append(rows[end][2])
+        # main_server 的直接导入：紧挨在它前面、上一个顶层模块之后、深度为 1 的那些
+        begin = max((i for i in range(end) if rows[i][0] == 0), default=-1) + 1
+        for depth, name, us in rows[begin:end]:
+            if depth == 1:
+                children.setdefault(name, []).append(us)
+    loaded = {name for _, name, _ in rows}
+
+    total_ms = statistics.median(totals) / 1000
+    print(f"import main_server        {total_ms:7.1f} ms (median of {args.runs})")
+    print("slowest direct imports:")
+    slowest = sorted(children.items(), key=lambda kv: -statistics.median(kv[1]))[:args.top]
+    for name, values in slowest:
+        print(f"  {name:<22} {statistics.median(values) / 1000:7.1f} ms")
+
+    status, running = [], set()
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, '-c', _STATUS_PROBE, *_DEFERRED_MODULES], capture_output=True,
+                             text=True, check=True, cwd=cwd)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        status.append(result['status'])
+        running.update(result['loaded'])
+    print(f"process start -> /status  {statistics.median(status) * 1000:7.1f} ms (interpreter startup not included)")
+    print(f"running agent, {result['collectors']} collectors started: "
+          + (", ".join(sorted(running)) + " IMPORTED  <- regression" if running else "no deferred library loaded"))
+
+    # 延迟加载的库如果放回顶部要多花多少（只统计本机装了的）
+    print("deferred until first use:")
+    leaked = []
+    for module in _DEFERRED_MODULES:
+        if module in loaded:
+            leaked.append(module)
+            print(f"  {module:<22} IMPORTED at startup  <- regression")
+            continue
+        code, rows, _ = _import_times(f"import {module}", cwd)
+        cost = next((us for depth, name, us in rows if depth == 0 and name == module), None)
+        print(f"  {module:<22} " + (f"{cost / 1000:7.1f} ms saved" if code == 0 and cost else "   unavailable here"))
+
+    failed = bool(leaked or running)
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"import main_server took {total_ms:.1f} ms, budget is {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+
+def _fake_sysfs(root):
+    """造一个假的 /proc + /sys：一块 AMD 卡（占用 37%、温度 54.5℃）加一个显示接口目录"""
+    files = {
+        'proc/cpuinfo': "processor\t: 0\nmodel name\t: AMD Ryzen 7 5800X 8-Core Processor\n\n"
+                        "processor\t: 1\nmodel name\t: AMD Ryzen 7 5800X 8-Core Processor\n",
+        'proc/meminfo': "MemTotal:       16384000 kB\nMemFree:         2048000 kB\n"
+                        "MemAvailable:    4096000 kB\nCached:          1024000 kB\n",
+        'sys/class/drm/card0/device/vendor': "0x1002\n",
+        'sys/class/drm/card0/device/uevent': "DRIVER=amdgpu\nPCI_ID=1002:73BF\n",
+        'sys/class/drm/card0/device/gpu_busy_percent': "37\n",
+        'sys/class/drm/card0/device/hwmon/hwmon3/temp1_input': "54500\n",
+        'sys/class/drm/card0-HDMI-A-1/status': "connected\n",
+    }
+    for rel, text in files.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+@benchmark("sysfs",
+           (("--ticks",), {"type": int, "default": 20000, "help": "采样次数"}))
+def bench_sysfs(args):
+    """Linux 探针：每轮重新 open 文件 vs 常开 fd + os.pread（假 sysfs 目录树 + 本机 /proc/meminfo）"""
+    from linux_probe import LinuxProbe
+
+    with tempfile.TemporaryDirectory() as root:
+        _fake_sysfs(root)
+        probe = LinuxProbe(root)
+        assert probe.cpu_model() == "AMD Ryzen 7 5800X 8-Core Processor"
+        assert probe.gpu_names() == ["AMD (amdgpu)"]
+        assert probe.gpu_load() == (37.0, 54.5)
+        assert probe.ram_percent() == 75.0
+        # 文件内容变了，常开的 fd 也要读到新值
+        with open(os.path.join(root, 'sys/class/drm/card0/device/gpu_busy_percent'), 'w') as f:
+            f.write("81\n")
+        assert probe.gpu_load() == (81.0, 54.5)
+        print("fake sysfs tree: cpu / gpu name / gpu load / gpu temp / ram all parsed correctly")
+
+        paths = [os.path.join(root, 'proc/meminfo'),
+                 os.path.join(root, 'sys/class/drm/card0/device/gpu_busy_percent'),
+                 os.path.join(root, 'sys/class/drm/card0/device/hwmon/hwmon3/temp1_input')]
+
+        def reopen():
+            for path in paths:
+                with open(path, 'rb') as f:
+                    f.read()
+
+        def pread():
+            probe.ram_percent()
+            probe.gpu_load()
+
+        def raw_pread():
+            for f in [probe._meminfo, probe.gpus[0].busy, probe.gpus[0].temp]:
+                f.read()
+
+        for name, func in (("open + read + close per tick", reopen),
+                           ("pread on kept fds (raw)", raw_pread),
+                           ("pread + parse (probe tick)", pread)):
+            start = time.perf_counter()
+            for _ in range(args.ticks):
+                func()
+            print(f"  {name:<30} {(time.perf_counter() - start) / args.ticks * 1e6:7.1f} us/tick")
+        probe.close()
+
+    if os.path.exists('/proc/meminfo'):
+        import psutil
+        probe = LinuxProbe('/')
+        for name, func in (("psutil.virtual_memory()", lambda: psutil.virtual_memory().percent),
+                           ("LinuxProbe.ram_percent()", probe.ram_percent)):
+            start = time.perf_counter()
+            for _ in range(args.ticks):
+                func()
+            print(f"  /proc/meminfo {name:<26} {(time.perf_counter() - start) / args.ticks * 1e6:7.1f} us")
+        probe.close()
+
+
+
+def _stats_samples(count, seed=7):
+    """一串像真的一样的 /status 样本：CPU / 网速抖动，内存 / 磁盘缓慢变化"""
+    import random
+    rng = random.Random(seed)
+    t, cpu, ram, up, down = time.time(), 12.0, 41.0, 20000.0, 150000.0
+    samples = []
+    for i in range(count):
+        cpu = min(100.0, max(0.0, cpu + rng.gauss(0, 4)))
+        ram = min(100.0, max(0.0, ram + rng.gauss(0, 0.1)))
+        up = max(0.0, up * rng.uniform(0.7, 1.4))
+        down = max(0.0, down * rng.uniform(0.6, 1.6))
+        samples.append((t + i, {"cpu": round(cpu, 1), "ram": round(ram, 1), "disk": 63.2,
+                                "gpu": round(rng.uniform(0, 30), 1), "gpu_temp": 48 + i % 3,
+                                "net_up": round(up, 1), "net_down": round(down, 1)}))
+    return samples
+
+
+@benchmark("wire",
+           (("--batch",), {"type": int, "default": 60, "help": "一批打包多少个样本"}),
+           (("--repeat",), {"type": int, "default": 2000, "help": "每种编码重复次数"}))
+def bench_wire(args):
+    """/status 的 JSON（jsonify）vs 紧凑列式格式：每个样本的字节数和序列化耗时"""
+    import wire_format
+    from flask import Flask, jsonify
+
+    samples = _stats_samples(args.batch)
+    ts = [t for t, _ in samples]
+    columns = {name: [snap[name] for _, snap in samples] for name in wire_format.FIELDS}
+    batch_json = {"resolution": 1, "cursor": ts[-1], "t": ts, "metrics": columns}
+
+    # 编码结果要能原样解回来
+    decoded_ts, decoded = wire_format.decode(wire_format.encode(ts, columns))
+    assert decoded == columns and [round(t, 3) for t in decoded_ts] == [round(t, 3) for t in ts]
+
+    app = Flask(__name__)
+    snapshot = samples[-1][1]
+    cases = (
+        ("jsonify, one sample", 1, lambda: jsonify(snapshot).get_data()),
+        ("jsonify, columnar batch", args.batch, lambda: jsonify(batch_json).get_data()),
+        ("wire, one sample", 1, lambda: wire_format.encode_snapshot(ts[-1], snapshot)),
+        ("wire, columnar batch", args.batch, lambda: wire_format.encode(ts, columns)),
+    )
+    print(f"{'':<26}{'bytes/sample':>14}{'us/sample':>12}")
+    with app.app_context():
+        for name, n, func in cases:
+            size = len(func())
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                func()
+            per_sample = (time.perf_counter() - start) / args.repeat / n * 1e6
+            print(f"{name:<26}{size / n:>14.1f}{per_sample:>12.2f}")
+
+
+
+def _fake_counters(cores, nics, disks, partitions):
+    """psutil 同样形状的假计数器：每次调用都在上一轮基础上往前走"""
+    import random
+    from collections import namedtuple
+    cpu_t = namedtuple('scputimes', 'user nice system idle iowait irq softirq steal guest guest_nice')
+    net_t = namedtuple('snetio', 'bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout')
+    disk_t = namedtuple('sdiskio', 'read_count write_count read_bytes write_bytes read_time write_time')
+    part_t = namedtuple('sdiskpart', 'device mountpoint fstype opts')
+    usage_t = namedtuple('sdiskusage', 'total used free percent')
+    rng = random.Random(3)
+    state = {"tick": 0}
+
+    def cpu_times():
+        state["tick"] += 1
+        n = state["tick"]
+        return [cpu_t(n * (1 + i % 7), n, n * 2, n * (90 - i % 50), n, 0, 0, 0, 0, 0) for i in range(cores)]
+
+    def net_counters():
+        n = state["tick"]
+        return {f"eth{i}": net_t(n * 1000 * (i + 1), n * 5000 * (i + 1), n, n, 0, 0, 0, 0) for i in range(nics)}
+
+    def disk_counters():
+        n = state["tick"]
+        return {f"nvme{i}n1": disk_t(n, n, n * 4096 * (i + 1), n * 8192, n, n) for i in range(disks)}
+
+    parts = [part_t(f"/dev/sd{chr(97 + i)}1", f"/mnt/d{i}", "ext4", "rw") for i in range(partitions)]
+    usage = lambda mount: usage_t(10 ** 12, rng.randrange(10 ** 12), 0, 42.0)
+    return cpu_times, net_counters, disk_counters, (lambda: parts), usage
+
+
+@benchmark("breakdown",
+           (("--cores",), {"type": int, "default": 64}),
+           (("--nics",), {"type": int, "default": 8}),
+           (("--disks",), {"type": int, "default": 16}),
+           (("--partitions",), {"type": int, "default": 12}),
+           (("--ticks",), {"type": int, "default": 500}))
+def bench_breakdown(args):
+    """分项指标每轮的计算耗时（假的多核计数器 + 本机 psutil）"""
+    import statistics
+    from breakdown import Breakdown
+
+    def run(func):
+        func()  # 第一轮只建立基准
+        costs = []
+        for _ in range(args.ticks):
+            start = time.perf_counter()
+            func()
+            costs.append(time.perf_counter() - start)
+        costs.sort()
+        return statistics.median(costs) * 1000, costs[int(len(costs) * 0.99) - 1] * 1000
+
+    clock = iter(range(1, 10 ** 9)).__next__  # 每调用一次过一秒
+    fake = Breakdown(*_fake_counters(args.cores, args.nics, args.disks, args.partitions), clock=clock)
+    sample = (fake.io(), fake.io())[-1]
+    assert len(sample["cpus"]) == args.cores and len(sample["nics"]) == args.nics
+    print(f"synthetic host: {args.cores} cores, {args.nics} NICs, {args.disks} disks, {args.partitions} partitions")
+    median, p99 = run(fake.io)
+    print(f"  per-second tick (cores + NICs + disks)  median {median:6.3f} ms  p99 {p99:6.3f} ms  (budget 5 ms)")
+    median, p99 = run(fake.partitions)
+    print(f"  partition tick (every 5 s)              median {median:6.3f} ms  p99 {p99:6.3f} ms")
+
+    import psutil
+    real = Breakdown()
+    print(f"this machine: {psutil.cpu_count()} cores, psutil counters included")
+    median, p99 = run(real.io)
+    print(f"  per-second tick                         median {median:6.3f} ms  p99 {p99:6.3f} ms")
+    median, p99 = run(real.partitions)
+    print(f"  partition tick                          median {median:6.3f} ms  p99 {p99:6.3f} ms")
+
+
+
+@benchmark("alerts",
+           (("--samples",), {"type": int, "default": 20000}))
+def bench_alerts(args):
+    """告警规则：每个样本的评估耗时和窗口长度无关（滚动聚合 vs 每次重扫窗口）"""
+    import random
+    import alerts
+
+    rng = random.Random(5)
+    values = [rng.uniform(0, 100) for _ in range(args.samples)]
+
+    def rescan(kind, seconds):
+        # 对照组：每个样本都把窗口里的历史重新算一遍
+        window = []
+        for t, v in enumerate(values):
+            window.append((t, v))
+            while window[0][0] <= t - seconds:
+                window.pop(0)
+            data = [x for _, x in window]
+            if kind == 'avg':
+                sum(data) / len(data)
+            elif kind == 'max':
+                max(data)
+            else:
+                sorted(data)[int(0.95 * (len(data) - 1))]
+
+    print(f"{'rule':<24}{'rolling us/sample':>19}{'rescan us/sample':>18}")
+    for kind in ('avg', 'max', 'p95'):
+        for window in ('1m', '15m', '1h'):
+            rule = alerts.Rule(f"cpu > 90 {kind} {window}")
+            start = time.perf_counter()
+            for t, v in enumerate(values):
+                rule.observe(float(t), v)
+            rolling = (time.perf_counter() - start) / len(values) * 1e6
+            start = time.perf_counter()
+            rescan(kind, rule.seconds)
+            scanned = (time.perf_counter() - start) / len(values) * 1e6
+            print(f"{rule.text:<24}{rolling:>19.2f}{scanned:>18.2f}")
+
+
+def _fleet_agents(count, code, ports):
+    """子进程入口：一个事件循环里起 count 个只有 /status 的探针（按 Accept 协商紧凑格式），
+    和网关不在同一个进程，轮询时不抢 GIL
+    """
+    import asyncio
+    import random
+    from flask import Flask, Response, jsonify, request
+    import wire_format
+    import wsgi_server
+
+    app = Flask(__name__)
+    rng = random.Random(3)
+
+    @app.route('/status')
+    def status():
+        if request.headers.get('X-Secret-Code') != code:
+            return jsonify({"error": "Unauthorized"}), 401
+        stats = {"cpu": round(rng.uniform(0, 100), 1), "ram": 48.1, "disk": 71.0, "gpu": 3, "gpu_temp": 45,
+                 "net_up": 12.0, "net_down": 340.5}
+        if wire_format.accepts(request.headers.get('Accept')):
+            return Response(wire_format.encode_snapshot(time.time(), stats), content_type=wire_format.content_type())
+        return jsonify(stats)
+
+    async def serve():
+        servers = [await wsgi_server.WSGIServer(app, '127.0.0.1', 0, workers=1, stream_workers=1).start()
+                   for _ in range(count)]
+        ports.put([server.port for server in servers])
+        await asyncio.gather(*(server.serve() for server in servers))
+    asyncio.run(serve())
+
+
+@benchmark("fleet",
+           (("--hosts",), {"type": int, "default": 100, "help": "本机起多少个探针"}),
+           (("--rounds",), {"type": int, "default": 20}))
+def bench_fleet(args):
+    """网关模式：并发轮询 N 台探针，一轮耗时（首轮建连 vs 长连接复用）"""
+    import asyncio
+    import multiprocessing
+    import fleet
+
+    code = "2222"
+    ports = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_fleet_agents, args=(args.hosts, code, ports), daemon=True)
+    proc.start()
+    agent_ports = ports.get(timeout=60)
+
+    async def run():
+        gateway = fleet.Fleet(lambda: code, peers=[('127.0.0.1', port) for port in agent_ports], discovery=False)
+        await gateway.poll_all()
+        first = gateway.round_time
+        times = []
+        for _ in range(args.rounds):
+            await gateway.poll_all()
+            times.append(gateway.round_time)
+        return gateway.snapshot(), first, times
+
+    try:
+        snapshot, first, times = asyncio.run(run())
+    finally:
+        proc.terminate()
+        proc.join()
+    print(f"{snapshot['online']}/{snapshot['total']} hosts online")
+    print(f"  first round (connect)   {first * 1000:8.1f} ms")
+    print(f"  keep-alive rounds       {_percentiles(times)}")
+    errors = {h['error'] for h in snapshot['hosts'] if h['error']}
+    if errors:
+        print(f"  errors: {sorted(errors)[:3]}")
+    return 0 if snapshot['online'] == snapshot['total'] and max(times) < 1.0 else 1
+
+
+
+@benchmark("discovery",
+           (("--probes",), {"type": int, "default": 100000}),
+           (("--sources",), {"type": int, "default": 50, "help": "广播风暴里的来源地址数"}))
+def bench_discovery(args):
+    """自动发现：广播风暴下每个探测包的处理耗时、限流丢弃比例，应答缓存 vs 每次重新序列化"""
+    import discovery
+
+    specs = {"system": "Windows 11", "cpu": "AMD Ryzen 7 7840HS", "gpu": "Radeon 780M", "ram": "32.0 GB"}
+    stats = {"cpu": 12.3, "ram": 48.1, "gpu": 3}
+    beacon = discovery.Beacon(lambda: 5000, lambda: specs, lambda: stats, lambda: "2222", hostname="bench-host")
+    logs = []
+
+    class Transport:
+        sent = 0
+
+        def sendto(self, data, addr):
+            Transport.sent += 1
+
+    # 假时钟：整场风暴只过去 1 秒，每个来源最多放行 burst + rate 个
+    clock = [0.0]
+    protocol = discovery.DiscoveryProtocol(
+        beacon, logs.append, discovery.RateLimiter(clock=lambda: clock[0]))
+    protocol.connection_made(Transport())
+    packet = discovery.probe("2222")
+    addrs = [(f"10.0.{i // 256}.{i % 256}", 40000) for i in range(args.sources)]
+    start = time.perf_counter()
+    for i in range(args.probes):
+        clock[0] = i / args.probes
+        protocol.datagram_received(packet, addrs[i % len(addrs)])
+    storm = time.perf_counter() - start
+    print(f"storm: {args.probes} probes from {args.sources} sources in 1 s")
+    print(f"  {storm / args.probes * 1e6:6.2f} us/probe  answered {Transport.sent}  "
+          f"dropped {protocol.limiter.dropped}  log lines {len(logs)}")
+
+    info = discovery.parse_reply(beacon.payload(), "2222")
+    assert info["port"] == 5000 and info["hostname"] == "bench-host", info
+    assert discovery.parse_reply(beacon.payload(), "0000") is None
+    assert discovery.parse_reply(b"HERE_I_AM", "2222") == {}
+    print(f"reply: {len(beacon.payload())} B  {beacon.payload()[:60]!r}...")
+
+    count = 20000
+    builds = beacon.builds
+    start = time.perf_counter()
+    for _ in range(count):
+        beacon.payload()
+    cached = (time.perf_counter() - start) / count * 1e6
+    start = time.perf_counter()
+    for i in range(count):
+        beacon._key = None  # 对照组：每个探测都重新序列化
+        beacon.payload()
+    rebuilt = (time.perf_counter() - start) / count * 1e6
+    print(f"payload: cached {cached:6.2f} us  rebuilt {rebuilt:6.2f} us  "
+          f"(cached loop rebuilt {beacon.builds - builds - count} times)")
+    return 0 if Transport.sent < args.probes // 10 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server Monitor 性能基准")
+    parser.add_argument('--list', action='store_true', help="列出所有基准")
+    sub = parser.add_subparsers(dest='name')
+    for name, (_, arguments, summary) in BENCHMARKS.items():
+        p = sub.add_parser(name, help=summary)
+        for flags, kwargs in arguments:
+            p.add_argument(*flags, **kwargs)
+
+    args = parser.parse_args(argv)
+    if args.list or not args.name:
+        for name, (_, _, summary) in BENCHMARKS.items():
+            print(f"{name:<12} {summary}")
+        return 0
+    return BENCHMARKS[args.name][0](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
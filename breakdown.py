@@ -0,0 +1,121 @@
+"""分项指标：每个核心、每块网卡、每块磁盘的速率，以及所有分区的使用率
+
+每轮和上一轮缓存的 psutil 原始计数器相减得到增量（纯 Python）：
+  - CPU：cpu_times(percpu=True) 的增量，(总时间 - 空闲) / 总时间，和 psutil.cpu_percent 口径一致
+  - 网卡：net_io_counters(pernic=True) 的收发字节增量 / 秒
+  - 磁盘：disk_io_counters(perdisk=True) 的读写字节增量 / 秒
+  - 分区：disk_partitions() 每个挂载点的 disk_usage（statvfs 可能卡在网络盘上，单独放慢周期）
+计数器来源可以替换成假函数，不依赖真机器就能测（见 benchmark.py breakdown）。
+"""
+import time
+
+import psutil
+
+# 不计入总时间的字段：guest 时间已经包含在 user / nice 里了
+_EXCLUDED = ('guest', 'guest_nice')
+_IDLE = ('idle', 'iowait')
+
+
+class CounterDeltas:
+    """按名字缓存一组单调递增的计数器，update() 返回每秒增量
+
+    行（网卡 / 磁盘）增减时名字列表对不上，这一轮重新建立基准、返回 None；
+    计数器回绕或被重置时增量按 0 算。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._names = None
+        self._prev = None
+        self._t = None
+
+    def update(self, names, values):
+        now = self._clock()
+        values = [tuple(row) for row in values]
+        prev, prev_t, same = self._prev, self._t, names == self._names
+        self._names, self._prev, self._t = names, values, now
+        if not same or prev is None or len(prev) != len(values) or now <= prev_t:
+            return None
+        elapsed = now - prev_t
+        return [[max(v - p, 0) / elapsed for v, p in zip(row, before)] for row, before in zip(values, prev)]
+
+
+class Breakdown:
+    def __init__(self, cpu_times=None, net_counters=None, disk_counters=None, partitions=None,
+                 disk_usage=None, clock=time.monotonic):
+        self._cpu_times = cpu_times or (lambda: psutil.cpu_times(percpu=True))
+        self._net_counters = net_counters or (lambda: psutil.net_io_counters(pernic=True))
+        self._disk_counters = disk_counters or (lambda: psutil.disk_io_counters(perdisk=True) or {})
+        self._partitions = partitions or (lambda: psutil.disk_partitions(all=False))
+        self._disk_usage = disk_usage or psutil.disk_usage
+        self._cpu_prev = None
+        self._cpu_cols = None
+        self._nics = CounterDeltas(clock)
+        self._disks = CounterDeltas(clock)
+
+    def cpus(self):
+        """每个核心的占用率列表；第一轮没有基准，返回 None"""
+        times = self._cpu_times()
+        if not times:
+            return None
+        if self._cpu_cols is None:
+            fields = times[0]._fields
+            total = [i for i, f in enumerate(fields) if f not in _EXCLUDED]
+            idle = [i for i, f in enumerate(fields) if f in _IDLE]
+            self._cpu_cols = (total, idle)
+        total_cols, idle_cols = self._cpu_cols
+        current = [tuple(t) for t in times]
+        prev, self._cpu_prev = self._cpu_prev, current
+        if prev is None or len(prev) != len(current):
+            return None
+        out = []
+        for row, before in zip(current, prev):
+            delta = [max(v - p, 0.0) for v, p in zip(row, before)]
+            total = sum(delta[i] for i in total_cols)
+            busy = total - sum(delta[i] for i in idle_cols)
+            out.append(round(min(max(busy * 100.0 / total, 0.0), 100.0), 1) if total > 0 else 0.0)
+        return out
+
+    def nics(self):
+        """{网卡: {"up": 字节/秒, "down": 字节/秒}}"""
+        counters = self._net_counters()
+        names = tuple(counters)
+        rates = self._nics.update(names, [(c.bytes_sent, c.bytes_recv) for c in counters.values()])
+        if rates is None:
+            return None
+        return {name: {"up": round(up, 1), "down": round(down, 1)} for name, (up, down) in zip(names, rates)}
+
+    def disks(self):
+        """{磁盘: {"read": 字节/秒, "write": 字节/秒}}"""
+        counters = self._disk_counters()
+        names = tuple(counters)
+        rates = self._disks.update(names, [(c.read_bytes, c.write_bytes) for c in counters.values()])
+        if rates is None:
+            return None
+        return {name: {"read": round(read, 1), "write": round(write, 1)}
+                for name, (read, write) in zip(names, rates)}
+
+    def io(self):
+        """每秒一轮的部分：核心、网卡、磁盘（没有基准的项不出现）"""
+        out = {}
+        for key, func in (("cpus", self.cpus), ("nics", self.nics), ("disks", self.disks)):
+            value = func()
+            if value is not None:
+                out[key] = value
+        return out
+
+    def partitions(self):
+        """所有挂载分区的使用情况；光驱、没插卡的读卡器这类读不了的直接跳过"""
+        out = []
+        seen = set()
+        for part in self._partitions():
+            if part.mountpoint in seen:
+                continue
+            seen.add(part.mountpoint)
+            try:
+                usage = self._disk_usage(part.mountpoint)
+            except OSError:
+                continue
+            out.append({"mount": part.mountpoint, "device": part.device, "fstype": part.fstype,
+                        "total": usage.total, "used": usage.used, "percent": usage.percent})
+        return out
@@ -0,0 +1,203 @@
+"""采集器调度器：每个指标按自己的节奏采集，互不拖累
+
+  - 每个 Collector 有独立的采集周期 interval 和超时 timeout
+  - 每个 Collector 在自己的工作线程里执行，慢的只会拖慢自己
+  - 采集结果合并进共享快照（整体替换引用，读者永远拿到完整的 dict）
+  - 快照是只读的 Snapshot：发布之后谁也改不了，读者不加锁也不会看到改了一半的内容
+
+本模块不依赖 psutil / Windows，可在 Linux 上用假采集器直接驱动：
+不调用 start() 时，run_pending(now) 会在当前线程里同步执行到期的采集器。
+"""
+import heapq
+import threading
+import time
+
+
+class Snapshot(dict):
+    """只读 dict：发布出去的快照不能原地修改，要改就 Snapshot(old, **fields) 生成新的再整体替换
+
+    仍然是 dict 的子类，jsonify / json.dumps / dict(snap) 都照常工作。
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("snapshot is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class Collector:
+    """单个指标采集器
+
+    func 无参调用，返回要合并进快照的字段 dict，例如 {"cpu": 12.5}。
+    超过 timeout 仍未返回时，该采集器被标记为 stale 并跳过后续调度，
+    直到它自己返回为止；其它采集器不受影响。
+    """
+
+    def __init__(self, name, func, interval=1.0, timeout=None):
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.timeout = float(timeout) if timeout else self.interval * 2
+        self.busy = False
+        self.stale = False
+        self.started_at = 0.0
+        self.last_ok = None
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_error = None
+        self._wake = threading.Event()
+
+    def info(self, now):
+        """调度健康信息（给调试接口 / 日志用）"""
+        return {
+            "interval": self.interval,
+            "timeout": self.timeout,
+            "busy": self.busy,
+            "stale": self.stale,
+            "age": round(now - self.last_ok, 3) if self.last_ok is not None else None,
+            "runs": self.runs,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "last_error": self.last_error,
+        }
+
+
+class CollectorScheduler:
+    """按到期时间调度所有采集器，结果写入共享快照
+
+    on_update(snapshot) 在每次快照更新后调用，snapshot 是新的 dict，
+    调用方可以直接把它赋给全局变量（例如 CURRENT_STATS），赋值本身是原子的。
+    clock 可以替换成假时钟，方便在测试里推进时间。
+    """
+
+    def __init__(self, initial=None, on_update=None, clock=time.monotonic):
+        self._collectors = {}
+        self._heap = []
+        self._snapshot = Snapshot(initial or {})
+        self._lock = threading.Lock()
+        self._on_update = on_update
+        self._clock = clock
+        self._stop = threading.Event()
+        self._threaded = False
+
+    # --- 注册 ---
+    def register(self, collector):
+        if collector.name in self._collectors:
+            raise ValueError(f"collector already registered: {collector.name}")
+        self._collectors[collector.name] = collector
+        # 新注册的采集器立即到期，保证启动后第一轮就有数据
+        heapq.heappush(self._heap, (self._clock(), collector.name))
+        if self._threaded:
+            self._spawn_worker(collector)
+        return collector
+
+    def collector(self, name, interval=1.0, timeout=None):
+        """装饰器写法：@scheduler.collector("cpu", interval=0.5)"""
+        def decorator(func):
+            self.register(Collector(name, func, interval, timeout))
+            return func
+        return decorator
+
+    # --- 读取 ---
+    def snapshot(self):
+        """返回当前快照（Snapshot，只读）"""
+        return self._snapshot
+
+    def health(self):
+        now = self._clock()
+        return {name: c.info(now) for name, c in self._collectors.items()}
+
+    # --- 调度 ---
+    def run_pending(self, now=None):
+        """执行所有到期的采集器，返回距离下一次到期的秒数"""
+        now = self._clock() if now is None else now
+        while self._heap and self._heap[0][0] <= now:
+            due, name = heapq.heappop(self._heap)
+            c = self._collectors[name]
+            # 固定节拍，落后太多时从当前时间重新对齐，避免补跑一串
+            next_due = due + c.interval
+            if next_due <= now:
+                next_due = now + c.interval
+            heapq.heappush(self._heap, (next_due, name))
+
+            if c.busy:
+                # 上一次还没跑完：超时就标记为 stale，本轮直接跳过
+                if now - c.started_at > c.timeout and not c.stale:
+                    c.stale = True
+                    c.timeouts += 1
+                continue
+
+            c.busy = True
+            c.started_at = now
+            if self._threaded:
+                c._wake.set()
+            else:
+                self._run(c)
+
+        if not self._heap:
+            return 1.0
+        return max(0.0, self._heap[0][0] - self._clock())
+
+    def _run(self, c):
+        try:
+            result = c.func()
+        except Exception as e:
+            c.errors += 1
+            c.last_error = repr(e)
+        else:
+            # 超时之后才返回的结果依然比旧值新，照样发布
+            if result:
+                self._publish(result)
+            c.last_ok = self._clock()
+            c.stale = False
+        finally:
+            c.runs += 1
+            c.busy = False
+
+    def _publish(self, fields):
+        with self._lock:
+            snap = Snapshot(self._snapshot, **fields)
+            self._snapshot = snap
+            if self._on_update:
+                self._on_update(snap)
+
+    # --- 线程模式 ---
+    def _spawn_worker(self, c):
+        def worker():
+            while not self._stop.is_set():
+                c._wake.wait()
+                c._wake.clear()
+                if self._stop.is_set():
+                    return
+                self._run(c)
+
+        threading.Thread(target=worker, name=f"collector-{c.name}", daemon=True).start()
+
+    def start(self):
+        """每个采集器一个工作线程 + 一个调度线程"""
+        self._start_workers()
+        threading.Thread(target=self._dispatch_loop, name="collector-scheduler", daemon=True).start()
+
+    def run_forever(self):
+        """在当前线程里跑调度循环（monitor_loop 直接调用）"""
+        self._start_workers()
+        self._dispatch_loop()
+
+    def _start_workers(self):
+        self._threaded = True
+        for c in self._collectors.values():
+            self._spawn_worker(c)
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            delay = self.run_pending()
+            self._stop.wait(min(delay, 1.0))
+
+    def stop(self):
+        self._stop.set()
+        for c in self._collectors.values():
+            c._wake.set()
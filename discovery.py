@@ -0,0 +1,216 @@
+"""局域网自动发现：FIND_SERVER 探测的应答 + 组播主动通告
+
+  - 探测带上版本号（FIND_SERVER:<配对码>:2）就回紧凑应答，一个数据报带齐常用信息：
+        HERE_I_AM:2 <mac> {"p":5000,"h":"主机名","s":"规格哈希","l":[cpu,ram,gpu]}
+    mac 是以配对码为密钥的 HMAC-SHA256 前 8 字节（十六进制，同 input_channel），
+    收到的一方能确认应答来自同一个配对码的探针；老客户端（不带版本号）照旧只收到 HERE_I_AM
+  - 应答序列化好缓存起来：端口、主机名、规格、负载（取整到 1%）、配对码都没变就直接复用同一份 bytes
+  - 每个来源地址一个令牌桶，超速的探测在解析之前就丢掉；同一个设备一分钟内只记一次日志
+  - 跑在共用的 asyncio 事件循环上（datagram endpoint）
+  - --announce：定期把同样的应答发到组播组，网关（fleet.py）不用广播探测也能发现
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import socket
+import struct
+import time
+from collections import OrderedDict
+
+DISCOVERY_PORT = 50001
+ANNOUNCE_GROUP = '239.255.50.1'
+ANNOUNCE_PORT = 50003  # 50002 是输入通道
+PROTOCOL = 2
+REPLY = b"HERE_I_AM"
+MAC_SIZE = 8
+MAX_PROBE = 256  # 探测包就一行文本，更大的直接丢
+
+
+def _mac(code, body):
+    return hmac.new(str(code).encode('utf-8'), body, hashlib.sha256).hexdigest()[:MAC_SIZE * 2].encode('ascii')
+
+
+def probe(code, version=PROTOCOL):
+    return f"FIND_SERVER:{code}:{version}".encode('utf-8')
+
+
+def parse_probe(data, code):
+    """FIND_SERVER:<配对码>[:版本] -> 版本（老客户端没有版本号，算 1）；不是探测包或配对码不对返回 None
+
+    配对码里可以有冒号，所以不按冒号切分，而是拿完整的配对码去比
+    """
+    try:
+        msg = data.decode('utf-8').strip()
+    except UnicodeDecodeError:
+        return None
+    prefix, _, rest = msg.partition(':')
+    if prefix != "FIND_SERVER":
+        return None
+    if rest == code:
+        return 1
+    head, sep, version = rest.rpartition(':')
+    if sep and head == code and version.isdigit():
+        return int(version)
+    return None
+
+
+def parse_reply(data, code):
+    """应答 / 组播通告 -> {"port", "hostname", "specs", "load"}；
+    老版本的 HERE_I_AM 返回空 dict（没有端口），不是应答或者 mac 对不上返回 None
+    """
+    if data.strip() == REPLY:
+        return {}
+    head, _, rest = data.partition(b' ')
+    if head != b"%s:%d" % (REPLY, PROTOCOL):
+        return None
+    mac, _, body = rest.partition(b' ')
+    if not hmac.compare_digest(mac, _mac(code, body)):
+        return None
+    try:
+        info = json.loads(body)
+    except ValueError:
+        return None
+    return {"port": info.get("p"), "hostname": info.get("h"), "specs": info.get("s"), "load": info.get("l")}
+
+
+class Beacon:
+    """本机的应答内容；payload() 在数据没变时返回同一份 bytes"""
+
+    def __init__(self, port, specs, stats, code, hostname=None):
+        # 都是无参函数：端口启动后才确定，规格启动后才读，负载每秒变，配对码界面上能改
+        self.port = port
+        self.specs = specs
+        self.stats = stats
+        self.code = code
+        self.hostname = hostname or socket.gethostname()
+        self.builds = 0
+        self._specs_ref = None
+        self._specs_hash = None
+        self._key = None
+        self._payload = None
+
+    def specs_hash(self):
+        specs = self.specs()
+        # SYSTEM_SPECS 是整体替换的，按对象身份缓存，不用每次重新序列化
+        if specs is not self._specs_ref:
+            blob = json.dumps(specs, sort_keys=True, ensure_ascii=False).encode('utf-8')
+            self._specs_ref, self._specs_hash = specs, hashlib.sha256(blob).hexdigest()[:8]
+        return self._specs_hash
+
+    def load(self):
+        stats = self.stats()
+        return tuple(int(round(stats.get(name) or 0)) for name in ("cpu", "ram", "gpu"))
+
+    def payload(self):
+        key = (self.port(), self.hostname, self.specs_hash(), self.load(), self.code())
+        if key != self._key:
+            port, hostname, specs, load, code = key
+            body = json.dumps({"p": port, "h": hostname, "s": specs, "l": list(load)},
+                              ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            self._payload = b"%s:%d %s %s" % (REPLY, PROTOCOL, _mac(code, body), body)
+            self._key = key
+            self.builds += 1
+        return self._payload
+
+
+class RateLimiter:
+    """每个来源地址一个令牌桶：平均 rate 个/秒，最多连发 burst 个；只记最近活跃的 max_sources 个地址"""
+
+    def __init__(self, rate=2.0, burst=5, max_sources=4096, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_sources = max_sources
+        self.dropped = 0
+        self._clock = clock
+        self._buckets = OrderedDict()
+
+    def allow(self, source):
+        now = self._clock()
+        tokens, last = self._buckets.pop(source, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if len(self._buckets) >= self.max_sources:
+            self._buckets.popitem(last=False)  # 最久没动静的地址
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.dropped += 1
+        self._buckets[source] = (tokens, now)
+        return allowed
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, beacon, log, limiter=None, log_every=60.0):
+        self.beacon = beacon
+        self.log = log
+        self.limiter = limiter or RateLimiter()
+        self.log_every = log_every
+        self.transport = None
+        self._logged = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) > MAX_PROBE or not self.limiter.allow(addr[0]):
+            return
+        version = parse_probe(data, str(self.beacon.code()))
+        if version is None:
+            return
+        self.transport.sendto(self.beacon.payload() if version >= PROTOCOL else REPLY, addr)
+
+        now = time.monotonic()
+        last = self._logged.get(addr[0])
+        if last is None or now - last >= self.log_every:
+            if len(self._logged) >= 1024:
+                self._logged.clear()
+            self._logged[addr[0]] = now
+            self.log(f"[🔍] 匹配到设备 {addr[0]}，配对码正确，已响应！")
+
+
+async def serve(beacon, log, host='0.0.0.0', port=DISCOVERY_PORT, announce=False, announce_every=10.0):
+    """监听探测；announce=True 时再每 announce_every 秒往组播组发一次应答"""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # 允许端口复用
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)  # 通告只在本网段
+        sock.bind((host, port))
+    except OSError as e:
+        sock.close()
+        log(f"[❌] 自动发现服务启动失败: {e}")
+        return
+    transport, _ = await loop.create_datagram_endpoint(lambda: DiscoveryProtocol(beacon, log), sock=sock)
+    log(f"[✔️] 局域网自动发现已启动 (UDP:{port})")
+    try:
+        if not announce:
+            await asyncio.Future()
+        log(f"[✔️] 组播通告已开启 ({ANNOUNCE_GROUP}:{ANNOUNCE_PORT}，每 {announce_every:g} 秒)")
+        failing = False
+        while True:
+            try:
+                transport.sendto(beacon.payload(), (ANNOUNCE_GROUP, ANNOUNCE_PORT))
+                failing = False
+            except OSError as e:
+                if not failing:  # 断网时不用每次都记
+                    log(f"[⚠️] 组播通告发送失败: {e}")
+                failing = True
+            await asyncio.sleep(announce_every)
+    finally:
+        transport.close()
+
+
+def announce_socket(group=ANNOUNCE_GROUP, port=ANNOUNCE_PORT):
+    """加入通告组播组的 UDP socket（网关收通告用）"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', port))
+        membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton('0.0.0.0'))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except OSError:
+        sock.close()
+        raise
+    return sock
@@ -0,0 +1,86 @@
+"""目录列表：os.scandir 单次枚举 + 按 (路径, mtime) 的 LRU 缓存
+
+  - os.scandir 一次拿到类型信息（Windows 上连大小都不需要额外 stat）
+  - 排好序的完整列表按 (路径, 目录 mtime) 缓存
+  - iter_json 边枚举边输出 JSON 数组（不排序），客户端可以先渲染第一屏
+注意：目录 mtime 只在增删文件时变化，文件大小的变化由 ttl 兜底刷新。
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _entry(entry):
+    try:
+        is_dir = entry.is_dir()
+        # 文件夹不计算大小，为了速度
+        size = 0 if is_dir else entry.stat().st_size
+    except OSError:
+        # 断开的符号链接、权限不足等：照样列出来，只是没有大小
+        is_dir, size = False, 0
+    return {
+        "name": entry.name,
+        "type": "dir" if is_dir else "file",
+        "path": entry.path,
+        "size": size,
+    }
+
+
+def scan_dir(path):
+    """枚举目录并排序：文件夹在前，文件在后，按名称不区分大小写"""
+    with os.scandir(path) as it:
+        items = [_entry(e) for e in it]
+    items.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+    return items
+
+
+def iter_json(path):
+    """流式输出未排序的 JSON 数组；目录打不开时在返回生成器之前就抛出异常"""
+    it = os.scandir(path)
+
+    def generate():
+        with it:
+            yield "["
+            first = True
+            for e in it:
+                yield ("" if first else ",") + json.dumps(_entry(e), ensure_ascii=False)
+                first = False
+            yield "]"
+
+    return generate()
+
+
+class DirCache:
+    """按 (路径, mtime) 缓存完整的排序结果，LRU 淘汰
+
+    同时限制目录个数 maxsize 和缓存的总条目数 max_items，避免几个超大目录吃光内存。
+    """
+
+    def __init__(self, maxsize=32, max_items=200000, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.max_items = max_items
+        self.ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def listing(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        now = self._clock()
+        with self._lock:
+            hit = self._items.get(path)
+            if hit is not None and hit[0] == mtime and now - hit[1] <= self.ttl:
+                self._items.move_to_end(path)
+                return hit[2]
+
+        items = scan_dir(path)
+        with self._lock:
+            self._items[path] = (mtime, now, items)
+            self._items.move_to_end(path)
+            total = sum(len(v[2]) for v in self._items.values())
+            while len(self._items) > 1 and (len(self._items) > self.maxsize or total > self.max_items):
+                _, evicted = self._items.popitem(last=False)
+                total -= len(evicted[2])
+        return items
@@ -0,0 +1,309 @@
+"""网关模式：自动发现局域网里的其它探针，汇总成一个 /fleet 接口
+
+网关（main_server.py --gateway）在自己的事件循环里：
+  - 发现：定期往 UDP 50001 广播 FIND_SERVER:<配对码>:2，应答里带端口和主机名（见 discovery）；
+    开了 --announce 的探针会主动往组播组通告，不用等下一次广播；
+    老版本回包里没有端口，按 5000 → 5001 的顺序试；也可以用 --peers 手动指定 host:port；
+    本机通过回环地址和局域网地址各被发现一次时合并成一台
+  - 轮询：每台一条 HTTP/1.1 keep-alive 长连接，所有主机并发请求 /status（协商紧凑格式，见 wire_format），
+    单台超时不影响别的
+  - 汇总：/fleet 返回每台的最新数据和新鲜度（多久没更新、最近一次错误）
+纯 asyncio，不依赖 Flask，可以用本机多个端口上的探针直接测试（见 benchmark.py fleet）。
+"""
+import asyncio
+import json
+import socket
+import time
+
+import discovery
+import wire_format
+
+DISCOVERY_PORT = discovery.DISCOVERY_PORT
+DEFAULT_PORTS = (5000, 5001)  # 回包里没有端口时依次尝试
+
+
+class PeerError(Exception):
+    pass
+
+
+def local_addresses():
+    """本机的所有 IPv4 地址：网关广播时会发现自己，--peers 127.0.0.1:端口 和局域网 IP 其实是同一台"""
+    addresses = {'127.0.0.1', 'localhost', '0.0.0.0'}
+    try:
+        addresses.update(socket.gethostbyname_ex(socket.gethostname())[2])
+    except OSError:
+        pass
+    try:
+        import psutil
+        for nics in psutil.net_if_addrs().values():
+            addresses.update(a.address for a in nics if a.family == socket.AF_INET)
+    except (ImportError, OSError):
+        pass
+    return addresses
+
+
+class Peer:
+    """一台被汇总的探针 + 它的长连接"""
+
+    def __init__(self, host, ports, source="discovery"):
+        self.host = host
+        self.ports = list(ports)
+        self.port = self.ports[0]
+        self.source = source
+        self.hostname = None
+        self.specs = None  # 规格哈希：变了说明换了硬件 / 重装了系统
+        self.reader = None
+        self.writer = None
+        self.stats = None
+        self.last_ok = None
+        self.last_seen = time.time()  # 最近一次被发现 / 手动加入
+        self.latency = None
+        self.error = None
+        self.polls = 0
+        self.failures = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def _connect(self, timeout):
+        last_error = None
+        # 端口没确定时轮流试（平分超时），连上的那个就固定下来
+        ports = [self.port] + [p for p in self.ports if p != self.port]
+        for port in ports:
+            try:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, port), timeout / len(ports))
+                self.port = port
+                return
+            except (OSError, asyncio.TimeoutError) as e:
+                last_error = e
+        raise PeerError(f"connect failed: {last_error!r}")
+
+    async def get(self, path, headers, timeout):
+        """在长连接上发一个 GET，返回 (状态码, 响应头, body)；连接断了重连一次。
+        连接、请求、重连一共最多 timeout 秒，一台主机卡住不会拖长整轮轮询
+        """
+        try:
+            return await asyncio.wait_for(self._get(path, headers, timeout), timeout)
+        except asyncio.TimeoutError:
+            # 超时只在这一层处理：3.11 起 asyncio.TimeoutError 是 OSError 的子类，放进 _get 会被当成断线去重连
+            self.close()
+            raise PeerError("timeout") from None
+
+    async def _get(self, path, headers, timeout):
+        for attempt in (0, 1):
+            fresh = self.writer is None
+            if fresh:
+                await self._connect(timeout)
+            try:
+                return await self._request(path, headers)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                self.close()
+                if fresh or attempt:
+                    raise PeerError(repr(e))
+                # 复用的连接可能已经被对方的 keep-alive 超时关掉了，重连再试
+
+    async def _request(self, path, headers):
+        head = f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        self.writer.write(head.encode('latin-1'))
+        await self.writer.drain()
+
+        raw = await self.reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode('latin-1').split("\r\n")
+        code = int(lines[0].split(" ", 2)[1])
+        resp_headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            if key:
+                resp_headers[key.strip().lower()] = value.strip()
+        if 'content-length' in resp_headers:
+            body = await self.reader.readexactly(int(resp_headers['content-length']))
+        elif 'chunked' in resp_headers.get('transfer-encoding', '').lower():
+            parts = []
+            while True:
+                n = int((await self.reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+                if n == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                parts.append(await self.reader.readexactly(n))
+                await self.reader.readexactly(2)
+            body = b"".join(parts)
+        else:
+            body = await self.reader.read()
+            resp_headers['connection'] = 'close'
+        if resp_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return code, resp_headers, body
+
+    def view(self, now):
+        return {
+            "host": self.host,
+            "port": self.port,
+            "source": self.source,
+            "hostname": self.hostname,
+            "specs": self.specs,
+            "online": self.error is None and self.last_ok is not None,
+            "age": round(now - self.last_ok, 2) if self.last_ok is not None else None,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error": self.error,
+            "stats": self.stats,
+        }
+
+
+def parse_stats(headers, body):
+    """紧凑格式或 JSON 都接受（老版本探针不认识 Accept，只会回 JSON）"""
+    if headers.get('content-type', '').startswith(wire_format.MIME):
+        _, columns = wire_format.decode(body)
+        return {name: values[-1] for name, values in columns.items() if values and values[-1] is not None}
+    return json.loads(body)
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_reply):
+        self.on_reply = on_reply
+
+    def datagram_received(self, data, addr):
+        if data.startswith(discovery.REPLY):
+            self.on_reply(data, addr)
+
+
+class Fleet:
+    def __init__(self, code, peers=(), interval=1.0, timeout=0.8, discover_every=30.0, forget_after=300.0,
+                 broadcast='255.255.255.255', discovery_port=DISCOVERY_PORT, discovery=True, log=print):
+        # code：返回当前配对码的函数（界面上改了配对码也能跟着变）
+        self.code = code
+        self.log = log
+        self.interval = interval
+        self.timeout = timeout
+        self.discover_every = discover_every
+        self.forget_after = forget_after
+        self.broadcast = broadcast
+        self.discovery_port = discovery_port
+        self.discovery = discovery
+        self.peers = {}
+        self.rounds = 0
+        self.round_time = None
+        self._discover_task = None
+        self._announcements = None
+        self.local = local_addresses()
+        for host, port in peers:
+            self.add_peer(host, [port], source="static")
+
+    def same_host(self, a, b):
+        return a == b or (a in self.local and b in self.local)
+
+    def add_peer(self, host, ports, source="discovery"):
+        """已经在列表里的主机（同一地址或者都是本机，端口有交集）只刷新 last_seen，不重复添加"""
+        for peer in list(self.peers.values()):
+            if self.same_host(peer.host, host) and set(peer.ports) & set(ports):
+                if source == "static":
+                    peer.source = "static"  # 手动指定的不会因为长时间连不上被忘掉
+                peer.last_seen = time.time()
+                return peer
+        peer = self.peers[(host, tuple(ports))] = Peer(host, ports, source)
+        return peer
+
+    def on_reply(self, data, addr):
+        info = discovery.parse_reply(data, self.code())
+        if info is None:
+            return
+        peer = self.add_peer(addr[0], [info["port"]] if info.get("port") else DEFAULT_PORTS)
+        peer.hostname = info.get("hostname") or peer.hostname
+        peer.specs = info.get("specs") or peer.specs
+
+    async def discover(self, wait=1.0):
+        """广播一次 FIND_SERVER，收 wait 秒的回包"""
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.bind(('0.0.0.0', 0))
+        transport, _ = await loop.create_datagram_endpoint(lambda: _DiscoveryProtocol(self.on_reply), sock=sock)
+        try:
+            transport.sendto(discovery.probe(self.code()), (self.broadcast, self.discovery_port))
+            await asyncio.sleep(wait)
+        finally:
+            transport.close()
+
+    async def poll(self, peer):
+        headers = {"X-Secret-Code": self.code(), "Accept": f"{wire_format.MIME}, application/json"}
+        start = time.perf_counter()
+        peer.polls += 1
+        try:
+            code, resp_headers, body = await peer.get("/status", headers, self.timeout)
+            if code != 200:
+                raise PeerError(f"HTTP {code}")
+            peer.stats = parse_stats(resp_headers, body)
+        except (PeerError, ValueError) as e:
+            peer.failures += 1
+            peer.error = str(e)
+            return
+        peer.latency = time.perf_counter() - start
+        peer.last_ok = time.time()
+        peer.error = None
+
+    async def poll_all(self):
+        start = time.perf_counter()
+        peers = list(self.peers.values())
+        await asyncio.gather(*(self.poll(peer) for peer in peers))
+        # 自动发现来的主机很久没回应过广播、也一直连不上，就不再轮询
+        now = time.time()
+        for key, peer in list(self.peers.items()):
+            if peer.source == "discovery" and peer.error and now - max(peer.last_seen, peer.last_ok or 0) > self.forget_after:
+                peer.close()
+                del self.peers[key]
+        self.rounds += 1
+        self.round_time = time.perf_counter() - start
+
+    async def _discover_loop(self):
+        while True:
+            try:
+                await self.discover()
+            except OSError as e:
+                self.log(f"[⚠️] 网关广播发现失败: {e}")
+            await asyncio.sleep(self.discover_every)
+
+    async def _listen_announcements(self):
+        loop = asyncio.get_running_loop()
+        try:
+            sock = discovery.announce_socket()
+        except OSError as e:
+            self.log(f"[⚠️] 网关无法加入组播组，只靠广播发现: {e}")
+            return
+        self._announcements, _ = await loop.create_datagram_endpoint(
+            lambda: _DiscoveryProtocol(self.on_reply), sock=sock)
+
+    async def run(self):
+        if self.discovery:
+            await self._listen_announcements()
+            self._discover_task = asyncio.ensure_future(self._discover_loop())
+        while True:
+            start = time.monotonic()
+            await self.poll_all()
+            await asyncio.sleep(max(0.0, start + self.interval - time.monotonic()))
+
+    def snapshot(self):
+        """给 /fleet 用（在别的线程里调用）：列表是新建的，各主机的 stats 本身是整体替换的"""
+        now = time.time()
+        hosts = [peer.view(now) for peer in list(self.peers.values())]
+        hosts.sort(key=lambda h: (h["host"], h["port"]))
+        return {
+            "t": now,
+            "online": sum(1 for h in hosts if h["online"]),
+            "total": len(hosts),
+            "round_ms": round(self.round_time * 1000, 1) if self.round_time is not None else None,
+            "hosts": hosts,
+        }
+
+
+def parse_peers(value):
+    """--peers 127.0.0.1:5101,10.0.0.8:5000"""
+    peers = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.rpartition(":")
+            peers.append((host or "127.0.0.1", int(port)))
+    return peers
@@ -0,0 +1,169 @@
+"""常驻 typeperf 采样器：集显 / AMD 的 GPU 占用率
+
+只启动一个持续输出的 typeperf 子进程，由读线程逐行解析：
+  - TypeperfParser：纯文本解析，不依赖 Windows，可直接喂录制好的 CSV
+  - TypeperfSampler：管理子进程生命周期，缓存最近一次有效值，失败后指数退避
+"""
+import csv
+import re
+import subprocess
+import threading
+import time
+
+GPU_COUNTER = r'\GPU Engine(*)\Utilization Percentage'
+
+# 实例名形如 pid_1234_luid_0x0000_0x0000D1C2_phys_0_eng_0_engtype_3D
+_ENGTYPE_RE = re.compile(r'engtype_([A-Za-z0-9]+)')
+
+
+class TypeperfParser:
+    """增量解析 typeperf 的 CSV 输出，每个数据行返回一个 GPU 占用率
+
+    与任务管理器口径一致：同一类引擎（3D / Copy / VideoDecode ...）
+    先把各进程的占用相加，再取最忙的那一类。
+    表头里认不出引擎类型时，退回到旧逻辑：全部相加再封顶 100。
+    """
+
+    def __init__(self):
+        self.groups = None
+
+    def feed(self, line):
+        line = line.strip()
+        if not line or not line.startswith('"'):
+            # 空行、"Exiting, please wait..."、错误提示等一律忽略
+            return None
+        try:
+            row = next(csv.reader([line]))
+        except (csv.Error, StopIteration):
+            return None
+
+        if row[0].startswith('(PDH-CSV'):
+            self.groups = []
+            for name in row[1:]:
+                m = _ENGTYPE_RE.search(name)
+                self.groups.append(m.group(1) if m else None)
+            return None
+        if self.groups is None:
+            return None
+
+        totals = {}
+        loose = 0.0
+        seen = False
+        for group, raw in zip(self.groups, row[1:]):
+            raw = raw.strip()
+            if not raw:
+                continue  # 进程退出后该列会变成空值
+            try:
+                val = float(raw)
+            except ValueError:
+                continue
+            seen = True
+            if group is None:
+                loose += val
+            else:
+                totals[group] = totals.get(group, 0.0) + val
+        if not seen:
+            return None
+
+        load = max(totals.values()) if totals else loose
+        return min(round(load, 1), 100.0)
+
+
+class TypeperfSampler:
+    """一个常驻 typeperf 子进程 + 一个读线程
+
+    read() 返回最近一次有效值；超过 max_age 秒没有新数据时返回 None。
+    typeperf 启动时就固定了计数器实例（即进程列表），所以每隔
+    restart_every 秒主动重启一次，让新启动的 GPU 进程也能被统计到。
+    """
+
+    def __init__(self, counter=GPU_COUNTER, interval=1, popen=subprocess.Popen, popen_kwargs=None,
+                 max_age=5.0, restart_every=300.0, backoff=2.0, max_backoff=60.0, clock=time.monotonic):
+        self.cmd = ['typeperf', counter, '-si', str(interval)]
+        self._popen = popen
+        self._popen_kwargs = popen_kwargs or {}
+        self.max_age = max_age
+        self.restart_every = restart_every
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+
+        self.value = None
+        self.updated = None
+        self.failures = 0
+        self._proc = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gpu-typeperf", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._kill()
+
+    def read(self):
+        if self.updated is None or self._clock() - self.updated > self.max_age:
+            return None
+        return self.value
+
+    def _run(self):
+        while not self._stop.is_set():
+            got_data = False
+            try:
+                got_data = self._stream_once()
+            except Exception:
+                pass
+            finally:
+                self._kill()
+
+            if self._stop.is_set():
+                return
+            if got_data:
+                self.failures = 0
+                continue
+            # 连续失败（没有 GPU 计数器 / typeperf 不存在）就逐步拉长重试间隔
+            self.failures += 1
+            self._stop.wait(min(self.backoff * 2 ** (self.failures - 1), self.max_backoff))
+
+    def _stream_once(self):
+        self._proc = self._popen(
+            self.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            **self._popen_kwargs
+        )
+        parser = TypeperfParser()
+        started = self._clock()
+        got_data = False
+        for line in self._proc.stdout:
+            if self._stop.is_set():
+                break
+            val = parser.feed(line)
+            if val is not None:
+                self.value = val
+                self.updated = self._clock()
+                got_data = True
+            if self._clock() - started > self.restart_every:
+                break
+        return got_data
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None:
+                proc.terminate()
+                proc.wait(timeout=2)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
@@ -0,0 +1,135 @@
+"""指标历史：定长、列式（array）存储的多分辨率环形缓冲区
+
+  - 每个分辨率档位（例如 1 秒 × 10 分钟、1 分钟 × 24 小时）一个 HistoryTier
+  - 同一档位内所有指标共用一列时间戳，每个指标一列 array('d')
+  - 同一时间桶内的多次采样取平均后落盘，内存占用在创建时就已固定
+缺失值用 NaN 占位，输出时转成 None。
+"""
+import math
+import threading
+from array import array
+
+NAN = float('nan')
+
+# (步长秒数, 容量)：1 秒 × 10 分钟，1 分钟 × 24 小时
+DEFAULT_TIERS = ((1, 600), (60, 1440))
+
+
+class HistoryTier:
+    """单一分辨率的环形缓冲区"""
+
+    def __init__(self, step, capacity):
+        self.step = step
+        self.capacity = capacity
+        self.ts = array('d', [0.0]) * capacity
+        self.cols = {}
+        self.head = 0  # 下一个写入位置
+        self.count = 0
+        self._bucket = None
+        self._sums = {}
+        self._counts = {}
+
+    def add(self, t, values):
+        bucket = t - t % self.step
+        if self._bucket is not None and bucket != self._bucket:
+            self._flush()
+        self._bucket = bucket
+        for name, val in values.items():
+            self._sums[name] = self._sums.get(name, 0.0) + val
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def _flush(self):
+        i = self.head
+        self.ts[i] = self._bucket
+        for col in self.cols.values():
+            col[i] = NAN
+        for name, total in self._sums.items():
+            self._column(name)[i] = total / self._counts[name]
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self._sums.clear()
+        self._counts.clear()
+
+    def _column(self, name):
+        col = self.cols.get(name)
+        if col is None:
+            col = self.cols[name] = array('d', [NAN]) * self.capacity
+        return col
+
+    def _phys(self, j):
+        """逻辑下标（0 = 最旧）转物理下标"""
+        return (self.head - self.count + j) % self.capacity
+
+    def oldest(self):
+        return self.ts[self._phys(0)] if self.count else None
+
+    def wrapped(self):
+        return self.count == self.capacity
+
+    def since(self, t, names):
+        """返回时间戳严格大于 t 的样本：(时间戳列表, {指标: 数值列表})"""
+        # 时间戳单调递增，二分查找起点
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts[self._phys(mid)] <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        idx = [self._phys(j) for j in range(lo, self.count)]
+        out = {}
+        for name in names:
+            col = self.cols.get(name)
+            if col is None:
+                continue
+            out[name] = [None if math.isnan(col[i]) else round(col[i], 2) for i in idx]
+        return [self.ts[i] for i in idx], out
+
+
+class History:
+    """多分辨率历史，record() 写入，query() 按游标增量读取"""
+
+    def __init__(self, tiers=DEFAULT_TIERS, max_metrics=64):
+        self.tiers = [HistoryTier(step, cap) for step, cap in tiers]
+        self.max_metrics = max_metrics
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def record(self, t, snapshot):
+        """记录一份快照里的所有数值型指标（非数值字段直接跳过）"""
+        values = {}
+        for name, val in snapshot.items():
+            if isinstance(val, bool) or not isinstance(val, (int, float)):
+                continue
+            if name not in self.metrics:
+                if len(self.metrics) >= self.max_metrics:
+                    continue
+                self.metrics.append(name)
+            values[name] = float(val)
+        with self._lock:
+            for tier in self.tiers:
+                tier.add(t, values)
+
+    def pick_tier(self, since=None, resolution=None):
+        if resolution is not None:
+            for tier in self.tiers:
+                if tier.step == resolution:
+                    return tier
+            raise ValueError(f"unknown resolution: {resolution}")
+        # 选能覆盖 since 的最细档位；都覆盖不到就用最粗的
+        for tier in self.tiers:
+            if since is None or not tier.wrapped() or tier.oldest() <= since:
+                return tier
+        return self.tiers[-1]
+
+    def query(self, names=None, since=0.0, resolution=None):
+        with self._lock:
+            tier = self.pick_tier(since, resolution)
+            names = [n for n in (names or self.metrics) if n in tier.cols]
+            ts, cols = tier.since(since or 0.0, names)
+        return {
+            "resolution": tier.step,
+            "cursor": ts[-1] if ts else since,
+            "t": ts,
+            "metrics": cols,
+        }
@@ -0,0 +1,254 @@
+"""低延迟输入通道：带认证的 UDP 二进制协议（端口 50002，紧挨着 50001 自动发现）
+
+定长数据报，每包 28 字节：
+
+    magic(2) 'SM' | version(1) | opcode(1) | session(u32) | seq(u32) | a(i32) | b(i32) | mac(8)
+
+  - mac 是以配对码为密钥的 HMAC-SHA256 前 8 字节，覆盖前面所有字段，配对码不对的包直接丢弃
+  - 握手：客户端发 HELLO（session = 0，a、b 是客户端随机数），服务端回 WELCOME（原样带回随机数）
+    和一个服务端生成的随机 session；之后的包都带这个 session，服务端不认识的 session 一律丢弃
+    并回 RESET，客户端重新握手。序号 / 去重状态跟着 session 走，和来源地址无关：
+    换了端口的客户端照常工作，抓到的包从别的端口重放也会被当成重复包丢掉
+  - 同一 session 内 seq 从 1 递增，每个 seq 只执行一次（滑动窗口去重），客户端可以放心重发
+  - MOVE / SCROLL：a、b 是 1/100 像素的 dx / dy（SCROLL 只用 b），是相对位移，乱序到达也照常累加
+  - ABS_MOVE：a、b 是 0..65535 归一化的屏幕坐标，比已处理的最新 seq 旧就丢弃（位置已经被覆盖了）
+  - ABS_DOWN：同上坐标，带按下，属于按键类事件，不会被丢弃
+服务端每次把 socket 里积压的包一次性读完，连续的移动合并后再注入。
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import socket
+import struct
+from collections import OrderedDict
+
+INPUT_PORT = 50002
+MAGIC = b'SM'
+VERSION = 2
+_HEADER = struct.Struct('!2sBBIIii')
+MAC_SIZE = 8
+PACKET_SIZE = _HEADER.size + MAC_SIZE
+ABS_SCALE = 65535
+REL_SCALE = 100
+REPLAY_WINDOW = 1024  # 比最新 seq 旧这么多的包不再认
+
+OP_MOVE = 1
+OP_ABS_MOVE = 2
+OP_ABS_DOWN = 3
+OP_LEFT_DOWN = 4
+OP_LEFT_UP = 5
+OP_CLICK = 6
+OP_RIGHT_CLICK = 7
+OP_DOUBLE_CLICK = 8
+OP_SCROLL = 9
+OP_HELLO = 10
+OP_WELCOME = 11
+OP_RESET = 12
+
+_SIMPLE_ACTIONS = {
+    OP_LEFT_DOWN: 'left_down',
+    OP_LEFT_UP: 'left_up',
+    OP_CLICK: 'click',
+    OP_RIGHT_CLICK: 'right_click',
+    OP_DOUBLE_CLICK: 'double_click',
+}
+
+
+def _mac(code, body):
+    return hmac.new(str(code).encode('utf-8'), body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def encode_packet(code, opcode, session, seq, a=0, b=0):
+    body = _HEADER.pack(MAGIC, VERSION, opcode, session & 0xFFFFFFFF, seq & 0xFFFFFFFF, int(a), int(b))
+    return body + _mac(code, body)
+
+
+def decode_packet(code, data):
+    """校验并解析一个数据报，非法包返回 None"""
+    if len(data) != PACKET_SIZE:
+        return None
+    body, mac = data[:_HEADER.size], data[_HEADER.size:]
+    if not hmac.compare_digest(mac, _mac(code, body)):
+        return None
+    magic, version, opcode, session, seq, a, b = _HEADER.unpack(body)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return opcode, session, seq, a, b
+
+
+def to_event(opcode, a, b):
+    """把二进制事件翻译成 InputDispatcher 认识的 dict"""
+    if opcode == OP_MOVE:
+        return {'action': 'move', 'dx': a / REL_SCALE, 'dy': b / REL_SCALE}
+    if opcode == OP_SCROLL:
+        return {'action': 'scroll', 'dy': b / REL_SCALE}
+    if opcode in (OP_ABS_MOVE, OP_ABS_DOWN):
+        return {'action': 'absolute_move' if opcode == OP_ABS_MOVE else 'absolute_move_down',
+                'x': a / ABS_SCALE, 'y': b / ABS_SCALE}
+    action = _SIMPLE_ACTIONS.get(opcode)
+    return {'action': action} if action else None
+
+
+class _Session:
+    """一次握手的序号状态：highest 是见过的最大 seq，seen 的第 i 位表示 highest - i 已经处理过"""
+
+    def __init__(self, session):
+        self.session = session
+        self.highest = 0
+        self.seen = 1  # seq 0 留给握手
+
+    def check(self, seq):
+        """每个 seq 只放行一次；返回 (是否放行, 是否是目前最新的包)"""
+        if seq > self.highest:
+            self.seen = ((self.seen << (seq - self.highest)) | 1) & ((1 << REPLAY_WINDOW) - 1)
+            self.highest = seq
+            return True, True
+        offset = self.highest - seq
+        if offset >= REPLAY_WINDOW or self.seen >> offset & 1:
+            return False, False
+        self.seen |= 1 << offset
+        return True, False
+
+
+class InputChannel:
+    def __init__(self, dispatcher, get_code, host='0.0.0.0', port=INPUT_PORT, max_batch=256, max_sessions=64):
+        self.dispatcher = dispatcher
+        self.get_code = get_code
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.received = 0
+        self.dropped = 0
+        self.sock = None
+
+    def open_session(self):
+        session = 0
+        while not session or session in self.sessions:
+            session = secrets.randbits(32)
+        if len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)  # 最久没用过的，真客户端收到 RESET 会重新握手
+        self.sessions[session] = _Session(session)
+        return session
+
+    def accept(self, packet):
+        """按 session / seq 过滤，返回要执行的事件或 None"""
+        opcode, session, seq, a, b = packet
+        state = self.sessions.get(session)
+        if state is None:
+            return None
+        self.sessions.move_to_end(session)
+        fresh, newest = state.check(seq)
+        if not fresh:
+            return None  # 重发 / 重放的包
+        if opcode == OP_ABS_MOVE and not newest:
+            return None  # 过期的绝对位置，已经有更新的了
+        return to_event(opcode, a, b)
+
+    def handle(self, datagrams):
+        """处理一批 (data, addr)，合并后注入，返回注入的动作数"""
+        code = self.get_code()
+        events = []
+        replies = []
+        for data, addr in datagrams:
+            self.received += 1
+            packet = decode_packet(code, data)
+            if packet is not None and packet[0] == OP_HELLO:
+                _, _, _, a, b = packet
+                replies.append((encode_packet(code, OP_WELCOME, self.open_session(), 0, a, b), addr))
+                continue
+            if packet is not None and packet[1] not in self.sessions:
+                replies.append((encode_packet(code, OP_RESET, packet[1], 0), addr))
+            event = self.accept(packet) if packet else None
+            if event is None:
+                self.dropped += 1
+                continue
+            events.append(event)
+        if self.sock is not None:
+            for reply, addr in replies:
+                try:
+                    self.sock.sendto(reply, addr)
+                except OSError:
+                    pass
+        return self.dispatcher.apply_batch(events) if events else 0
+
+    def bind(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.port = self.sock.getsockname()[1]
+        return self
+
+    def serve_forever(self):
+        if self.sock is None:
+            self.bind()
+        sock = self.sock
+        while True:
+            try:
+                sock.setblocking(True)
+                batch = [sock.recvfrom(64)]
+                # 把积压的包一次读完，合并后只注入一次
+                sock.setblocking(False)
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(sock.recvfrom(64))
+                    except (BlockingIOError, InterruptedError):
+                        break
+                self.handle(batch)
+            except Exception:
+                # Windows 上对端关闭时 recvfrom 会抛 ConnectionResetError，忽略继续收
+                continue
+
+
+class InputClient:
+    """协议的参考客户端（基准测试和调试用）：第一次发送前握手，收到 RESET 时重新握手"""
+
+    def __init__(self, code, host='127.0.0.1', port=INPUT_PORT, timeout=1.0):
+        self.code = code
+        self.addr = (host, port)
+        self.timeout = timeout
+        self.session = None
+        self.seq = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def handshake(self):
+        nonce = struct.unpack('!ii', os.urandom(8))
+        self.sock.settimeout(self.timeout)
+        self.sock.sendto(encode_packet(self.code, OP_HELLO, 0, 0, *nonce), self.addr)
+        try:
+            while True:
+                packet = decode_packet(self.code, self.sock.recv(64))
+                if packet and packet[0] == OP_WELCOME and packet[3:] == nonce:
+                    break
+        except socket.timeout:
+            raise ConnectionError("input channel handshake timed out") from None
+        finally:
+            self.sock.setblocking(False)
+        self.session, self.seq = packet[1], 0
+        return self.session
+
+    def _reset_pending(self):
+        while True:
+            try:
+                packet = decode_packet(self.code, self.sock.recv(64))
+            except (BlockingIOError, InterruptedError):
+                return False
+            except OSError:
+                return False  # Windows：上一个包被拒收时会抛 ConnectionResetError
+            if packet and packet[0] == OP_RESET and packet[1] == self.session:
+                return True
+
+    def send(self, opcode, a=0, b=0):
+        if self.session is None or self._reset_pending():
+            self.handshake()
+        self.seq += 1
+        self.sock.sendto(encode_packet(self.code, opcode, self.session, self.seq, a, b), self.addr)
+        return self.seq
+
+    def move(self, dx, dy):
+        return self.send(OP_MOVE, round(dx * REL_SCALE), round(dy * REL_SCALE))
+
+    def absolute(self, x, y, down=False):
+        return self.send(OP_ABS_DOWN if down else OP_ABS_MOVE, round(x * ABS_SCALE), round(y * ABS_SCALE))
@@ -0,0 +1,199 @@
+"""鼠标 / 键盘注入：可替换的后端 + 事件分发（支持批量）
+
+  - PyAutoGuiBackend：真实注入，首次使用时才 import pyautogui
+  - RecordingBackend：只记录调用，Linux 无桌面环境下也能跑
+  - InputDispatcher：单个事件 apply()，批量事件 apply_batch()，
+    连续的相对移动 / 滚动会合并成一次调用，其余事件按顺序回放
+相对移动的小数部分会累积到下一次，慢速滑动时不会被取整吃掉。
+"""
+import math
+import threading
+
+
+class PyAutoGuiBackend:
+    """pyautogui 注入后端"""
+
+    def __init__(self):
+        self._gui = None
+
+    @property
+    def gui(self):
+        if self._gui is None:
+            import pyautogui
+            pyautogui.PAUSE = 0              # 禁用所有命令后的默认延迟
+            pyautogui.MINIMUM_DURATION = 0   # 把动画时间设为 0，实现“瞬移”
+            pyautogui.FAILSAFE = False       # 禁用死角保护（防止画画时划到角落崩溃）
+            self._gui = pyautogui
+        return self._gui
+
+    def size(self):
+        return self.gui.size()
+
+    def move_rel(self, dx, dy):
+        self.gui.moveRel(dx, dy, _pause=False)
+
+    def move_to(self, x, y):
+        self.gui.moveTo(x, y, _pause=False)
+
+    def mouse_down(self, button='left'):
+        self.gui.mouseDown(button=button, _pause=False)
+
+    def mouse_up(self, button='left'):
+        self.gui.mouseUp(button=button, _pause=False)
+
+    def click(self):
+        self.gui.click(_pause=False)
+
+    def right_click(self):
+        self.gui.rightClick(_pause=False)
+
+    def double_click(self):
+        self.gui.doubleClick(_pause=False)
+
+    def scroll(self, amount):
+        self.gui.scroll(amount, _pause=False)
+
+    def hotkey(self, *keys):
+        self.gui.hotkey(*keys)
+
+
+class RecordingBackend:
+    """假后端：把所有调用记到 calls 里，用于测试和基准"""
+
+    def __init__(self, screen=(1920, 1080)):
+        self.screen = screen
+        self.calls = []
+
+    def size(self):
+        return self.screen
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def record(*args, **kwargs):
+            self.calls.append((name,) + args)
+        return record
+
+
+# 事件里必须是数字的字段
+_NUMERIC = ('t', 'dx', 'dy', 'x', 'y')
+
+
+def _check(event):
+    """批量事件先整体校验一遍（格式不对抛 ValueError），避免执行到一半才出错；返回时间戳"""
+    if not isinstance(event, dict):
+        raise ValueError(f"bad input event: {event!r}")
+    for key in _NUMERIC:
+        value = event.get(key)
+        if value is None:
+            continue
+        try:
+            if isinstance(value, bool) or not math.isfinite(float(value)):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f"bad '{key}' in input event: {value!r}") from None
+    return float(event.get('t') or 0)
+
+
+# 三指手势快捷键
+HOTKEYS = {
+    'task_view': ('win', 'tab'),      # 三指上滑：任务视图 (Win+Tab)
+    'show_desktop': ('win', 'd'),     # 三指下滑：显示桌面 (Win+D)
+    'alt_tab': ('alt', 'tab'),        # 三指左右滑：切换应用 (Alt+Tab)
+}
+
+
+class InputDispatcher:
+    def __init__(self, backend):
+        self.backend = backend
+        self._screen = None
+        self._rx = 0.0
+        self._ry = 0.0
+        self._lock = threading.Lock()  # Flask 多线程下保证事件不交错
+
+    @property
+    def screen(self):
+        # 获取电脑屏幕的真实宽高（只需获取一次即可）
+        if self._screen is None:
+            self._screen = self.backend.size()
+        return self._screen
+
+    def _move_rel(self, dx, dy):
+        self._rx += dx
+        self._ry += dy
+        ix, iy = int(self._rx), int(self._ry)
+        self._rx -= ix
+        self._ry -= iy
+        if ix or iy:
+            self.backend.move_rel(ix, iy)
+
+    def _apply(self, event, sens):
+        action = event.get('action')
+        b = self.backend
+
+        # 1. 基础鼠标操作
+        if action == 'move':
+            self._move_rel(float(event.get('dx') or 0) * sens, float(event.get('dy') or 0) * sens)
+        elif action == 'click':
+            b.click()
+        elif action == 'left_down':
+            b.mouse_down('left')
+        elif action == 'left_up':
+            b.mouse_up('left')
+        elif action == 'right_click':
+            b.right_click()
+        elif action == 'double_click':
+            b.double_click()
+        elif action == 'scroll':
+            b.scroll(int(float(event.get('dy') or 0) * 20))
+
+        # 2. 三指手势快捷键
+        elif action in HOTKEYS:
+            b.hotkey(*HOTKEYS[action])
+
+        # 3. 数位板绝对坐标控制
+        elif action in ('absolute_move', 'absolute_move_down'):
+            width, height = self.screen
+            x = event.get('x')
+            y = event.get('y')
+            x_pct = max(0.0, min(1.0, float(0.5 if x is None else x)))
+            y_pct = max(0.0, min(1.0, float(0.5 if y is None else y)))
+            b.move_to(int(x_pct * width), int(y_pct * height))
+            if action == 'absolute_move_down':
+                # 瞬间移动过去，然后按下左键！
+                b.mouse_down('left')
+        # 不认识的动作直接忽略，和老版本 /mouse 的行为保持一致
+
+    def apply(self, event):
+        """执行单个事件（/mouse 的老接口）"""
+        with self._lock:
+            self._apply(event, float(event.get('sensitivity', 1.0)))
+
+    def apply_batch(self, events, sensitivity=1.0):
+        """按时间戳顺序回放一批事件，返回实际执行的动作数
+
+        连续的 move 累加成一次 move，连续的 scroll 累加成一次 scroll，
+        连续的 absolute_move 只保留最后一个；任何其它事件都会打断合并，保证按下 / 抬起和移动的先后关系不变。
+        """
+        if not isinstance(events, list):
+            raise ValueError("events must be a list")
+        keys = [_check(e) for e in events]
+        # 稳定排序，同一时间戳保持原顺序
+        events = [e for _, e in sorted(zip(keys, events), key=lambda pair: pair[0])]
+        merged = []
+        for e in events:
+            action = e.get('action')
+            prev = merged[-1] if merged else None
+            if prev is not None and action in ('move', 'scroll') and prev['action'] == action:
+                prev['dx'] = float(prev.get('dx') or 0) + float(e.get('dx') or 0)
+                prev['dy'] = float(prev.get('dy') or 0) + float(e.get('dy') or 0)
+            elif prev is not None and action == 'absolute_move' and prev['action'] == action:
+                prev['x'], prev['y'] = e.get('x', 0.5), e.get('y', 0.5)  # 只保留最新的绝对位置
+            else:
+                merged.append({k: v for k, v in e.items() if k != 't'})
+
+        with self._lock:
+            for e in merged:
+                self._apply(e, float(sensitivity))
+        return len(merged)
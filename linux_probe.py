@@ -0,0 +1,179 @@
+"""Linux 原生探针：/proc 和 /sys 里直接读规格、内存和 GPU
+
+  - /proc/cpuinfo：处理器型号（只在启动时读一次）
+  - /proc/meminfo：内存总量 / 可用量
+  - /sys/class/drm/card*/device/gpu_busy_percent：AMD / Intel 显卡占用率
+  - .../device/hwmon/hwmon*/temp*_input：显卡温度（毫摄氏度）
+每轮都要读的文件启动时打开一次，之后用 os.pread 从偏移 0 重新读，内核每次都会生成最新内容。
+root 可以指向一个假的目录树，不用真机器就能测试。
+"""
+import glob
+import os
+
+# PCI 厂商号 -> 名称
+VENDORS = {
+    '0x1002': 'AMD',
+    '0x10de': 'NVIDIA',
+    '0x8086': 'Intel',
+    '0x1af4': 'Virtio',
+}
+
+
+class PreadFile:
+    """保持打开的只读文件，read() 每次从头读"""
+
+    def __init__(self, path, size=8192):
+        self.path = path
+        self.size = size
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read(self):
+        return os.pread(self.fd, self.size, 0).decode('utf-8', errors='replace')
+
+    def read_int(self):
+        return int(self.read().strip())
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _open(path):
+    try:
+        return PreadFile(path)
+    except OSError:
+        return None
+
+
+def _read_text(path):
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class GpuCard:
+    """一块显卡：名称 + 常开的占用率 / 温度文件（没有的为 None）"""
+
+    def __init__(self, card_dir):
+        device = os.path.join(card_dir, 'device')
+        self.card = os.path.basename(card_dir)
+        self.name = self._name(device)
+        self.busy = _open(os.path.join(device, 'gpu_busy_percent'))
+        temps = sorted(glob.glob(os.path.join(device, 'hwmon', 'hwmon*', 'temp*_input')))
+        self.temp = _open(temps[0]) if temps else None
+
+    @staticmethod
+    def _name(device):
+        vendor = VENDORS.get((_read_text(os.path.join(device, 'vendor')) or '').lower())
+        driver = None
+        for line in (_read_text(os.path.join(device, 'uevent')) or '').splitlines():
+            key, _, value = line.partition('=')
+            if key == 'DRIVER':
+                driver = value
+        if vendor and driver:
+            return f"{vendor} ({driver})"
+        return vendor or driver or "通用显示适配器"
+
+    def read(self):
+        """(占用率, 温度)，读不到的是 None"""
+        load = temp = None
+        try:
+            if self.busy is not None:
+                load = float(self.busy.read_int())
+        except (OSError, ValueError):
+            pass
+        try:
+            if self.temp is not None:
+                temp = round(self.temp.read_int() / 1000, 1)
+        except (OSError, ValueError):
+            pass
+        return load, temp
+
+    def close(self):
+        for f in (self.busy, self.temp):
+            if f is not None:
+                f.close()
+
+
+class LinuxProbe:
+    def __init__(self, root='/'):
+        self.root = root
+        self._meminfo = _open(self._path('proc', 'meminfo'))
+        # card0、card1 ...；card0-HDMI-A-1 这种是显示接口，不是显卡
+        cards = sorted(d for d in glob.glob(self._path('sys', 'class', 'drm', 'card*'))
+                       if os.path.basename(d)[4:].isdigit())
+        self.gpus = [GpuCard(d) for d in cards]
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    # ---------- 规格（启动时读一次） ----------
+
+    def cpu_model(self):
+        """/proc/cpuinfo 里的型号；ARM 上没有 model name，退回 Hardware / Model"""
+        found = {}
+        for line in (_read_text(self._path('proc', 'cpuinfo')) or '').splitlines():
+            key, _, value = line.partition(':')
+            key, value = key.strip(), value.strip()
+            if value and key not in found:
+                found[key] = value
+        for key in ('model name', 'Hardware', 'Model', 'cpu model'):
+            if key in found:
+                return " ".join(found[key].split())
+        return None
+
+    def gpu_names(self):
+        names = []
+        for gpu in self.gpus:
+            if gpu.name not in names:
+                names.append(gpu.name)
+        return names
+
+    # ---------- 每轮采样 ----------
+
+    def meminfo(self, fields=None):
+        """{字段: 字节数}；给了 fields 时只解析这些，找齐了就不再往下看"""
+        if self._meminfo is None:
+            return {}
+        info = {}
+        for line in self._meminfo.read().splitlines():
+            key, _, value = line.partition(':')
+            if fields is not None and key not in fields:
+                continue
+            parts = value.split()
+            if parts and parts[0].isdigit():
+                info[key] = int(parts[0]) * (1024 if parts[1:] == ['kB'] else 1)
+                if fields is not None and len(info) == len(fields):
+                    break
+        return info
+
+    def ram_percent(self):
+        """和 psutil 的口径一致：(总量 - 可用) / 总量"""
+        # 这几项都在 /proc/meminfo 的前五行
+        info = self.meminfo(('MemTotal', 'MemFree', 'MemAvailable', 'Cached'))
+        total = info.get('MemTotal')
+        if not total:
+            return None
+        available = info.get('MemAvailable', info.get('MemFree', 0) + info.get('Cached', 0))
+        return round((total - available) / total * 100, 1)
+
+    def gpu_load(self):
+        """(占用率, 温度)：多块显卡取最忙的那块；没有任何可读的计数器时返回 None"""
+        best = None
+        for gpu in self.gpus:
+            load, temp = gpu.read()
+            if load is None and temp is None:
+                continue
+            sample = (load or 0.0, temp or 0)
+            if best is None or sample[0] > best[0]:
+                best = sample
+        return best
+
+    def close(self):
+        if self._meminfo is not None:
+            self._meminfo.close()
+        for gpu in self.gpus:
+            gpu.close()
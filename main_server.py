@@ -2,9 +2,6 @@ import sys
 import os
 import subprocess
 import platform
-import pyautogui
-import pyperclip
-import pyautogui
 
 # ================= 🔴 核心修改：在导入任何第三方库之前，先劫持 Popen =================
 # 必须放在 import GPUtil 或 import wmi 之前，否则这些库会使用原版 Popen 导致闪烁
@@ -43,23 +40,37 @@ if platform.system() == "Windows":
 import psutil
 import socket
 import threading
+import asyncio
 import random
 import time
 import json
-import customtkinter as ctk
-from PIL import Image, ImageDraw
-import pystray
-import winreg
+import logging
 import multiprocessing
-from flask import send_file
+from collections import deque
+from flask import Response
+from breakdown import Breakdown
+from collectors import CollectorScheduler, Snapshot
+from gpu_sampler import TypeperfSampler
+from history import History
+import stats_stream
+from process_table import ProcessTable
+import file_listing
+import transfers
+from input_control import InputDispatcher, PyAutoGuiBackend
+import input_channel
+import wsgi_server
+import platform_adapters
+import wire_format
+import alerts
+import fleet
+import discovery
 
 # 尝试导入高级库
+# 界面（customtkinter / PIL / pystray）、键鼠注入（pyautogui / pyperclip）、GPUtil、WMI 都改成第一次用到时才导入，
+# 开机自启时 /status 不用等它们加载完；python benchmark.py startup 检查有没有被重新放回顶部
 try:
     from flask import Flask, jsonify, request
     from flask_cors import CORS
-    import GPUtil  # 👈 现在 GPUtil 导入时，会获取到我们需要静默的 Popen
-    import wmi
-    import pyautogui
     import screen_server
 except ImportError:
     print("❌ 缺少必要库...")
@@ -78,7 +89,34 @@ else:
 # --------------------------------
 # --- 配置持久化处理 ---
 CONFIG_FILE = "config.json"
-pyautogui.FAILSAFE = False  # 🌟 SRE 建议：防止鼠标移到角落报错
+
+# --- 日志 ---
+# 服务线程不能直接写 Tk 控件，而且服务比界面先启动：日志先放这里，界面每次刷新时取走（deque 的 append / popleft 线程安全）
+# --headless 没有界面，同一份日志写文件（见 setup_file_logging）
+LOG_LINES = deque(maxlen=200)
+LOGGER = logging.getLogger("server_monitor")
+
+
+def log(line):
+    LOG_LINES.append(line)
+    LOGGER.info(line)
+
+
+def setup_file_logging(path):
+    """日志写到文件，1MB 轮转、保留 3 份"""
+    from logging.handlers import RotatingFileHandler
+    handler = RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8')
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(logging.INFO)
+
+
+def arg_value(name, default=None):
+    """命令行里 `name value` 形式的参数"""
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
 
 # --- 📍 在 import 之后，MonitorUI 类之前，加入这个函数 ---
 def resource_path(relative_path):
@@ -101,86 +139,30 @@ def get_local_ip():
         return "127.0.0.1"
 
 
-def udp_discovery_listener(ui_log_box):
-    """还原原版的 UDP 自动发现协议"""
-    UDP_PORT = 50001  # 🌟 严格还原原版的端口
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-            # 允许端口复用
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            sock.bind(('0.0.0.0', UDP_PORT))
-            ui_log_box.insert("end", f"\n[✔️] 局域网自动发现已启动 (UDP:{UDP_PORT})")
-
-            while True:
-                data, addr = sock.recvfrom(1024)
-                msg = data.decode('utf-8', errors='ignore')
-
-                # 🌟 严格还原原版的“接头暗号”
-                # 注意：这里的 SECRET_CODE 是你代码里的全局变量
-                if msg.startswith(f"FIND_SERVER:{SECRET_CODE}"):
-                    ui_log_box.insert("end", f"\n[🔍] 匹配到设备 {addr[0]}，配对码正确，已响应！")
-                    ui_log_box.see("end")
-                    # 🌟 严格还原原版的响应内容
-                    sock.sendto("HERE_I_AM".encode('utf-8'), addr)
-    except Exception as e:
-        ui_log_box.insert("end", f"\n[❌] 自动发现服务启动失败: {e}")
-pyautogui.PAUSE = 0              # 禁用所有命令后的默认延迟
-pyautogui.MINIMUM_DURATION = 0   # 把动画时间设为 0，实现“瞬移”
-pyautogui.FAILSAFE = False       # 禁用死角保护（防止画画时划到角落崩溃）
-
-
-#自启动
-def manage_autostart(enable=True):
-    key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
-    app_name = "ServerMonitorProbe"
-
-    # ✅ 修改点：使用 sys.executable 获取绝对准确的 EXE 路径
-    if getattr(sys, 'frozen', False):
-        exe_path = sys.executable
-    else:
-        exe_path = os.path.abspath(sys.argv[0])
-
-    try:
-        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_ALL_ACCESS)
-        if enable:
-            # ✅ 加双引号包裹路径，防止路径中有空格导致无法启动
-            winreg.SetValueEx(key, app_name, 0, winreg.REG_SZ, f'"{exe_path}"')
-        else:
-            try:
-                winreg.DeleteValue(key, app_name)
-            except FileNotFoundError:
-                pass
-        winreg.CloseKey(key)
-        return True
-    except Exception as e:
-        print(f"自启设置失败: {e}")
-        return False
-
-#检测当前程序是否已设置为随 Windows 系统启动而自动运行
-def check_autostart_status():
-    key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
-    try:
-        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_READ)
-        winreg.QueryValueEx(key, "ServerMonitorProbe")
-        winreg.CloseKey(key)
-        return True
-    except:
-        return False
-
-#读取配对码，若不存在则生成一个随机的
-def load_config():
+#读取整个配置文件（配对码、告警规则……），读不到返回空 dict
+def read_config():
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f).get("secret_code")
+                return json.load(f)
         except:
             pass
-    return str(random.randint(100000, 999999))
+    return {}
+
+#只改给定的字段，其余原样保留（原来保存配对码会把别的配置冲掉）
+def update_config(**fields):
+    config = read_config()
+    config.update(fields)
+    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+
+#读取配对码，若不存在则生成一个随机的
+def load_config():
+    return read_config().get("secret_code") or str(random.randint(100000, 999999))
 
 #自定义配对码
 def save_config(code):
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump({"secret_code": str(code)}, f)
+    update_config(secret_code=str(code))
 
 # 🔥 新增：资源寻址函数
 def get_resource_path(relative_path):
@@ -193,9 +175,12 @@ def get_resource_path(relative_path):
 
 # --- 初始化 ---
 SECRET_CODE = load_config()
-w_info = wmi.WMI()
+ui = None
 app = Flask(__name__)
-CURRENT_STATS = {"cpu": 0, "ram": 0, "disk": 0, "gpu": 0, "gpu_temp": 0, "net_up": 0, "net_down": 0}
+CURRENT_STATS = Snapshot({"cpu": 0, "ram": 0, "disk": 0, "gpu": 0, "gpu_temp": 0, "net_up": 0, "net_down": 0})
+# 分项指标（每核 / 每网卡 / 每磁盘 / 每分区），同样是整体替换的只读快照，见 /status/detail
+DETAIL_STATS = Snapshot()
+_DETAIL_LOCK = threading.Lock()
 LAST_NET_IO = psutil.net_io_counters()
 LAST_NET_TIME = time.time()
 SYSTEM_SPECS = {}
@@ -225,11 +210,9 @@ def check_auth():
         return jsonify({"error": "Auth Failed"}), 401
 
 
-# 🔥 重要：关闭安全保护，防止数位板笔尖滑到屏幕死角时程序崩溃
-pyautogui.FAILSAFE = False
-
-# 获取电脑屏幕的真实宽高（只需获取一次即可）
-SCREEN_WIDTH, SCREEN_HEIGHT = pyautogui.size()
+# 鼠标注入统一走 InputDispatcher，后端可替换（测试时换成 RecordingBackend）
+# PyAutoGuiBackend 第一次注入时才 import pyautogui，并在那里关掉死角保护和默认延迟
+INPUT = InputDispatcher(PyAutoGuiBackend())
 
 
 # 📂 新接口 1：查看目录下的文件
@@ -244,84 +227,72 @@ def list_files():
         return jsonify([{"name": d, "type": "dir", "path": d, "size": 0} for d in drives])
 
     # 如果有路径，列出该路径下的所有文件和文件夹
+    # ?offset=&limit= 分页（总数和下一页位置放在响应头里，返回体仍是列表）
+    # ?stream=1 边枚举边输出（不排序），超大目录也能先出第一屏
     try:
-        items = []
-        for item in os.listdir(path):
-            full_path = os.path.join(path, item)
-            is_dir = os.path.isdir(full_path)
-            # 获取文件大小 (如果是文件夹就不计算了，为了速度)
-            size = os.path.getsize(full_path) if not is_dir else 0
-            items.append({
-                "name": item,
-                "type": "dir" if is_dir else "file",
-                "path": full_path,
-                "size": size
-            })
-        # 把文件夹排在前面，文件排在后面
-        items.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
-        return jsonify(items)
+        if request.args.get('stream'):
+            return Response(file_listing.iter_json(path), mimetype='application/json')
+
+        items = DIR_CACHE.listing(path)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = request.args.get('limit')
+        end = offset + max(int(limit), 1) if limit else len(items)
+        resp = jsonify(items[offset:end])
+        resp.headers['X-Total-Count'] = str(len(items))
+        if end < len(items):
+            resp.headers['X-Next-Offset'] = str(end)
+        return resp
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
 # ⬇️ 新接口 2：一键下载文件
+# 支持 Range 断点续传；?compress=gzip|zstd|auto 对文本类文件边读边压；
+# 文件夹加 ?zip=1 流式打包下载
 @app.route('/download', methods=['GET'])
 def download_file():
     path = request.args.get('path')
-    if not os.path.exists(path) or os.path.isdir(path):
+    if not path or not os.path.exists(path):
         return "File not found", 404
-    # send_file 是 Flask 自带的黑科技，支持断点续传和极速分发
-    return send_file(path, as_attachment=True)
+    if os.path.isdir(path):
+        if request.args.get('zip'):
+            return transfers.stream_zip(path, compress=bool(request.args.get('compress')))
+        return "File not found", 404
+
+    # 压缩流没法按字节续传，带 Range 的请求一律走原文件
+    if not request.headers.get('Range'):
+        encoding = transfers.pick_encoding(path, request.args.get('compress'),
+                                           request.headers.get('Accept-Encoding', ''))
+        if encoding:
+            return transfers.send_compressed(path, encoding)
+    return transfers.send_ranged(path)
 
 @app.route('/mouse', methods=['POST'])
 def mouse_control():
     try:
-        data = request.json
-        action = data.get('action')
-        sens = data.get('sensitivity', 1.0)
-
-        # 1. 基础鼠标操作
-        if action == 'move':
-            pyautogui.moveRel(data.get('dx') * sens, data.get('dy') * sens, _pause=False)
-        elif action == 'click':
-            pyautogui.click(_pause=False)
-        elif action == 'left_down':
-            pyautogui.mouseDown(button='left', _pause=False)
-        elif action == 'left_up':
-            pyautogui.mouseUp(button='left', _pause=False)
-        elif action == 'right_click':
-            pyautogui.rightClick(_pause=False)
-        elif action == 'double_click':
-            pyautogui.doubleClick(_pause=False)
-        elif action == 'scroll':
-            pyautogui.scroll(int(data.get('dy') * 20), _pause=False)
-
-        # 2. 三指手势快捷键
-        elif action == 'task_view':
-            # 三指上滑：任务视图 (Win+Tab)
-            pyautogui.hotkey('win', 'tab')
-        elif action == 'show_desktop':
-            # 三指下滑：显示桌面 (Win+D)
-            pyautogui.hotkey('win', 'd')
-        elif action == 'alt_tab':
-            # 三指左右滑：切换应用 (Alt+Tab)
-            pyautogui.hotkey('alt', 'tab')
-
-        # 3. 🔥 新增：数位板绝对坐标控制 🔥
-        elif action == 'absolute_move_down':
-            x_pct = max(0.0, min(1.0, float(data.get('x', 0.5))))
-            y_pct = max(0.0, min(1.0, float(data.get('y', 0.5))))
-            target_x = int(x_pct * SCREEN_WIDTH)
-            target_y = int(y_pct * SCREEN_HEIGHT)
-            # 瞬间移动过去，然后按下左键！
-            pyautogui.moveTo(target_x, target_y, _pause=False)
-            pyautogui.mouseDown(button='left', _pause=False)
-
+        INPUT.apply(request.json)
         return jsonify({"status": "success"})
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)}), 500
 
 
+# 批量输入：一次请求带几十毫秒的事件 [{"t": 毫秒, "action": "move", "dx": 1, "dy": 2}, ...]
+# 连续的 move / scroll 会合并，其余事件按时间戳顺序回放
+@app.route('/mouse/batch', methods=['POST'])
+def mouse_batch():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object with 'events'")
+        applied = INPUT.apply_batch(data.get('events', []), float(data.get('sensitivity', 1.0)))
+        return jsonify({"status": "success", "applied": applied})
+    except ValueError as e:
+        # 时间戳 / 坐标不是数字之类的：整批拒绝，一个都不执行
+        return jsonify({"status": "error", "msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"status": "error", "msg": str(e)}), 500
+
+
 # 🔥🔥🔥 新增：键盘输入接口 🔥🔥🔥
 # 🔥🔥🔥 升级：支持中文/全语言的键盘输入接口 🔥🔥🔥
 @app.route('/keyboard', methods=['POST'])
@@ -329,11 +300,13 @@ def keyboard_control():
     try:
         text = request.json.get('text', '')
         if text:
+            import pyperclip
+
             # 1. 把手机发来的文字，悄悄塞进电脑的剪贴板
             pyperclip.copy(text)
 
             # 2. 模拟按下 Ctrl + V 进行粘贴
-            pyautogui.hotkey('ctrl', 'v')
+            INPUT.backend.hotkey('ctrl', 'v')
 
             # 如果你希望粘贴完自动按一下回车，可以解开下面这行的注释
             # pyautogui.press('enter')
@@ -344,24 +317,99 @@ def keyboard_control():
         return jsonify({"status": "error", "msg": str(e)}), 500
 
 #提供接口返回数据
+# Accept: application/vnd.server-monitor.stats 换成紧凑的列式格式（见 wire_format）；
+# 再带 ?since=游标 时一次返回游标之后缓存的所有样本，轮询慢的客户端不会漏点，游标在 X-Cursor 里
 @app.route('/status')
-def status(): return jsonify(CURRENT_STATS)
+def status():
+    if not wire_format.accepts(request.headers.get('Accept')):
+        return jsonify(CURRENT_STATS)
+    cursor = None
+    try:
+        since = request.args.get('since')
+        if since is None:
+            body = wire_format.encode_snapshot(time.time(), CURRENT_STATS)
+        else:
+            result = HISTORY.query(list(wire_format.FIELDS), float(since), HISTORY.tiers[0].step)
+            body, cursor = wire_format.encode_history(result), result["cursor"]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    resp = Response(body, content_type=wire_format.content_type())
+    resp.headers['Vary'] = 'Accept'
+    if cursor is not None:
+        resp.headers['X-Cursor'] = str(cursor)
+    return resp
+
+#历史曲线：只返回游标 since 之后的新样本（列式：t 一列，每个指标一列）
+@app.route('/history')
+def history():
+    names = [m for m in request.args.get('metric', '').split(',') if m]
+    try:
+        since = float(request.args.get('since', 0))
+        resolution = request.args.get('resolution')
+        resolution = int(resolution) if resolution else None
+        return jsonify(HISTORY.query(names or None, since, resolution))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+#告警：?since=事件游标，返回之后的触发 / 恢复事件、当前告警中的规则和规则列表
+#想要实时推送就订阅 stats_stream 端口的 /alerts
+@app.route('/alerts')
+def alert_events():
+    try:
+        return jsonify(ALERTS.since(int(request.args.get('since', 0))))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+#查看 / 修改告警规则：["cpu > 90 for 5m", "ram > 85 avg 1m"]，和配对码一起存在 config.json
+@app.route('/alerts/rules', methods=['GET', 'PUT'])
+def alert_rules():
+    if request.method == 'GET':
+        return jsonify([rule.text for rule in ALERTS.rules])
+    try:
+        rules = request.get_json(force=True)
+        if not isinstance(rules, list) or not all(isinstance(r, str) for r in rules):
+            raise ValueError("expected a JSON list of rule strings")
+        rules = ALERTS.validate(rules)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    ALERTS.set_rules(rules)
+    ALERT_HUB.publish_threadsafe(ALERTS.states())
+    update_config(alert_rules=rules)
+    log(f"[🔔] 告警规则已更新: {len(rules)} 条")
+    return jsonify(rules)
+
+#网关模式（--gateway）：局域网里所有探针的汇总，每台带新鲜度（age 秒、online、最近一次错误）
+@app.route('/fleet')
+def fleet_status():
+    if FLEET is None:
+        return jsonify({"error": "gateway mode is off (start with --gateway)"}), 404
+    return jsonify(FLEET.snapshot())
 
 #以JSON 格式返回服务器或主机的系统规格信息（如 CPU、内存、操作系统等）
+# 分项指标：{"t", "cpus": [每核%], "nics": {网卡: {up, down}}, "disks": {磁盘: {read, write}}, "partitions": [...]}
+# 数据量随核心 / 网卡数增长，所以不放进 /status 和推送流，需要的页面单独拉
+@app.route('/status/detail')
+def status_detail(): return jsonify(DETAIL_STATS)
+
+# 规格启动后就不变了：带 ETag，重连时 If-None-Match 对上直接 304
 @app.route('/specs')
-def specs(): return jsonify(SYSTEM_SPECS)
+def specs():
+    resp = jsonify(SYSTEM_SPECS)
+    resp.add_etag()
+    return resp.make_conditional(request)
 
-#任务管理器
+#任务管理器：读后台刷新的共享进程表快照，?sort=memory|cpu|io&limit=20&name=
 @app.route('/processes')
 def processes():
-    procs = []
-    for p in psutil.process_iter(['pid', 'name', 'memory_percent']):
-        try:
-            if p.info['memory_percent'] > 0.1: procs.append(p.info)
-        except:
-            pass
-    procs.sort(key=lambda x: x['memory_percent'], reverse=True)
-    return jsonify(procs[:20])
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 500)
+        procs = PROCESS_TABLE.top(request.args.get('sort', 'memory'), limit, request.args.get('name') or None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # 结果没变时返回 304，省掉重复传输
+    resp = jsonify(procs)
+    resp.add_etag()
+    return resp.make_conditional(request)
 
 #kill进程
 @app.route('/kill', methods=['POST'])
@@ -392,373 +440,214 @@ def power_action():
 @app.route('/show_ui')
 def show_ui_remote():
     # 利用 tkinter 的 after 方法在主线程执行，防止线程冲突导致崩溃
-    if 'ui' in globals() and ui:
+    if ui:
         ui.after(0, ui.show_window)
     return "OK"
 
 # --- 监控逻辑 ---
-def get_gpu_load_windows():
-    """获取 GPU 占用率（抗闪烁增强版）"""
-    # 1. 尝试 GPUtil (NVIDIA)
-    try:
-        # 由于我们在头部已经劫持了 subprocess，GPUtil 这里应该已经静默了
-        gpus = GPUtil.getGPUs()
-        if gpus:
-            return gpus[0].load * 100, gpus[0].temperature
-    except:
-        pass
+GPU_SAMPLER = None
 
-    # 2. 尝试 typeperf (集成显卡/AMD)
-    # 即使全局劫持了，我们这里也手动再加一层保险，因为这是循环调用的重灾区
-    try:
-        cmd = ['typeperf', r'\GPU Engine(*)\Utilization Percentage', '-sc', '1']
-
-        # 手动构建 STARTUPINFO，确保万无一失
-        si = subprocess.STARTUPINFO()
-        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        si.wShowWindow = subprocess.SW_HIDE
-
-        # 注意：这里调用的是 _original_popen，避开递归，但手动传入了所有静默参数
-        proc = _original_popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            stdin=subprocess.DEVNULL,  # 👈 关键：切断输入流
-            text=True,
-            creationflags=0x08000000,
-            startupinfo=si
-        )
-        stdout, _ = proc.communicate(timeout=2)  # 设置超时防止卡死
-
-        lines = stdout.strip().split('\n')
-        if len(lines) > 1:
-            data_row = lines[-1].split(',')
-            loads = [float(val.replace('"', '')) for val in data_row[1:] if val.strip().replace('"', '')]
-            return min(round(sum(loads), 1), 100.0), 0
-    except Exception:
-        pass
 
-    return 0, 0
+def get_gpu_sampler():
+    """首次使用时启动常驻 typeperf 采样器"""
+    global GPU_SAMPLER
+    if GPU_SAMPLER is None:
+        popen_kwargs = {}
+        popen = subprocess.Popen
+        if platform.system() == "Windows":
+            # 手动构建 STARTUPINFO，确保万无一失
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            si.wShowWindow = subprocess.SW_HIDE
+            # 注意：这里调用的是 _original_popen，避开递归，但手动传入了所有静默参数
+            popen = _original_popen
+            popen_kwargs = {"creationflags": 0x08000000, "startupinfo": si}
+        GPU_SAMPLER = TypeperfSampler(popen=popen, popen_kwargs=popen_kwargs).start()
+    return GPU_SAMPLER
 
-# --- 核心监控线程 ---
-def monitor_loop():
-    global CURRENT_STATS, LAST_NET_IO, LAST_NET_TIME
-    while True:
-        try:
-            # 💡 改进 1: CPU 平滑处理（取 3 次采样平均值，防止数值虚高跳变）
-            cpu_samples = []
-            for _ in range(3):
-                cpu_samples.append(psutil.cpu_percent(interval=0.2))
-            avg_cpu = sum(cpu_samples) / len(cpu_samples)
-
-            ram = psutil.virtual_memory().percent
-            disk = psutil.disk_usage('C:' if platform.system() == "Windows" else '/').percent
-
-            # 💡 改进 2: 修复了原代码中的 return Bug，改为变量赋值
-            gpu_val, temp_val = get_gpu_load_windows()
-
-            # 3. 计算网速
-            curr_net = psutil.net_io_counters()
-            curr_time = time.time()
-            time_delta = curr_time - LAST_NET_TIME if curr_time - LAST_NET_TIME > 0 else 1
-
-            sent_speed = (curr_net.bytes_sent - LAST_NET_IO.bytes_sent) / time_delta
-            recv_speed = (curr_net.bytes_recv - LAST_NET_IO.bytes_recv) / time_delta
-
-            LAST_NET_IO = curr_net
-            LAST_NET_TIME = curr_time
-
-            # 更新全局状态
-            CURRENT_STATS = {
-                "cpu": round(avg_cpu, 1),
-                "ram": ram,
-                "disk": disk,
-                "gpu": round(gpu_val, 1),
-                "gpu_temp": temp_val,
-                "net_up": round(sent_speed, 1),
-                "net_down": round(recv_speed, 1)
-            }
-            time.sleep(0.1)  # 维持大约 1Hz 的更新频率
-        except Exception as e:
-            time.sleep(2)
 
-def get_gpu_name_realtime():
-    """启动时精准获取显卡名称"""
-    # 1. 先试独显
-    try:
-        import GPUtil
-        gpus = GPUtil.getGPUs()
-        if gpus: return gpus[0].name
-    except:
-        pass
-
-    # 2. 再试 WMI (针对集显)
+# --- 核心监控线程 ---
+# 每个指标一个采集器，各自独立节奏；慢的 GPU 探针不再拖慢 CPU / 网速
+def _publish_stats(snapshot):
+    global CURRENT_STATS
+    CURRENT_STATS = snapshot
+    STATS_HUB.publish_threadsafe(snapshot)
+
+
+def _publish_detail(fields):
+    # 两个采集器（每秒的 I/O、慢周期的分区）都会写，写者之间加锁；读者直接拿引用，不用锁
+    global DETAIL_STATS
+    with _DETAIL_LOCK:
+        DETAIL_STATS = Snapshot(DETAIL_STATS, t=time.time(), **fields)
+
+
+def build_collectors(scheduler):
+    # 💡 改进 1: CPU 平滑处理（最近 3 次非阻塞采样取平均，防止数值虚高跳变）
+    cpu_samples = []
+    psutil.cpu_percent(interval=None)  # 预热：第一次调用总是返回 0
+
+    @scheduler.collector("cpu", interval=0.5, timeout=1.0)
+    def collect_cpu():
+        cpu_samples.append(psutil.cpu_percent(interval=None))
+        del cpu_samples[:-3]
+        return {"cpu": round(sum(cpu_samples) / len(cpu_samples), 1)}
+
+    @scheduler.collector("ram", interval=1.0)
+    def collect_ram():
+        return {"ram": PLATFORM.ram_percent()}
+
+    @scheduler.collector("disk", interval=5.0)
+    def collect_disk():
+        return {"disk": psutil.disk_usage('C:' if platform.system() == "Windows" else '/').percent}
+
+    @scheduler.collector("net", interval=1.0)
+    def collect_net():
+        global LAST_NET_IO, LAST_NET_TIME
+        curr_net = psutil.net_io_counters()
+        curr_time = time.time()
+        time_delta = curr_time - LAST_NET_TIME if curr_time - LAST_NET_TIME > 0 else 1
+
+        sent_speed = (curr_net.bytes_sent - LAST_NET_IO.bytes_sent) / time_delta
+        recv_speed = (curr_net.bytes_recv - LAST_NET_IO.bytes_recv) / time_delta
+
+        LAST_NET_IO = curr_net
+        LAST_NET_TIME = curr_time
+        return {"net_up": round(sent_speed, 1), "net_down": round(recv_speed, 1)}
+
+    # 💡 改进 2: GPU 探针最慢（typeperf 最多卡 2 秒），单独放长周期 + 超时
+    @scheduler.collector("gpu", interval=2.0, timeout=3.0)
+    def collect_gpu():
+        gpu_val, temp_val = PLATFORM.gpu_load()
+        return {"gpu": round(gpu_val, 1), "gpu_temp": temp_val}
+
+    # 进程表：只在最近有人打开进程管理页时才刷新
+    @scheduler.collector("processes", interval=2.0, timeout=5.0)
+    def refresh_processes():
+        PROCESS_TABLE.refresh_if_wanted()
+
+    # 每秒把当前快照落进历史环形缓冲区，供 /history 增量拉取
+    @scheduler.collector("history", interval=1.0)
+    def record_history():
+        HISTORY.record(time.time(), scheduler.snapshot())
+
+    # 告警规则：每秒用最新快照增量更新各规则的滚动窗口
+    @scheduler.collector("alerts", interval=1.0)
+    def evaluate_alerts():
+        if ALERTS.observe(time.time(), scheduler.snapshot()):
+            ALERT_HUB.publish_threadsafe(ALERTS.states())
+
+    # 分项指标：每个核心 / 网卡 / 磁盘 / 分区
+    detail = Breakdown()
+
+    @scheduler.collector("breakdown", interval=1.0, timeout=2.0)
+    def collect_breakdown():
+        _publish_detail(detail.io())
+
+    # disk_usage 碰到网络盘可能卡住，单独放长周期
+    @scheduler.collector("partitions", interval=5.0, timeout=10.0)
+    def collect_partitions():
+        _publish_detail({"partitions": detail.partitions()})
+
+    return scheduler
+
+
+# 注册表 / WMI / GPUtil / typeperf 都在适配层后面，Linux 上 --headless 也能跑
+PLATFORM = platform_adapters.detect(gpu_sampler=get_gpu_sampler)
+SCHEDULER = CollectorScheduler(initial=CURRENT_STATS, on_update=_publish_stats)
+HISTORY = History()
+STATS_HUB = stats_stream.StatsHub(CURRENT_STATS)
+PROCESS_TABLE = ProcessTable()
+DIR_CACHE = file_listing.DirCache()
+
+
+def _on_alert(event):
+    icon = "🔥" if event["state"] == "firing" else "✅"
+    log(f"[{icon}] 告警 {event['rule']}: {event['state']} (当前 {event['value']})")
+
+
+def _load_alert_engine():
+    rules = read_config().get("alert_rules", alerts.DEFAULT_RULES)
     try:
-        for gpu_ctrl in w_info.Win32_VideoController():
-            name = gpu_ctrl.Name
-            if "Remote" not in name and "Virtual" not in name:
-                return name
-    except:
-        pass
-    return "通用显示适配器/集成显卡"
-
-
-
-# --- UI 类 ---
-class MonitorUI(ctk.CTk):
-    # 🌟 修改 __init__，接收 ip 和 port
-    def __init__(self, local_ip, current_port):
-        super().__init__()
-        self.title("Server Monitor 控制中心")
-        self.geometry("400x580")  # 稍微拉长一点点窗口
-        ctk.set_appearance_mode("dark")
-        self.is_hidden = True
-
-        # 1. 顶部标题
-        ctk.CTkLabel(self, text="🖥️ 监控服务运行中", font=("微软雅黑", 20, "bold")).pack(pady=10)
+        return alerts.AlertEngine(rules, on_event=_on_alert)
+    except ValueError as e:
+        # 手改 config.json 写错了规则：退回默认规则，不让探针起不来
+        log(f"[⚠️] 告警规则无效，使用默认规则: {e}")
+        return alerts.AlertEngine(on_event=_on_alert)
 
-        # 🌟 2. 颜值升级版：IP 与端口显示区
-        # 使用深灰底色 + 圆角设计，字体改用更现代的系统默认无衬线字体
-        self.ip_frame = ctk.CTkFrame(self, fg_color="#1e1e1e", corner_radius=10)
-        self.ip_frame.pack(pady=10, padx=30, fill="x")
 
-        # 增加一点留白和排版
-        ctk.CTkLabel(self.ip_frame, text="SERVER ADDRESS", font=("Arial", 10, "bold"), text_color="#555555").pack(
-            pady=(10, 0))
+ALERTS = _load_alert_engine()
+FLEET = None  # --gateway 时创建，见 __main__
+# 自动发现的应答：端口 / 主机名 / 规格哈希 / 负载，变了才重新序列化（见 discovery）
+BEACON = discovery.Beacon(port=lambda: CURRENT_PORT, specs=lambda: SYSTEM_SPECS, stats=lambda: CURRENT_STATS,
+                          code=lambda: SECRET_CODE)
+ALERT_HUB = stats_stream.StatsHub(ALERTS.states())
 
-        # 使用科技感天蓝色 (#3498db) 代替刺眼的亮绿色
-        ip_display = f"{local_ip}"
-        ctk.CTkLabel(self.ip_frame, text=ip_display,
-                     font=("Helvetica", 18, "bold"), text_color="#3498db").pack(pady=(2, 10))
 
-        # 3. 日志框 (必须先创建，方便后续插入日志)
-        self.log_box = ctk.CTkTextbox(self, height=100)
-
-        # 下面的代码保持原样...
-        self.frame = ctk.CTkFrame(self)
-        self.frame.pack(pady=10, padx=30, fill="x")
-        ctk.CTkLabel(self.frame, text="手机配对码", font=("微软雅黑", 12)).pack(pady=5)
-
-        self.lbl_code = ctk.CTkLabel(self.frame, text="******", font=("Consolas", 32, "bold"), text_color="#1f93ff")
-        self.lbl_code.pack(side="left", padx=20, pady=10, expand=True)
-
-        self.btn_reveal = ctk.CTkButton(self.frame, text="👁️", width=30, fg_color="transparent",
-                                        command=self.toggle_code_visibility)
-        self.btn_reveal.pack(side="right", padx=10)
+async def run_service(name, coro):
+    """单个服务各跑各的：端口被占之类的错误只记日志，不影响其它服务"""
+    try:
+        await coro
+    except OSError as e:
+        log(f"[❌] {name}启动失败: {e}")
+    except Exception as e:
+        log(f"[❌] {name}异常退出: {e!r}")
 
-        self.info_lbl = ctk.CTkLabel(self, text="正在等待数据...", font=("微软雅黑", 14))
-        self.info_lbl.pack(pady=10)
 
-        self.edit_frame = ctk.CTkFrame(self)
-        self.edit_frame.pack(pady=10, padx=30, fill="x")
-        self.code_entry = ctk.CTkEntry(self.edit_frame, placeholder_text="输入新配对码")
-        self.code_entry.pack(side="left", padx=10, pady=10, expand=True, fill="x")
-        self.save_btn = ctk.CTkButton(self.edit_frame, text="保存", width=60, command=self.change_code)
-        self.save_btn.pack(side="right", padx=10)
+async def _serve_http(port):
+    http = await wsgi_server.WSGIServer(app, '0.0.0.0', port, log=log).start()
+    await http.serve()
 
-        self.sw_frame = ctk.CTkFrame(self)
-        self.sw_frame.pack(pady=10, padx=30, fill="x")
-        self.auto_switch = ctk.CTkSwitch(self.sw_frame, text="开机自启", command=self.toggle_autostart_logic)
-        self.auto_switch.pack(pady=10)
-        if check_autostart_status(): self.auto_switch.select()
 
-        # 日志框打包到底部
-        self.log_box.pack(pady=10, padx=30, fill="both")
+async def serve_async(port, check_code, screen=True, stream_port=stats_stream.STREAM_PORT, announce=False):
+    """HTTP API、状态推送流、自动发现和投屏引擎共用一个事件循环（--dev-server 时退回 Werkzeug 开发服务器）"""
+    services = [
+        run_service("HTTP 服务", _serve_http(port)),
+        run_service("状态推送流", stats_stream.serve(
+            STATS_HUB, '0.0.0.0', stream_port, check_code, {"/alerts": ALERT_HUB},
+            on_ready=lambda: log(f"[✔️] 状态推送流已启动 (端口: {stream_port})"))),
+        run_service("自动发现服务", discovery.serve(BEACON, log, announce=announce)),
+    ]
+    if screen:
+        # 进程内投屏：只监听端口，mss / numpy / cv2 等第一个观看者连上才导入
+        services.append(run_service("投屏引擎", screen_server.serve(
+            on_ready=lambda: log(f"🚀 投屏引擎已就绪 (进程内, 端口: {screen_server.SCREEN_PORT})"))))
+    if FLEET is not None:
+        # 网关：轮询其它探针也在同一个事件循环上，每台只是一个协程 + 一条长连接
+        services.append(run_service("网关", FLEET.run()))
+    await asyncio.gather(*services)
 
-        threading.Thread(target=self.init_tray_permanently, daemon=True).start()
-        self.refresh_ui()
-        self.protocol("WM_DELETE_WINDOW", self.withdraw_window)
-
-        try:
-            self.root.iconbitmap(get_resource_path("favicon.ico"))
-        except:
-            pass
-
-    # ... 保留类里的其他函数 (refresh_ui, change_code 等) ...
-
-    def refresh_ui(self):
-        self.info_lbl.configure(text=f"CPU: {CURRENT_STATS['cpu']}% | GPU: {CURRENT_STATS['gpu']}%")
-        self.after(1000, self.refresh_ui)
-
-    def toggle_code_visibility(self):
-        if self.is_hidden:
-            self.lbl_code.configure(text=SECRET_CODE)
-            self.btn_reveal.configure(text="🔒")
-            self.is_hidden = False
-        else:
-            self.lbl_code.configure(text="******")
-            self.btn_reveal.configure(text="👁️")
-            self.is_hidden = True
-
-    def change_code(self):
-        new_code = self.code_entry.get().strip()
-        if len(new_code) >= 4:
-            global SECRET_CODE
-            SECRET_CODE = new_code
-            save_config(SECRET_CODE)
-            if not self.is_hidden: self.lbl_code.configure(text=SECRET_CODE)
-            self.log_box.insert("end", f"\n[{time.strftime('%H:%M:%S')}] 配对码已更新")
-            self.code_entry.delete(0, 'end')
-
-    def toggle_autostart_logic(self):
-        is_on = self.auto_switch.get()
-        if manage_autostart(enable=(is_on == 1)):
-            self.log_box.insert("end", f"\n[OK] 自启状态: {'开' if is_on else '关'}")
-        self.log_box.see("end")
-
-    def init_tray_permanently(self):
-        """创建一个永远不消失的托盘图标"""
-        # ✅ 修改：使用 resource_path 加载 icon.png
-        icon_path = resource_path("icon.ico")
-
-        img = Image.open(icon_path) if os.path.exists(icon_path) else Image.new('RGB', (64, 64), color=(31, 147, 255))
-
-        menu = (
-            pystray.MenuItem('显示窗口', self.show_window, default=True),
-            pystray.MenuItem('退出服务', self.quit_app)
-        )
-        self.tray = pystray.Icon("ServerMonitor", img, "Server Monitor", menu)
-        self.tray.run()
-
-    def withdraw_window(self):
-        """点击 [X] 仅仅隐藏窗口"""
-        self.withdraw()
-
-
-    def show_window(self, icon=None, item=None):
-        """仅仅显示窗口，绝对不去动托盘图标"""
-        self.deiconify()
-        self.state('normal')
-        self.focus_force()
-
-    def quit_app(self):
-        if self.tray: self.tray.stop()
-        os._exit(0)
-
-
-# --- 启动 ---
-def get_silent_specs():
-    specs = {"os": "Unknown Windows", "cpu": "Unknown CPU", "gpu": "Unknown GPU"}
-
-    # 1. 获取 Windows 精确产品名称 (如 Windows 11 Home)
-    try:
-        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows NT\CurrentVersion")
-        # ProductName 通常是最准确的描述
-        specs["os"], _ = winreg.QueryValueEx(key, "ProductName")
-        winreg.CloseKey(key)
-    except:
-        specs["os"] = platform.platform()
-
-    # 2. 获取 CPU 完整型号
-    try:
-        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DESCRIPTION\System\CentralProcessor\0")
-        specs["cpu"], _ = winreg.QueryValueEx(key, "ProcessorNameString")
-        winreg.CloseKey(key)
-    except:
-        specs["cpu"] = platform.processor()
-
-    # 3. 🌟 获取显卡名称 (重点：同时兼容集显与独显)
-    # Windows 所有的显示适配器都记录在这个 Class ID 路径下
-    gpu_list = []
-    gpu_reg_path = r"SYSTEM\CurrentControlSet\Control\Class\{4d36e968-e325-11ce-bfc1-08002be10318}"
-    try:
-        main_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, gpu_reg_path)
-        # 遍历 0000, 0001, 0002 等子项，通常 0000 是集显，0001 是独显
-        for i in range(10):
-            try:
-                sub_key_name = f"{i:04d}"  # 格式化为 0000, 0001...
-                sub_key = winreg.OpenKey(main_key, sub_key_name)
-                gpu_name, _ = winreg.QueryValueEx(sub_key, "DriverDesc")
-                gpu_list.append(gpu_name)
-                winreg.CloseKey(sub_key)
-            except:
-                break  # 找不到更多显卡了就退出
-        winreg.CloseKey(main_key)
-    except:
-        pass
-
-    # 如果有多个显卡，用斜杠连起来展示
-    specs["gpu"] = " / ".join(gpu_list) if gpu_list else "通用显示适配器"
-
-    return specs
 
+def monitor_loop():
+    build_collectors(SCHEDULER)
+    SCHEDULER.run_forever()
 
-# 在 init_specs 里调用它
 # --- 启动逻辑 ---
 def init_specs():
     global SYSTEM_SPECS
-    import winreg
-
-    # 1. 处理器：直接读注册表，不闪黑框
-    try:
-        k = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DESCRIPTION\System\CentralProcessor\0")
-        cpu_name, _ = winreg.QueryValueEx(k, "ProcessorNameString")
-        winreg.CloseKey(k)
-        cpu_name = cpu_name.strip()
-    except:
-        cpu_name = platform.processor()
-
-    # 2. 操作系统：强制纠正 Win11 显示 Bug
-    os_display_name = platform.platform()
-    if platform.system() == "Windows":
-        try:
-            k = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows NT\CurrentVersion")
-            product_name, _ = winreg.QueryValueEx(k, "ProductName")
-            build_num, _ = winreg.QueryValueEx(k, "CurrentBuild")
-            display_version, _ = winreg.QueryValueEx(k, "DisplayVersion")
-            winreg.CloseKey(k)
-            # 如果内核版本号 >= 22000，强制修正名字为 Windows 11
-            if int(build_num) >= 22000:
-                product_name = product_name.replace("Windows 10", "Windows 11")
-            os_display_name = f"{product_name} {display_version}"
-        except:
-            pass
-
-    # 3. 显卡：多显卡全量枚举逻辑（解决集显被省略的问题）
-    gpu_list = []
-    # Windows 所有的显示设备都藏在这个 Class ID 路径下
-    gpu_reg_path = r"SYSTEM\CurrentControlSet\Control\Class\{4d36e968-e325-11ce-bfc1-08002be10318}"
-    try:
-        main_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, gpu_reg_path)
-        # 循环尝试 0000 到 0007，抓取所有的显卡驱动描述
-        for i in range(8):
-            try:
-                sub_key = winreg.OpenKey(main_key, f"{i:04d}")
-                name, _ = winreg.QueryValueEx(sub_key, "DriverDesc")
-                # 排除掉远程桌面或虚拟显卡等干扰项
-                if "Remote" not in name and "Virtual" not in name:
-                    if name not in gpu_list:  # 防止重复抓取
-                        gpu_list.append(name)
-                winreg.CloseKey(sub_key)
-            except:
-                break
-        winreg.CloseKey(main_key)
-    except:
-        pass
-
-    final_gpu = " / ".join(gpu_list) if gpu_list else "通用显示适配器"
-
-    # 封装最终数据
-    SYSTEM_SPECS = {
-        "os": os_display_name,
-        "cpu": cpu_name,
-        "ram": f"{round(psutil.virtual_memory().total / (1024 ** 3), 1)} GB",
-        "gpu": final_gpu
-    }
+    # 系统 / 处理器 / 显卡由平台适配层提供（Windows 读注册表，不闪黑框）
+    specs = PLATFORM.specs()
+    specs.setdefault("ram", f"{round(psutil.virtual_memory().total / (1024 ** 3), 1)} GB")
+    SYSTEM_SPECS = specs
 
 
 if __name__ == "__main__":
     # 1. 必须放在第一行，防止进程炸弹
     multiprocessing.freeze_support()
 
-    # 2. ✅ 单例模式检查：如果程序已在运行，就唤醒它并退出自己
+    # --headless：守护进程模式，不建窗口和托盘，只跑采集、HTTP API、自动发现（--screen 时加上投屏），日志写文件
+    headless = "--headless" in sys.argv
+    if headless:
+        setup_file_logging(arg_value("--log-file", "server_monitor.log"))
+
+    # 2. ✅ 单例模式检查：如果程序已在运行，就唤醒它并退出自己（--port 指定端口时允许本机多开）
     import urllib.request
     import urllib.error
 
     try:
-        resp = urllib.request.urlopen("http://127.0.0.1:5000/show_ui", timeout=1)
-        if resp.getcode() == 200:
-            sys.exit(0)
+        if "--port" not in sys.argv:
+            resp = urllib.request.urlopen("http://127.0.0.1:5000/show_ui", timeout=1)
+            if resp.getcode() == 200:
+                sys.exit(0)
     except urllib.error.HTTPError as e:
         sys.exit(0)
     except Exception as e:
@@ -766,66 +655,131 @@ if __name__ == "__main__":
 
     init_specs()
 
-    # 3. 端口处理
-    CURRENT_PORT = 5000
-    if is_port_in_use(CURRENT_PORT):
+    # 配对码：--code / 环境变量 SERVER_MONITOR_CODE 优先（不写进配置文件）；
+    # 配置文件里没有时随机生成的那个要存下来，否则每次重启都变，无界面模式下也没处看
+    code_override = arg_value("--code") or os.environ.get("SERVER_MONITOR_CODE")
+    if code_override:
+        SECRET_CODE = str(code_override)
+    elif not read_config().get("secret_code"):
+        save_config(SECRET_CODE)
+
+    # 3. 端口处理（--port 指定时不再自动换端口，方便本机起多个探针）
+    CURRENT_PORT = int(arg_value("--port", 5000))
+    if "--port" not in sys.argv and is_port_in_use(CURRENT_PORT):
         CURRENT_PORT = 5001
 
     LOCAL_IP = get_local_ip()
 
-    # 4. 启动 UI
-    ui = MonitorUI(LOCAL_IP, CURRENT_PORT)
-
-    if CURRENT_PORT == 5001:
-        ui.log_box.insert("end", "\n[⚠️] 5000端口被占用，自动切换至 5001 端口！")
+    # 4. 先起服务，界面放到最后：开机自启时 /status 不用等 customtkinter / pystray 加载完
+    if CURRENT_PORT == 5001 and "--port" not in sys.argv:
+        log("[⚠️] 5000端口被占用，自动切换至 5001 端口！")
     else:
-        ui.log_box.insert("end", f"\n[✔️] 服务就绪，端口: {CURRENT_PORT}")
+        log(f"[✔️] 服务就绪，端口: {CURRENT_PORT}")
 
     # 5. 启动线程
     threading.Thread(target=monitor_loop, daemon=True).start()
 
-    threading.Thread(
-        target=lambda: app.run(host='0.0.0.0', port=CURRENT_PORT, debug=False, use_reloader=False),
-        daemon=True
-    ).start()
-
-    threading.Thread(
-        target=udp_discovery_listener,
-        args=(ui.log_box,),
-        daemon=True
-    ).start()
+    # 网关模式：--gateway 自动发现同配对码的探针，--peers host:port,... 手动补充（比如本机其它端口上的探针）
+    if "--gateway" in sys.argv:
+        FLEET = fleet.Fleet(lambda: SECRET_CODE, peers=fleet.parse_peers(arg_value("--peers")),
+                            discovery="--no-discovery" not in sys.argv, log=log)
+        log(f"[✔️] 网关模式已开启，已知探针 {len(FLEET.peers)} 台，汇总接口 /fleet")
+
+    check_code = lambda code: code == SECRET_CODE
+    stream_port = int(arg_value("--stream-port", stats_stream.STREAM_PORT))
+    # --announce：定期往组播组通告自己，网关不用等广播探测
+    announce = "--announce" in sys.argv
+    # 投屏引擎默认跑在本进程的事件循环里；--screen-process 退回原来的独立进程
+    screen_enabled = not headless or "--screen" in sys.argv
+    screen_in_process = screen_enabled and "--screen-process" not in sys.argv
+    if "--dev-server" in sys.argv:
+        threading.Thread(
+            target=lambda: app.run(host='0.0.0.0', port=CURRENT_PORT, debug=False, use_reloader=False),
+            daemon=True
+        ).start()
+
+        # 状态推送流 (SSE)：所有订阅者共用一个事件循环，不再每秒轮询 /status
+        threading.Thread(
+            target=lambda: asyncio.run(run_service("状态推送流", stats_stream.serve(
+                STATS_HUB, '0.0.0.0', stream_port, check_code, {"/alerts": ALERT_HUB},
+                on_ready=lambda: log(f"[✔️] 状态推送流已启动 (端口: {stream_port})")))),
+            daemon=True
+        ).start()
+        if screen_in_process:
+            threading.Thread(target=lambda: asyncio.run(run_service("投屏引擎", screen_server.serve(
+                on_ready=lambda: log(f"🚀 投屏引擎已就绪 (进程内, 端口: {screen_server.SCREEN_PORT})")))),
+                daemon=True).start()
+        if FLEET is not None:
+            threading.Thread(target=lambda: asyncio.run(run_service("网关", FLEET.run())), daemon=True).start()
+        threading.Thread(target=lambda: asyncio.run(discovery.serve(BEACON, log, announce=announce)),
+                         daemon=True).start()
+    else:
+        # 正式服务：asyncio 前端 + 有界线程池跑 Flask，和 SSE 状态流、投屏引擎、自动发现共用一个事件循环
+        threading.Thread(
+            target=lambda: asyncio.run(serve_async(CURRENT_PORT, check_code, screen_in_process, stream_port, announce)),
+            daemon=True
+        ).start()
+
+    # 低延迟输入通道 (UDP)：数位板 / 触控板的二进制事件，绕开 Flask（无人值守的服务器上不需要）
+    if not headless:
+        threading.Thread(
+            target=input_channel.InputChannel(INPUT, lambda: SECRET_CODE).serve_forever,
+            daemon=True
+        ).start()
+        log(f"[✔️] 低延迟输入通道已启动 (UDP:{input_channel.INPUT_PORT})")
 
     # 🔥🔥🔥 5.5 新增：智能启动高清投屏服务 🔥🔥🔥
     screen_process = None
-    try:
-        # 针对 Windows 隐藏子进程黑窗口的设置
-        startupinfo = None
-        if os.name == 'nt':
-            import subprocess
-
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-        if getattr(sys, 'frozen', False):
-            # [模式 A：单文件 EXE]
-            screen_exe_path = get_resource_path('screen_server.exe')
-            if os.path.exists(screen_exe_path):
-                # ❌ 删掉了 shell=True，✅ 增加了 startupinfo 隐藏黑窗
-                screen_process = subprocess.Popen([screen_exe_path], startupinfo=startupinfo)
-                ui.log_box.insert("end", "\n🚀 [单文件模式] 投屏引擎已激活 (端口: 8765)")
+    # 进程内投屏（screen_in_process）：同一个进程，不用第二个解释器，也不会在 os._exit 后留下孤儿进程，
+    # 端口绑定成功后由 serve_async 记日志
+    if screen_enabled and not screen_in_process:
+        try:
+            # 针对 Windows 隐藏子进程黑窗口的设置
+            startupinfo = None
+            if os.name == 'nt':
+                import subprocess
+
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+            if getattr(sys, 'frozen', False):
+                # [模式 A：单文件 EXE]
+                screen_exe_path = get_resource_path('screen_server.exe')
+                if os.path.exists(screen_exe_path):
+                    # ❌ 删掉了 shell=True，✅ 增加了 startupinfo 隐藏黑窗
+                    screen_process = subprocess.Popen([screen_exe_path], startupinfo=startupinfo)
+                    log("🚀 [单文件模式] 投屏引擎已激活 (端口: 8765)")
+                else:
+                    log("[❌] 找不到 screen_server.exe")
             else:
-                ui.log_box.insert("end", "\n[❌] 找不到 screen_server.exe")
-        else:
-            # [模式 B：源码调试]
-            # ❌ 删掉了 shell=True
-            screen_process = subprocess.Popen([sys.executable, "screen_server.py"], startupinfo=startupinfo)
-            ui.log_box.insert("end", "\n🚀 [源码模式] 投屏引擎已启动 (端口: 8765)")
+                # [模式 B：源码调试]
+                # ❌ 删掉了 shell=True
+                screen_process = subprocess.Popen([sys.executable, "screen_server.py"], startupinfo=startupinfo)
+                log("🚀 [源码模式] 投屏引擎已启动 (端口: 8765)")
 
-    except Exception as e:
-        ui.log_box.insert("end", f"\n[❌] 投屏引擎启动失败: {str(e)}")
+        except Exception as e:
+            log(f"[❌] 投屏引擎启动失败: {str(e)}")
+
+    if headless:
+        # 6. 无界面：主线程只负责挂住进程，Ctrl+C / SIGTERM 退出
+        import signal
+
+        log(f"[✔️] 无界面模式运行中 ({PLATFORM.name}, {LOCAL_IP}:{CURRENT_PORT})")
+        if code_override:
+            log("[🔑] 配对码来自 --code / SERVER_MONITOR_CODE")
+        else:
+            log(f"[🔑] 配对码: {SECRET_CODE}（保存在 {os.path.abspath(CONFIG_FILE)}，可用 --code 覆盖）")
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            threading.Event().wait()
+        except (KeyboardInterrupt, SystemExit):
+            log("[✔️] 收到退出信号，服务停止")
+    else:
+        # 6. 启动 UI 主循环 (卡在这里直到关闭窗口)
+        from monitor_ui import MonitorUI
 
-    # 6. 启动 UI 主循环 (卡在这里直到关闭窗口)
-    ui.mainloop()
+        ui = MonitorUI(sys.modules[__name__], LOCAL_IP, CURRENT_PORT)
+        ui.mainloop()
 
     # 🔥🔥🔥 7. 清理战场 🔥🔥🔥
     if screen_process and screen_process.poll() is None:
@@ -0,0 +1,150 @@
+"""控制中心窗口 + 托盘图标（customtkinter / PIL / pystray）
+
+main_server 先把采集、HTTP、推送流、输入通道都启动了，最后才 import 这里创建窗口。
+界面读写的配对码、实时数据、自启设置（PLATFORM）都还在 main_server 里，通过 host 模块访问；
+服务线程不直接碰 Tk 控件，日志先进 host.LOG_LINES，由界面的定时刷新取走显示。
+"""
+import os
+import threading
+import time
+
+import customtkinter as ctk
+import pystray
+from PIL import Image
+
+
+class MonitorUI(ctk.CTk):
+    # 🌟 修改 __init__，接收 ip 和 port
+    def __init__(self, host, local_ip, current_port):
+        super().__init__()
+        self.host = host
+        self.tray = None
+        self.title("Server Monitor 控制中心")
+        self.geometry("400x580")  # 稍微拉长一点点窗口
+        ctk.set_appearance_mode("dark")
+        self.is_hidden = True
+
+        # 1. 顶部标题
+        ctk.CTkLabel(self, text="🖥️ 监控服务运行中", font=("微软雅黑", 20, "bold")).pack(pady=10)
+
+        # 🌟 2. 颜值升级版：IP 与端口显示区
+        # 使用深灰底色 + 圆角设计，字体改用更现代的系统默认无衬线字体
+        self.ip_frame = ctk.CTkFrame(self, fg_color="#1e1e1e", corner_radius=10)
+        self.ip_frame.pack(pady=10, padx=30, fill="x")
+
+        # 增加一点留白和排版
+        ctk.CTkLabel(self.ip_frame, text="SERVER ADDRESS", font=("Arial", 10, "bold"), text_color="#555555").pack(
+            pady=(10, 0))
+
+        # 使用科技感天蓝色 (#3498db) 代替刺眼的亮绿色
+        ip_display = f"{local_ip}"
+        ctk.CTkLabel(self.ip_frame, text=ip_display,
+                     font=("Helvetica", 18, "bold"), text_color="#3498db").pack(pady=(2, 10))
+
+        # 3. 日志框 (必须先创建，方便后续插入日志)
+        self.log_box = ctk.CTkTextbox(self, height=100)
+
+        # 下面的代码保持原样...
+        self.frame = ctk.CTkFrame(self)
+        self.frame.pack(pady=10, padx=30, fill="x")
+        ctk.CTkLabel(self.frame, text="手机配对码", font=("微软雅黑", 12)).pack(pady=5)
+
+        self.lbl_code = ctk.CTkLabel(self.frame, text="******", font=("Consolas", 32, "bold"), text_color="#1f93ff")
+        self.lbl_code.pack(side="left", padx=20, pady=10, expand=True)
+
+        self.btn_reveal = ctk.CTkButton(self.frame, text="👁️", width=30, fg_color="transparent",
+                                        command=self.toggle_code_visibility)
+        self.btn_reveal.pack(side="right", padx=10)
+
+        self.info_lbl = ctk.CTkLabel(self, text="正在等待数据...", font=("微软雅黑", 14))
+        self.info_lbl.pack(pady=10)
+
+        self.edit_frame = ctk.CTkFrame(self)
+        self.edit_frame.pack(pady=10, padx=30, fill="x")
+        self.code_entry = ctk.CTkEntry(self.edit_frame, placeholder_text="输入新配对码")
+        self.code_entry.pack(side="left", padx=10, pady=10, expand=True, fill="x")
+        self.save_btn = ctk.CTkButton(self.edit_frame, text="保存", width=60, command=self.change_code)
+        self.save_btn.pack(side="right", padx=10)
+
+        self.sw_frame = ctk.CTkFrame(self)
+        self.sw_frame.pack(pady=10, padx=30, fill="x")
+        self.auto_switch = ctk.CTkSwitch(self.sw_frame, text="开机自启", command=self.toggle_autostart_logic)
+        self.auto_switch.pack(pady=10)
+        if host.PLATFORM.autostart_enabled(): self.auto_switch.select()
+        if not host.PLATFORM.autostart_supported: self.auto_switch.configure(state="disabled")
+
+        # 日志框打包到底部
+        self.log_box.pack(pady=10, padx=30, fill="both")
+
+        threading.Thread(target=self.init_tray_permanently, daemon=True).start()
+        self.refresh_ui()
+        self.protocol("WM_DELETE_WINDOW", self.withdraw_window)
+
+        try:
+            self.iconbitmap(host.get_resource_path("favicon.ico"))
+        except:
+            pass
+
+    def refresh_ui(self):
+        stats = self.host.CURRENT_STATS
+        self.info_lbl.configure(text=f"CPU: {stats['cpu']}% | GPU: {stats['gpu']}%")
+        # 服务线程的日志在这里（Tk 主线程）统一写进日志框
+        lines = self.host.LOG_LINES
+        if lines:
+            while lines:
+                self.log_box.insert("end", "\n" + lines.popleft())
+            self.log_box.see("end")
+        self.after(1000, self.refresh_ui)
+
+    def toggle_code_visibility(self):
+        if self.is_hidden:
+            self.lbl_code.configure(text=self.host.SECRET_CODE)
+            self.btn_reveal.configure(text="🔒")
+            self.is_hidden = False
+        else:
+            self.lbl_code.configure(text="******")
+            self.btn_reveal.configure(text="👁️")
+            self.is_hidden = True
+
+    def change_code(self):
+        new_code = self.code_entry.get().strip()
+        if len(new_code) >= 4:
+            self.host.SECRET_CODE = new_code
+            self.host.save_config(new_code)
+            if not self.is_hidden: self.lbl_code.configure(text=new_code)
+            self.log_box.insert("end", f"\n[{time.strftime('%H:%M:%S')}] 配对码已更新")
+            self.code_entry.delete(0, 'end')
+
+    def toggle_autostart_logic(self):
+        is_on = self.auto_switch.get()
+        if self.host.PLATFORM.set_autostart(enable=(is_on == 1)):
+            self.log_box.insert("end", f"\n[OK] 自启状态: {'开' if is_on else '关'}")
+        self.log_box.see("end")
+
+    def init_tray_permanently(self):
+        """创建一个永远不消失的托盘图标"""
+        # ✅ 修改：使用 resource_path 加载 icon.png
+        icon_path = self.host.resource_path("icon.ico")
+
+        img = Image.open(icon_path) if os.path.exists(icon_path) else Image.new('RGB', (64, 64), color=(31, 147, 255))
+
+        menu = (
+            pystray.MenuItem('显示窗口', self.show_window, default=True),
+            pystray.MenuItem('退出服务', self.quit_app)
+        )
+        self.tray = pystray.Icon("ServerMonitor", img, "Server Monitor", menu)
+        self.tray.run()
+
+    def withdraw_window(self):
+        """点击 [X] 仅仅隐藏窗口"""
+        self.withdraw()
+
+    def show_window(self, icon=None, item=None):
+        """仅仅显示窗口，绝对不去动托盘图标"""
+        self.deiconify()
+        self.state('normal')
+        self.focus_force()
+
+    def quit_app(self):
+        if self.tray: self.tray.stop()
+        os._exit(0)
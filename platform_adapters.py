@@ -0,0 +1,262 @@
+"""平台适配层：自启动、硬件规格、GPU 探针
+
+main_server 只通过 PLATFORM（detect() 的结果）调用：
+  - WindowsPlatform：注册表 Run 键自启、注册表读规格、GPUtil + 常驻 typeperf 读 GPU
+  - LinuxPlatform：/proc、/sys 直接读规格、内存和 GPU（见 linux_probe），NVIDIA 闭源驱动退回 GPUtil
+  - GenericPlatform：macOS 等，没有自启动，规格用标准库能拿到的信息，GPU 读不到时报 0
+Windows 专用的库都在方法里才导入，其它平台不会碰到它们。
+"""
+import os
+import platform
+import sys
+
+import psutil
+
+from linux_probe import LinuxProbe
+
+AUTOSTART_KEY = r"Software\Microsoft\Windows\CurrentVersion\Run"
+AUTOSTART_NAME = "ServerMonitorProbe"
+# Windows 所有的显示设备都藏在这个 Class ID 路径下
+GPU_CLASS_KEY = r"SYSTEM\CurrentControlSet\Control\Class\{4d36e968-e325-11ce-bfc1-08002be10318}"
+
+
+def executable_path():
+    # ✅ 使用 sys.executable 获取绝对准确的 EXE 路径
+    if getattr(sys, 'frozen', False):
+        return sys.executable
+    return os.path.abspath(sys.argv[0])
+
+
+class WindowsPlatform:
+    name = "windows"
+    autostart_supported = True
+
+    def __init__(self, gpu_sampler=None):
+        # gpu_sampler：返回 TypeperfSampler 的函数（需要用未被劫持的 Popen 启动，由 main_server 提供）
+        self._gpu_sampler = gpu_sampler
+        self._wmi = None
+
+    # ---------- 自启动 ----------
+
+    def set_autostart(self, enable=True):
+        import winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, AUTOSTART_KEY, 0, winreg.KEY_ALL_ACCESS)
+            if enable:
+                # ✅ 加双引号包裹路径，防止路径中有空格导致无法启动
+                winreg.SetValueEx(key, AUTOSTART_NAME, 0, winreg.REG_SZ, f'"{executable_path()}"')
+            else:
+                try:
+                    winreg.DeleteValue(key, AUTOSTART_NAME)
+                except FileNotFoundError:
+                    pass
+            winreg.CloseKey(key)
+            return True
+        except Exception as e:
+            print(f"自启设置失败: {e}")
+            return False
+
+    def autostart_enabled(self):
+        try:
+            import winreg
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, AUTOSTART_KEY, 0, winreg.KEY_READ)
+            winreg.QueryValueEx(key, AUTOSTART_NAME)
+            winreg.CloseKey(key)
+            return True
+        except:
+            return False
+
+    # ---------- 规格 ----------
+
+    def specs(self):
+        """{"os", "cpu", "gpu"}：直接读注册表，不闪黑框"""
+        import winreg
+
+        # 1. 处理器
+        try:
+            k = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DESCRIPTION\System\CentralProcessor\0")
+            cpu_name, _ = winreg.QueryValueEx(k, "ProcessorNameString")
+            winreg.CloseKey(k)
+            cpu_name = cpu_name.strip()
+        except:
+            cpu_name = platform.processor()
+
+        # 2. 操作系统：强制纠正 Win11 显示 Bug
+        os_display_name = platform.platform()
+        try:
+            k = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows NT\CurrentVersion")
+            product_name, _ = winreg.QueryValueEx(k, "ProductName")
+            build_num, _ = winreg.QueryValueEx(k, "CurrentBuild")
+            display_version, _ = winreg.QueryValueEx(k, "DisplayVersion")
+            winreg.CloseKey(k)
+            # 如果内核版本号 >= 22000，强制修正名字为 Windows 11
+            if int(build_num) >= 22000:
+                product_name = product_name.replace("Windows 10", "Windows 11")
+            os_display_name = f"{product_name} {display_version}"
+        except:
+            pass
+
+        # 3. 显卡：多显卡全量枚举逻辑（解决集显被省略的问题）
+        gpu_list = []
+        try:
+            main_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, GPU_CLASS_KEY)
+            # 循环尝试 0000 到 0007，抓取所有的显卡驱动描述
+            for i in range(8):
+                try:
+                    sub_key = winreg.OpenKey(main_key, f"{i:04d}")
+                    name, _ = winreg.QueryValueEx(sub_key, "DriverDesc")
+                    # 排除掉远程桌面或虚拟显卡等干扰项
+                    if "Remote" not in name and "Virtual" not in name:
+                        if name not in gpu_list:  # 防止重复抓取
+                            gpu_list.append(name)
+                    winreg.CloseKey(sub_key)
+                except:
+                    break
+            winreg.CloseKey(main_key)
+        except:
+            pass
+
+        return {"os": os_display_name, "cpu": cpu_name,
+                "gpu": " / ".join(gpu_list) if gpu_list else "通用显示适配器"}
+
+    def ram_percent(self):
+        return psutil.virtual_memory().percent
+
+    # ---------- GPU ----------
+
+    def wmi(self):
+        """第一次查询时才建立 WMI 连接（COM 初始化要好几百毫秒）"""
+        if self._wmi is None:
+            import wmi
+            self._wmi = wmi.WMI()
+        return self._wmi
+
+    def gpu_name(self):
+        """精准获取显卡名称"""
+        # 1. 先试独显
+        try:
+            import GPUtil
+            gpus = GPUtil.getGPUs()
+            if gpus: return gpus[0].name
+        except:
+            pass
+
+        # 2. 再试 WMI (针对集显)
+        try:
+            for gpu_ctrl in self.wmi().Win32_VideoController():
+                name = gpu_ctrl.Name
+                if "Remote" not in name and "Virtual" not in name:
+                    return name
+        except:
+            pass
+        return "通用显示适配器/集成显卡"
+
+    def gpu_load(self):
+        """(占用率, 温度)：抗闪烁增强版"""
+        # 1. 尝试 GPUtil (NVIDIA)
+        # main_server 在导入任何库之前已经劫持了 subprocess，GPUtil 这里是静默的
+        sample = _gputil_load()
+        if sample is not None:
+            return sample
+
+        # 2. 尝试 typeperf (集成显卡/AMD)
+        # 常驻一个 typeperf 子进程持续输出，这里只读缓存值，不再每轮拉起新进程
+        if self._gpu_sampler is not None:
+            load = self._gpu_sampler().read()
+            if load is not None:
+                return load, 0
+        return 0, 0
+
+
+def _gputil_load():
+    """NVIDIA：GPUtil 调 nvidia-smi，没装或没有 N 卡返回 None"""
+    try:
+        import GPUtil
+        gpus = GPUtil.getGPUs()
+        if gpus:
+            return gpus[0].load * 100, gpus[0].temperature
+    except:
+        pass
+    return None
+
+
+class GenericPlatform:
+    """macOS 等：没有注册表和 WMI"""
+
+    name = platform.system().lower() or "unknown"
+    autostart_supported = False
+
+    def set_autostart(self, enable=True):
+        # 服务器上交给 systemd / launchd 管理
+        return False
+
+    def autostart_enabled(self):
+        return False
+
+    def specs(self):
+        return {"os": _os_release() or platform.platform(),
+                "cpu": platform.processor() or platform.machine() or "Unknown CPU",
+                "gpu": "通用显示适配器"}
+
+    def ram_percent(self):
+        return psutil.virtual_memory().percent
+
+    def gpu_name(self):
+        return "通用显示适配器"
+
+    def gpu_load(self):
+        return 0, 0
+
+
+class LinuxPlatform(GenericPlatform):
+    name = "linux"
+
+    def __init__(self, root='/'):
+        self.root = root
+        self.probe = LinuxProbe(root)
+
+    def specs(self):
+        specs = super().specs()
+        specs["os"] = _os_release(os.path.join(self.root, 'etc', 'os-release')) or specs["os"]
+        specs["cpu"] = self.probe.cpu_model() or specs["cpu"]
+        gpus = self.probe.gpu_names()
+        if gpus:
+            specs["gpu"] = " / ".join(gpus)
+        total = self.probe.meminfo().get('MemTotal')
+        if total:
+            specs["ram"] = f"{round(total / (1024 ** 3), 1)} GB"
+        return specs
+
+    def ram_percent(self):
+        percent = self.probe.ram_percent()
+        return percent if percent is not None else super().ram_percent()
+
+    def gpu_name(self):
+        names = self.probe.gpu_names()
+        return names[0] if names else super().gpu_name()
+
+    def gpu_load(self):
+        # AMD / Intel 走 sysfs；NVIDIA 闭源驱动不导出 gpu_busy_percent，退回 GPUtil
+        return self.probe.gpu_load() or _gputil_load() or (0, 0)
+
+
+def _os_release(path="/etc/os-release"):
+    """Linux 发行版名称（PRETTY_NAME），读不到返回 None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                key, _, value = line.strip().partition("=")
+                if key == "PRETTY_NAME":
+                    return value.strip('"\'') or None
+    except OSError:
+        pass
+    return None
+
+
+def detect(gpu_sampler=None):
+    system = platform.system()
+    if system == "Windows":
+        return WindowsPlatform(gpu_sampler)
+    if system == "Linux":
+        return LinuxPlatform()
+    return GenericPlatform()
@@ -0,0 +1,106 @@
+"""进程表快照：后台定时刷新，所有 /processes 请求共享
+
+  - pid -> psutil.Process 对象跨刷新复用，cpu_percent 才有意义（基于上次调用的差值）
+  - IO 速率同样基于上次刷新的读写字节数计算
+  - 查询结果用 heapq.nlargest 取前 N，并按 (版本, 参数) 缓存
+  - 只在最近有人看时才后台刷新
+"""
+import heapq
+import threading
+import time
+
+import psutil
+
+SORT_KEYS = {
+    "memory": "memory_percent",
+    "cpu": "cpu_percent",
+    "io": "io",
+}
+
+
+class ProcessTable:
+    def __init__(self, idle_after=30.0, max_age=5.0, clock=time.monotonic):
+        self.idle_after = idle_after
+        self.max_age = max_age
+        self.rows = []
+        self.version = 0
+        self.refreshed_at = None
+        self._clock = clock
+        self._procs = {}
+        self._last_io = {}
+        self._last_wanted = None
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._cpu_count = psutil.cpu_count() or 1
+
+    def refresh(self):
+        """重新扫描一遍进程表，生成新的只读快照"""
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self.refreshed_at if self.refreshed_at is not None else None
+            procs, last_io, rows = {}, {}, []
+            for pid in psutil.pids():
+                proc = self._procs.get(pid)
+                try:
+                    if proc is None:
+                        proc = psutil.Process(pid)
+                    with proc.oneshot():
+                        name = proc.name()
+                        mem = proc.memory_percent()
+                        # 多核机器上单进程可以超过 100%，按核数折算成任务管理器口径
+                        cpu = proc.cpu_percent(None) / self._cpu_count
+                        try:
+                            io = proc.io_counters()
+                            io_total = io.read_bytes + io.write_bytes
+                        except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                            io_total = None
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+
+                procs[pid] = proc
+                io_rate = 0.0
+                if io_total is not None:
+                    last_io[pid] = io_total
+                    prev = self._last_io.get(pid)
+                    if prev is not None and elapsed:
+                        io_rate = max(io_total - prev, 0) / elapsed
+                rows.append({
+                    "pid": pid,
+                    "name": name,
+                    "memory_percent": round(mem, 2),
+                    "cpu_percent": round(cpu, 1),
+                    "io": round(io_rate, 1),
+                })
+
+            self._procs = procs
+            self._last_io = last_io
+            self.rows = rows
+            self.version += 1
+            self.refreshed_at = now
+            self._cache = {}
+
+    def refresh_if_wanted(self):
+        """后台调度入口：最近 idle_after 秒内有人查询才刷新"""
+        if self._last_wanted is not None and self._clock() - self._last_wanted <= self.idle_after:
+            self.refresh()
+
+    def top(self, sort="memory", limit=20, name=None):
+        """按 sort 取前 limit 个进程，可选按名称子串过滤（不区分大小写）"""
+        key = SORT_KEYS.get(sort)
+        if key is None:
+            raise ValueError(f"unknown sort key: {sort}")
+        now = self._clock()
+        self._last_wanted = now
+        if self.refreshed_at is None or now - self.refreshed_at > self.max_age:
+            self.refresh()  # 冷启动 / 闲置很久后同步刷一次，后面交给后台
+
+        cache_key = (self.version, key, limit, name)
+        result = self._cache.get(cache_key)
+        if result is None:
+            rows = self.rows
+            if name:
+                needle = name.lower()
+                rows = [r for r in rows if needle in r["name"].lower()]
+            result = heapq.nlargest(limit, rows, key=lambda r: r[key])
+            self._cache[cache_key] = result
+        return result
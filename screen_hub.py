@@ -0,0 +1,204 @@
+"""投屏广播中心：同样的画面只抓一次、编码一次，分发给所有观看者
+
+  - 看同一个画面（StreamSource：模式 + 显示器 + 区域）的观看者共享一个 Channel，也就是一份抓屏
+  - 网速不同的观看者落在不同档位（profile = (质量, 最大宽度)），流水线只给有人在看的档位编码；
+    换档不重建流水线：新档位出关键帧之前照常收旧档位的帧
+  - 编码好的 bytes 原样交给每个连接发送，不为每个客户端复制
+  - 每个订阅者只有一个“最新帧”槽位：慢的客户端自己跳帧，不拖累快的
+  - 增量帧（分块 / 视频模式）被跳过后，该订阅者会等下一个关键帧；强制关键帧按档位限频，
+    一个慢客户端不会让所有人都收一串关键帧
+最后一个订阅者离开时流水线停止，不再占用任何 CPU。
+"""
+import asyncio
+from collections import namedtuple
+
+Packet = namedtuple('Packet', 'seq captured data keyframe profile')
+
+
+class Subscriber:
+    def __init__(self, channel, profile):
+        self.channel = channel
+        self.profile = profile
+        self.pending = None  # 换档中：等这个档位的关键帧
+        self.needs_keyframe = True
+        self.skipped = 0
+        self.sent = 0
+        self._slot = None
+        self._ready = asyncio.Event()
+
+    def switch(self, profile):
+        """换档（事件循环线程里调用）"""
+        if profile == self.profile:
+            if self.pending is not None:
+                self.pending = None
+                self.channel.update_profiles()
+            return
+        if profile == self.pending:
+            return
+        encoded = profile in self.channel.pipeline.profiles
+        self.pending = profile
+        self.channel.update_profiles()
+        if encoded:
+            # 已经有人在看这一档，它的增量链条进行到一半，要一个关键帧才能接上（限频）
+            self.channel.request_keyframe(profile)
+
+    def offer(self, packet):
+        """在事件循环线程里调用：放进槽位，必要时挤掉还没发出去的旧帧"""
+        if packet.profile == self.pending:
+            if packet.keyframe:
+                # 新档位接上了，槽位里旧档位的帧不用再发
+                if self._slot is not None:
+                    self.skipped += 1
+                self.profile, self.pending = self.pending, None
+                self.needs_keyframe = False
+                self._slot = packet
+                self._ready.set()
+                self.channel.update_profiles()
+            return
+        if packet.profile != self.profile:
+            return
+        if self.needs_keyframe and not packet.keyframe:
+            self.skipped += 1
+            return
+        if self._slot is not None:
+            self.skipped += 1
+            if not packet.keyframe:
+                # 这个增量帧发不出去，之后的增量都接不上了：槽位里的帧还能发（链条没断），
+                # 然后等下一个关键帧
+                self.needs_keyframe = True
+                self.channel.request_keyframe(self.profile)
+                return
+        self.needs_keyframe = False
+        self._slot = packet
+        self._ready.set()
+
+    async def next_packet(self):
+        while self._slot is None:
+            self._ready.clear()
+            await self._ready.wait()
+        packet, self._slot = self._slot, None
+        self.sent += 1
+        return packet
+
+    def stats(self):
+        return {"sent": self.sent, "skipped": self.skipped, "profile": list(self.profile)}
+
+
+class Channel:
+    """一份共享抓屏（流水线）+ 它的全部订阅者"""
+
+    def __init__(self, loop, pipeline, is_keyframe, keyframe_gap=2.0):
+        self.loop = loop
+        self.pipeline = pipeline
+        self.is_keyframe = is_keyframe
+        self.keyframe_gap = keyframe_gap  # 同一档位两次强制关键帧之间至少隔多久（和编码器的关键帧间隔一致）
+        self.subscribers = set()
+        self.forced = 0
+        self._started = False
+        self._last_seq = {}
+        self._last_forced = {}
+        self._pending = {}
+
+    def _on_packet(self, seq, captured, data, profile):
+        # 编码线程回调，切回事件循环再分发
+        try:
+            self.loop.call_soon_threadsafe(
+                self._broadcast, Packet(seq, captured, data, self.is_keyframe(data), profile))
+        except RuntimeError:
+            pass  # 事件循环已经关闭（服务退出中）
+
+    def _broadcast(self, packet):
+        if packet.seq < self._last_seq.get(packet.profile, 0):
+            return  # 并行编码时后抓的帧先编完了，旧帧直接丢掉
+        self._last_seq[packet.profile] = packet.seq
+        for sub in list(self.subscribers):
+            sub.offer(packet)
+        pending = self._pending.get(packet.profile)
+        if packet.keyframe and pending is not None and not self._waiting(packet.profile):
+            # 定期关键帧已经把掉队的订阅者接上了，延后的强制请求不用再发
+            pending.cancel()
+            del self._pending[packet.profile]
+
+    def _waiting(self, profile):
+        """这一档有没有订阅者在等关键帧"""
+        return any(sub.pending == profile or (sub.profile == profile and sub.needs_keyframe)
+                   for sub in self.subscribers)
+
+    def _force_keyframe(self, profile):
+        self._last_forced[profile] = self.loop.time()
+        self.forced += 1
+        self.pipeline.force_keyframe(profile)
+
+    def _deferred_keyframe(self, profile):
+        self._pending.pop(profile, None)
+        if self._waiting(profile):
+            self._force_keyframe(profile)
+
+    def request_keyframe(self, profile):
+        """订阅者丢了增量帧 / 换到别人正在看的档位时调用：每档每 keyframe_gap 秒最多强制一次，
+        间隔内的请求合并成一次延后的请求（画面静止、编码器不出帧时也能接上）
+        """
+        if profile in self._pending:
+            return
+        last = self._last_forced.get(profile)
+        if last is None or self.loop.time() - last >= self.keyframe_gap:
+            self._force_keyframe(profile)
+        else:
+            self._pending[profile] = self.loop.call_at(last + self.keyframe_gap, self._deferred_keyframe, profile)
+
+    def update_profiles(self):
+        """流水线只编码有人在看（或正在换过去）的档位，画质好的排前面"""
+        profiles = {p for sub in self.subscribers for p in (sub.profile, sub.pending) if p is not None}
+        if profiles:
+            self.pipeline.set_profiles(sorted(profiles, reverse=True))
+
+    def add(self, profile):
+        sub = Subscriber(self, profile)
+        self.subscribers.add(sub)
+        if not self._started:
+            self._started = True
+            self.pipeline.start(self._on_packet, [profile])
+        else:
+            self.update_profiles()
+        # 新观看者需要一帧完整画面，哪怕屏幕是静止的（不受限频）
+        self._force_keyframe(profile)
+        return sub
+
+    def remove(self, sub):
+        self.subscribers.discard(sub)
+        self.update_profiles()
+
+    def stop(self):
+        for pending in self._pending.values():
+            pending.cancel()
+        self._pending.clear()
+        self.pipeline.stop()
+
+
+class ScreenHub:
+    """pipeline_factory(source) 创建流水线，is_keyframe(source) 返回判断关键帧的函数"""
+
+    def __init__(self, pipeline_factory, is_keyframe=lambda source: (lambda data: True)):
+        self.pipeline_factory = pipeline_factory
+        self.is_keyframe = is_keyframe
+        self.channels = {}
+
+    def subscribe(self, source, profile):
+        channel = self.channels.get(source)
+        if channel is None:
+            channel = self.channels[source] = Channel(
+                asyncio.get_running_loop(), self.pipeline_factory(source), self.is_keyframe(source))
+        return channel.add(profile)
+
+    def unsubscribe(self, sub):
+        channel = sub.channel
+        channel.remove(sub)
+        if not channel.subscribers:
+            channel.stop()
+            for source, ch in list(self.channels.items()):
+                if ch is channel:
+                    del self.channels[source]
+
+    def stats(self):
+        return {str(source): {"viewers": len(ch.subscribers), **ch.pipeline.stats()}
+                for source, ch in self.channels.items()}
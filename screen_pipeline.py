@@ -0,0 +1,224 @@
+"""投屏流水线：抓屏线程 → 编码线程池 → 异步发送
+
+  - 抓屏线程：只负责 grab，画面完全没变的帧在这里就丢掉
+  - 编码线程池：缩放 + 去透明通道 + 编码（OpenCV 会释放 GIL，多线程能真正并行）；
+    有状态的编码器（分块增量）只能单线程，无状态的（整帧 JPEG）可以多线程并行
+  - 异步发送：编码结果交回事件循环，事件循环里只做 websocket.send（见 screen_hub）
+阶段之间是有界队列，积压时丢最旧的帧；StageTimer 记录每个阶段的耗时。
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import cv2
+
+from screen_tiles import changed_grid
+
+
+class StageTimer:
+    """各阶段耗时统计：次数、平均、最近（指数平滑）、最大，单位毫秒"""
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self._stats = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            s = self._stats.get(stage)
+            if s is None:
+                self._stats[stage] = [1, ms, ms, ms]
+            else:
+                s[0] += 1
+                s[1] += ms
+                s[2] += self.alpha * (ms - s[2])
+                s[3] = max(s[3], ms)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                stage: {"count": c, "avg_ms": round(total / c, 2), "recent_ms": round(ewma, 2), "max_ms": round(peak, 2)}
+                for stage, (c, total, ewma, peak) in self._stats.items()
+            }
+            return {"stages": stages, "counters": dict(self._counters)}
+
+
+class DropOldestQueue:
+    """线程间的有界队列，满了就挤掉最旧的一项"""
+
+    def __init__(self, maxsize=2, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                if self.on_drop:
+                    self.on_drop()
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self.closed, timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+def make_prepare(max_width=1920):
+    """编码前的预处理：缩放到不超过 max_width，再去掉透明通道"""
+    def prepare(img):
+        height, width = img.shape[:2]
+        if width > max_width:
+            scale = max_width / width
+            img = cv2.resize(img, (max_width, int(height * scale)), interpolation=cv2.INTER_LINEAR)
+        if img.ndim == 3 and img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+        return img
+    return prepare
+
+
+class ScreenPipeline:
+    """source_factory 在抓屏线程里调用（mss 实例不能跨线程用），返回带 grab() / close() 的对象；
+    encoder_factory(profile) 每个编码线程、每个档位调用一次，profile 是 (质量, 最大宽度)。
+
+    同一份抓屏可以同时编码成几个档位（网速不同的观看者），set_profiles() 随时增减档位，
+    不用重建抓屏线程；同宽度的档位共用一次缩放。
+    """
+
+    def __init__(self, source_factory, encoder_factory, prepare_factory=make_prepare, fps=60, workers=2,
+                 queue_size=2, timer=None):
+        self.source_factory = source_factory
+        self.encoder_factory = encoder_factory
+        self.prepare_factory = prepare_factory
+        self.interval = 1.0 / fps
+        self.workers = workers
+        self.timer = timer or StageTimer()
+        self.profiles = ()
+        self._frames = DropOldestQueue(queue_size, on_drop=lambda: self.timer.count("capture_dropped"))
+        self._prepares = {}
+        self._encoders = {}  # (编码线程, 档位) -> 编码器
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresh = threading.Event()
+        self._on_packet = None
+        self._seq = 0
+
+    def start(self, on_packet, profiles):
+        """on_packet(seq, 抓屏时刻, bytes, 档位) 在编码线程里回调"""
+        self._on_packet = on_packet
+        self.profiles = tuple(profiles)
+        first = self.encoder_factory(self.profiles[0])
+        # 有状态的编码器依赖上一帧，只能单线程按顺序编码
+        workers = 1 if getattr(first, 'stateful', False) else self.workers
+        self._encoders[(0, self.profiles[0])] = first
+        threading.Thread(target=self._capture_loop, name="screen-capture", daemon=True).start()
+        for i in range(workers):
+            threading.Thread(target=self._encode_loop, args=(i,), name=f"screen-encode-{i}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._frames.close()
+
+    def set_profiles(self, profiles):
+        """换一组要编码的档位（事件循环线程里调用）；新档位的编码器第一帧就是关键帧"""
+        profiles = tuple(profiles)
+        if profiles != self.profiles:
+            self.profiles = profiles
+            self._refresh.set()  # 画面静止时也要给新档位出一帧
+
+    def force_keyframe(self, profile=None):
+        """下一帧无论画面变没变都送去编码，并让有状态编码器出关键帧（profile 为 None 时所有档位）"""
+        self._refresh.set()
+        with self._lock:
+            encoders = [e for (_, p), e in self._encoders.items() if profile is None or p == profile]
+        for encoder in encoders:
+            if hasattr(encoder, 'force_keyframe'):
+                encoder.force_keyframe()
+
+    def _capture_loop(self):
+        source = self.source_factory()
+        prev = None
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                with self.timer.time("capture"):
+                    img = source.grab()
+                refresh = self._refresh.is_set()
+                if refresh:
+                    self._refresh.clear()
+                if (not refresh and prev is not None and prev.shape == img.shape
+                        and not changed_grid(prev, img, 64).any()):
+                    self.timer.count("unchanged")  # 画面完全没变，不浪费编码
+                else:
+                    self._seq += 1
+                    self._frames.put((self._seq, time.perf_counter(), img))
+                prev = img
+                self._stop.wait(max(0.0, self.interval - (time.perf_counter() - start)))
+        finally:
+            source.close()
+
+    def _encoder(self, worker, profile):
+        with self._lock:
+            encoder = self._encoders.get((worker, profile))
+            if encoder is None:
+                encoder = self._encoders[(worker, profile)] = self.encoder_factory(profile)
+            return encoder
+
+    def _prepare(self, max_width):
+        prepare = self._prepares.get(max_width)
+        if prepare is None:
+            prepare = self._prepares[max_width] = self.prepare_factory(max_width)
+        return prepare
+
+    def _encode_loop(self, worker):
+        while not self._stop.is_set():
+            item = self._frames.get(timeout=0.5)
+            if item is None:
+                continue
+            seq, captured, img = item
+            profiles = self.profiles
+            with self._lock:
+                # 没人看的档位：编码器丢掉，再回到这一档时从关键帧重新开始
+                for key in [k for k in self._encoders if k[0] == worker and k[1] not in profiles]:
+                    del self._encoders[key]
+            frames = {}
+            for profile in profiles:
+                max_width = profile[1]
+                frame = frames.get(max_width)
+                if frame is None:
+                    with self.timer.time("prepare"):
+                        frame = frames[max_width] = self._prepare(max_width)(img)
+                with self.timer.time("encode"):
+                    data = self._encoder(worker, profile).encode(frame)
+                if data is not None:
+                    self._on_packet(seq, captured, data, profile)
+
+    def stats(self):
+        return dict(self.timer.snapshot(), profiles=[list(p) for p in self.profiles])
@@ -0,0 +1,128 @@
+"""投屏自适应码率：根据发送耗时 / 客户端确认，自动调整画质、分辨率和帧间隔
+
+每个观看者一个 RateController：
+  - 测量：客户端发 {"type": "ack"} 时按 FIFO 配对算出往返延迟；
+    不发 ack 的老客户端退回用 websocket.send 的耗时（缓冲区满时 send 会阻塞）
+  - 拥塞（延迟或最老的未确认帧超过目标）：逐档降低画质和分辨率，到最低档后再拉长帧间隔
+  - 持续通畅：反过来，先把帧间隔恢复到客户端要求的 fps，再逐档提高画质
+  - 发 ack 的客户端还有一个发送窗口：在途的帧太老就先不发，缓冲区里不会堆积
+  - 客户端可以在握手时用 max_width / fps 给出上限
+纯逻辑、时钟可注入，可以用模拟网络单独测试（见 benchmark.py rate）。
+"""
+import time
+from collections import deque
+
+# (JPEG 质量, 最大宽度)，0 档最好
+LEVELS = (
+    (88, 1920),
+    (75, 1600),
+    (65, 1280),
+    (55, 960),
+    (45, 720),
+)
+
+
+class RateController:
+    def __init__(self, target_latency=0.1, max_width=1920, fps=60, levels=LEVELS,
+                 max_interval=0.5, lost_after=2.0, clock=time.monotonic):
+        self.target = target_latency
+        self.max_width = max_width
+        self.levels = levels
+        self.min_interval = 1.0 / max(1, min(fps, 60))
+        self.max_interval = max(max_interval, self.min_interval)
+        self.lost_after = lost_after
+        self._clock = clock
+
+        self.level = 0
+        self.interval = self.min_interval
+        self.latency = None
+        self.acks_seen = False
+        self._inflight = deque(maxlen=64)
+        self._last_change = clock()
+        self._good_since = None
+
+    def profile(self):
+        """当前档位对应的 (质量, 宽度)"""
+        quality, width = self.levels[self.level]
+        return quality, min(width, self.max_width)
+
+    def _sample(self, seconds):
+        self.latency = seconds if self.latency is None else self.latency + 0.2 * (seconds - self.latency)
+
+    def on_sent(self, send_seconds):
+        now = self._clock()
+        self._inflight.append(now - send_seconds)
+        if not self.acks_seen:
+            self._sample(send_seconds)
+
+    def on_ack(self):
+        self.acks_seen = True
+        if self._inflight:
+            self._sample(self._clock() - self._inflight.popleft())
+
+    def inflight(self):
+        return len(self._inflight) if self.acks_seen else 0
+
+    def pending_age(self, now):
+        """最老的一帧已经发出去多久还没确认；链路卡死时 ack 不再回来，平滑值不会更新，要靠这个发现"""
+        if not self.acks_seen or not self._inflight:
+            return 0.0
+        return now - self._inflight[0]
+
+    def can_send(self, now=None):
+        """发送窗口：最老的未确认帧超过目标延迟时先别发，让缓冲区排空
+
+        客户端发 ack 时这才生效；ack 丢了也不能永远卡住，超过 lost_after 就当它们丢了。
+        """
+        now = self._clock() if now is None else now
+        age = self.pending_age(now)
+        if age > self.lost_after:
+            self._inflight.clear()
+            return True
+        return age <= self.target
+
+    def update(self):
+        """根据最新测量调整参数，档位（质量 / 分辨率）变了返回 True"""
+        if self.latency is None:
+            return False
+        now = self._clock()
+        latency = max(self.latency, self.pending_age(now))
+        congested = latency > self.target
+        changed = False
+
+        if congested:
+            self._good_since = None
+            if now - self._last_change >= 0.5:
+                # 先降画质 / 分辨率，已经是最低档了再降帧率
+                if self.level < len(self.levels) - 1:
+                    self.level += 1
+                    changed = True
+                else:
+                    self.interval = min(self.interval * 1.5, self.max_interval)
+                self._last_change = now
+        elif latency < self.target * 0.5:
+            if self._good_since is None:
+                self._good_since = now
+            if now - self._good_since >= 1.0 and now - self._last_change >= 1.0:
+                # 反过来：先恢复帧率，再提画质
+                if self.interval > self.min_interval:
+                    self.interval = max(self.min_interval, self.interval / 2)
+                elif self.level > 0:
+                    self.level -= 1
+                    changed = True
+                self._last_change = now
+                self._good_since = now
+        else:
+            self._good_since = None
+        return changed
+
+    def stats(self):
+        quality, width = self.profile()
+        return {
+            "level": self.level,
+            "quality": quality,
+            "max_width": width,
+            "interval_ms": round(self.interval * 1000, 1),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "inflight": self.inflight(),
+        }
@@ -1,68 +1,268 @@
 import asyncio
 import websockets
-import mss
-import cv2
-import numpy as np
 import time
+import json
+from urllib.parse import parse_qs, urlsplit
 
+from collections import namedtuple
+
+from screen_hub import ScreenHub
+from screen_rate import RateController
+
+# mss / numpy / cv2 / PyAV（screen_tiles、screen_pipeline、screen_video）都在函数里按需导入：
+# 嵌在 main_server 里运行时，没人看投屏就不加载它们，第一个观看者连上时才付这笔导入开销
+
+SCREEN_PORT = 8765
+VIDEO_MODES = ('h264', 'vp8')  # 与 screen_video.CODECS 一致
+
+# 看同一个画面的观看者共享同一条抓屏 + 编码流水线；码率控制把画质 / 宽度限制在固定的几档，
+# 流水线只给有人在看的档位编码，网络条件差不多的观看者落在同一档，连编码也共享
+StreamSource = namedtuple('StreamSource', 'mode monitor region')
+
+
+def request_params(websocket):
+    """握手 URL 里的查询参数，例如 ws://host:8765/?mode=tiles"""
+    request = getattr(websocket, 'request', None)  # websockets >= 13
+    path = request.path if request is not None else getattr(websocket, 'path', '/')
+    return {k: v[0] for k, v in parse_qs(urlsplit(path).query).items()}
+
+
+def resolve_view(monitors, monitor_index=1, region=None):
+    """把 显示器序号 + 区域 换算成 mss 的抓屏范围（虚拟桌面坐标）
+
+    monitors 是 mss 的 sct.monitors（0 是所有显示器拼起来的整块，1 开始是各个显示器）；
+    region 是相对于该显示器左上角的 (x, y, w, h) 像素，超出显示器的部分会被裁掉。
+    """
+    if not 0 <= monitor_index < len(monitors):
+        monitor_index = 1 if len(monitors) > 1 else 0
+    mon = monitors[monitor_index]
+    if not region:
+        return {"left": mon["left"], "top": mon["top"], "width": mon["width"], "height": mon["height"]}
+    x, y, w, h = region
+    x = min(max(0, x), mon["width"] - 1)
+    y = min(max(0, y), mon["height"] - 1)
+    w = max(1, min(w, mon["width"] - x))
+    h = max(1, min(h, mon["height"] - y))
+    return {"left": mon["left"] + x, "top": mon["top"] + y, "width": w, "height": h}
 
-async def stream_screen(websocket):
-    print("Client connected...")
 
+def list_monitors():
+    import mss
     with mss.mss() as sct:
-        monitor = sct.monitors[1]
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 88]
+        return [{"index": i, **{k: m[k] for k in ("left", "top", "width", "height")}}
+                for i, m in enumerate(sct.monitors)]
 
-        # 🔥 记录上一帧的极小缩略图，用来对比画面是否变化
-        last_thumb = None
 
-        try:
-            while True:
-                start_time = time.time()
+class MssSource:
+    """mss 抓屏源，必须在抓屏线程里创建；只抓指定显示器 / 区域，抓屏和缩放开销与面积成正比"""
 
-                # 1. 抓图并缩放到 1080P (1920宽)
-                img = np.array(sct.grab(monitor))
-                height, width = img.shape[:2]
-                if width > 1920:
-                    scale = 1920 / width
-                    img = cv2.resize(img, (1920, int(height * scale)), interpolation=cv2.INTER_LINEAR)
+    def __init__(self, monitor_index=1, region=None):
+        import mss
+        import numpy
+        self._asarray = numpy.asarray
+        self.sct = mss.mss()
+        self.monitor = resolve_view(self.sct.monitors, monitor_index, region)
 
-                # 2. 去除透明通道
-                frame = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    def grab(self):
+        return self._asarray(self.sct.grab(self.monitor))
 
-                # 🔥 3. 核心黑科技：画面防抖检测 🔥
-                # 快速把画面缩小到 64x64 像素来计算差异，极度省 CPU
-                current_thumb = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_NEAREST)
+    def close(self):
+        self.sct.close()
 
-                send_frame = True
-                if last_thumb is not None:
-                    # 计算当前帧和上一帧的区别
-                    diff = cv2.absdiff(current_thumb, last_thumb)
-                    # 如果画面变化极小（阈值小于 2），说明是静止的，直接丢弃这帧！
-                    if np.mean(diff) < 2.0:
-                        send_frame = False
 
-                last_thumb = current_thumb  # 更新上一帧
+def build_pipeline(source):
+    from screen_pipeline import ScreenPipeline
+    from screen_tiles import JpegEncoder, TileEncoder
+    import screen_video
 
-                # 🔥 4. 只有画面动了，才占用网络发送！
-                if send_frame:
-                    _, buffer = cv2.imencode('.jpg', frame, encode_param)
-                    await websocket.send(buffer.tobytes())
+    # mode=tiles：只发送变化的区域；h264 / vp8：视频编码；默认仍是整帧 JPEG，老客户端不受影响
+    # 每个档位 (质量, 最大宽度) 一个编码器
+    if source.mode == 'tiles':
+        encoder_factory = lambda profile: TileEncoder(quality=profile[0])
+    elif source.mode in VIDEO_MODES:
+        encoder_factory = lambda profile: screen_video.VideoEncoder(source.mode, quality=profile[0])
+    else:
+        encoder_factory = lambda profile: JpegEncoder(quality=profile[0])
+    source_factory = lambda: MssSource(source.monitor, source.region)
+    return ScreenPipeline(source_factory, encoder_factory, fps=60)
 
-                # 5. 严格控时
-                cost_time = time.time() - start_time
-                await asyncio.sleep(max(0, 0.016 - cost_time))
 
-        except websockets.exceptions.ConnectionClosed:
-            print("Client disconnected.")
+def keyframe_test(source):
+    if source.mode == 'tiles':
+        from screen_tiles import is_keyframe
+        return is_keyframe
+    if source.mode in VIDEO_MODES:
+        import screen_video
+        return screen_video.is_keyframe
+    return lambda data: True
 
 
-async def main():
+def negotiate_mode(requested):
+    """客户端要的模式不可用时退回 JPEG"""
+    if requested == 'tiles':
+        return 'tiles'
+    if requested in VIDEO_MODES:
+        import screen_video
+        if screen_video.available(requested):
+            return requested
+    return 'jpeg'
+
+
+HUB = ScreenHub(lambda source: build_pipeline(source), keyframe_test)
+
+
+def _int_param(params, name, default, low, high):
+    try:
+        return min(high, max(low, int(params[name])))
+    except (KeyError, ValueError):
+        return default
+
+
+def parse_region(value):
+    """"x,y,w,h" 或 [x, y, w, h] -> 元组；缺省 / 非法时返回 None（整个显示器）"""
+    if isinstance(value, str):
+        value = value.split(',')
+    try:
+        x, y, w, h = (int(v) for v in value)
+    except (TypeError, ValueError):
+        return None
+    if w < 16 or h < 16:
+        return None
+    return max(0, x), max(0, y), w, h
+
+
+class Viewer:
+    """一个 websocket 连接：当前订阅 + 它自己的码率控制
+
+    握手参数：mode=tiles / h264 / vp8、max_width=1280（分辨率上限）、fps=30（帧率上限）、
+    adaptive=0（关闭自适应，固定用上限画质）、monitor=2（显示器序号，0 是全部）、
+    region=x,y,w,h（只看显示器上的一块区域；想放大就给更小的区域）
+    """
+
+    def __init__(self, params):
+        self.mode = negotiate_mode(params.get('mode'))
+        self.adaptive = params.get('adaptive') != '0'
+        self.monitor = _int_param(params, 'monitor', 1, 0, 16)
+        self.region = parse_region(params.get('region'))
+        self.rate = RateController(max_width=_int_param(params, 'max_width', 1920, 320, 3840),
+                                   fps=_int_param(params, 'fps', 60, 1, 60))
+        self.sub = HUB.subscribe(self.source(), self.rate.profile())
+        self.acked = asyncio.Event()
+
+    def source(self):
+        return StreamSource(self.mode, self.monitor, self.region)
+
+    def on_ack(self):
+        self.rate.on_ack()
+        self.acked.set()
+
+    async def wait_window(self):
+        """发送窗口满了就等 ack；ack 一直不来时 can_send 自己会超时放行"""
+        while not self.rate.can_send():
+            self.acked.clear()
+            try:
+                await asyncio.wait_for(self.acked.wait(), self.rate.lost_after)
+            except asyncio.TimeoutError:
+                pass
+
+    def _resubscribe(self):
+        # 先订阅新的流水线再退订旧的，切换期间不会出现空窗
+        old, self.sub = self.sub, HUB.subscribe(self.source(), self.rate.profile())
+        HUB.unsubscribe(old)
+
+    def on_sent(self, seconds):
+        self.rate.on_sent(seconds)
+        if self.adaptive and self.rate.update():
+            # 换档只是换一个编码档位，抓屏 / 流水线不动；新档位出关键帧前照常收旧档位的帧
+            self.sub.switch(self.rate.profile())
+
+    def set_view(self, monitor, region):
+        """不断开连接切换显示器 / 区域"""
+        if (monitor, region) != (self.monitor, self.region):
+            self.monitor, self.region = monitor, region
+            self._resubscribe()
+
+    def close(self):
+        HUB.unsubscribe(self.sub)
+
+
+async def _serve_requests(websocket, viewer):
+    """客户端发来的文本指令：
+    {"type": "ack"} 每收到一帧回一次，用来测往返延迟；
+    {"type": "stats"} 返回各阶段耗时和当前码率档位；
+    {"type": "view", "monitor": 2, "region": [x, y, w, h]} 切换显示器 / 区域（region 为 null 看整个显示器），
+    回复实际抓屏范围和显示器列表，客户端可以据此换算触摸坐标
+    """
+    async for message in websocket:
+        if not isinstance(message, str):
+            continue
+        try:
+            request = json.loads(message)
+        except ValueError:
+            continue
+        if not isinstance(request, dict):
+            continue  # [] / 1 / "x" 也是合法 JSON，不能让它把这个观看者的指令循环打断
+        kind = request.get('type')
+        if kind == 'ack':
+            viewer.on_ack()
+        elif kind == 'stats':
+            sub = viewer.sub
+            await websocket.send(json.dumps({"type": "stats", "client": sub.stats(), "rate": viewer.rate.stats(),
+                                             **sub.channel.pipeline.stats()}))
+        elif kind == 'view':
+            monitor = request.get('monitor', viewer.monitor)
+            viewer.set_view(monitor if isinstance(monitor, int) else viewer.monitor,
+                            parse_region(request.get('region')))
+            monitors = await asyncio.get_running_loop().run_in_executor(None, list_monitors)
+            await websocket.send(json.dumps({
+                "type": "view", "monitor": viewer.monitor, "region": viewer.region, "monitors": monitors,
+                "capture": resolve_view(monitors, viewer.monitor, viewer.region)}))
+
+
+async def stream_screen(websocket):
+    print("Client connected...")
+    params = request_params(websocket)
+    viewer = Viewer(params)
+    requests = asyncio.ensure_future(_serve_requests(websocket, viewer))
+
+    try:
+        if 'mode' in params:
+            # 显式选了模式的客户端先收到协商结果；老客户端不带参数，仍然只收 JPEG 二进制帧
+            await websocket.send(json.dumps({"type": "mode", "mode": viewer.mode}))
+        while True:
+            # 所有观看者拿到的是同一个 bytes 对象；慢的客户端在槽位里自动跳帧
+            await viewer.wait_window()
+            packet = await viewer.sub.next_packet()
+            timer = viewer.sub.channel.pipeline.timer
+            start = time.perf_counter()
+            await websocket.send(packet.data)
+            sent = time.perf_counter()
+            timer.record("send", sent - start)
+            timer.record("latency", sent - packet.captured)
+            viewer.on_sent(sent - start)
+            # 按码率控制给出的帧间隔限速，中间到达的帧在槽位里被新帧覆盖
+            await asyncio.sleep(max(0.0, start + viewer.rate.interval - time.perf_counter()))
+
+    except websockets.exceptions.ConnectionClosed:
+        print("Client disconnected.")
+    finally:
+        requests.cancel()
+        viewer.close()
+
+
+async def serve(host="0.0.0.0", port=SCREEN_PORT, on_ready=None):
+    """可以跑在别人的事件循环里（main_server 进程内模式），也可以单独运行；on_ready() 在端口绑定成功后调用"""
     # ping_timeout 设大一点，防止静止时不发包导致断线
-    async with websockets.serve(stream_screen, "0.0.0.0", 8765, ping_timeout=60):
+    async with websockets.serve(stream_screen, host, port, ping_timeout=60):
         print("[Smart Edition] Screen engine ready...")
+        if on_ready is not None:
+            on_ready()
         await asyncio.Future()
 
 
+async def main():
+    await serve()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
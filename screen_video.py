@@ -0,0 +1,136 @@
+"""视频编码投屏模式：H.264 / VP8（PyAV，纯 CPU 编码）
+
+握手时 mode=h264 或 mode=vp8 选用；没装 PyAV（pip install av）或编码器不可用时退回 JPEG，
+服务端会先发一条 {"type": "mode", ...} 文本消息告诉客户端实际用的模式。
+
+每个 websocket 二进制消息是一帧编码结果（大端）：
+    magic 'SV' | version(1) | flags(1, bit0=关键帧) | codec(1, 1=h264 2=vp8) | seq(u32) | 宽(u16) | 高(u16) | 码流
+H.264 码流是 Annex-B 格式（带起始码），VP8 是单帧裸数据，客户端可以直接交给 MediaCodec / WebCodecs。
+编码参数是零延迟配置：不用 B 帧、不做前瞻，每送进一帧立刻出一个包。
+"""
+import struct
+import time
+from fractions import Fraction
+
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+MAGIC = b'SV'
+VERSION = 1
+FLAG_KEYFRAME = 1
+_HEADER = struct.Struct('!2sBBBIHH')
+
+# mode -> (协议里的 codec 编号, FFmpeg 编码器名)
+CODECS = {
+    'h264': (1, 'libx264'),
+    'vp8': (2, 'libvpx'),
+}
+
+
+def available(mode):
+    """PyAV 装了并且对应的编码器编进了 FFmpeg"""
+    if av is None or mode not in CODECS:
+        return False
+    return CODECS[mode][1] in av.codecs_available
+
+
+def _i_frame():
+    # PyAV 13 起帧类型是枚举，之前的版本用字符串
+    picture_type = getattr(av.video.frame, 'PictureType', None)
+    return picture_type.I if picture_type is not None else 'I'
+
+
+def _crf(quality):
+    # 把 JPEG 质量（45 ~ 88）映射到 CRF（越小越清晰）：88 -> 22，45 -> 36
+    return max(10, min(45, round(51 - quality * 0.33)))
+
+
+def _codec_options(mode, quality):
+    crf = _crf(quality)
+    if mode == 'h264':
+        return {'preset': 'ultrafast', 'tune': 'zerolatency', 'crf': str(crf)}
+    # libvpx 的 CRF 模式需要一个码率上限
+    return {'deadline': 'realtime', 'cpu-used': '8', 'lag-in-frames': '0',
+            'crf': str(crf), 'b': '4M'}
+
+
+class VideoEncoder:
+    """有状态的视频编码器：接口和 screen_tiles.TileEncoder 一样，可以直接放进 ScreenPipeline"""
+
+    stateful = True
+
+    def __init__(self, mode='h264', quality=80, fps=60, keyframe_interval=2.0, clock=time.monotonic):
+        if not available(mode):
+            raise RuntimeError(f"video mode {mode!r} not available (pip install av)")
+        self.mode = mode
+        self.codec_id, self.codec_name = CODECS[mode]
+        self.quality = quality
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval
+        self._clock = clock
+        self._ctx = None
+        self._size = None
+        self._start = None
+        self._pts = -1
+        self._force = True
+        self.seq = 0
+
+    def force_keyframe(self):
+        self._force = True
+
+    def _open(self, width, height):
+        ctx = av.CodecContext.create(self.codec_name, 'w')
+        ctx.width, ctx.height = width, height
+        ctx.pix_fmt = 'yuv420p'
+        ctx.time_base = Fraction(1, 1000)
+        ctx.framerate = Fraction(self.fps, 1)
+        # 关键帧间隔按帧数给一个上限；画面静止时不送帧，靠 force_keyframe 补
+        ctx.gop_size = max(1, int(self.fps * self.keyframe_interval))
+        ctx.options = _codec_options(self.mode, self.quality)
+        ctx.open()
+        self._ctx = ctx
+        self._size = (width, height)
+        self._start = self._clock()
+        self._pts = -1
+        self._force = True
+
+    def encode(self, frame):
+        # yuv420p 要求宽高是偶数
+        h, w = frame.shape[:2]
+        frame = np.ascontiguousarray(frame[:h - h % 2, :w - w % 2])
+        h, w = frame.shape[:2]
+        if self._ctx is None or self._size != (w, h):
+            self._open(w, h)
+
+        video_frame = av.VideoFrame.from_ndarray(frame, format='bgr24')
+        # 时间戳按毫秒算，同一毫秒内的两帧也要严格递增
+        self._pts = max(self._pts + 1, int((self._clock() - self._start) * 1000))
+        video_frame.pts = self._pts
+        if self._force:
+            video_frame.pict_type = _i_frame()
+            self._force = False
+
+        packets = self._ctx.encode(video_frame)
+        if not packets:
+            return None
+        keyframe = any(p.is_keyframe for p in packets)
+        self.seq += 1
+        header = _HEADER.pack(MAGIC, VERSION, FLAG_KEYFRAME if keyframe else 0, self.codec_id,
+                              self.seq & 0xFFFFFFFF, w, h)
+        return header + b''.join(bytes(p) for p in packets)
+
+
+def is_keyframe(message):
+    return len(message) >= _HEADER.size and message[:2] == MAGIC and bool(message[3] & FLAG_KEYFRAME)
+
+
+def parse_header(message):
+    """返回 (keyframe, codec, seq, 宽, 高, 码流)（测试和调试用）"""
+    magic, version, flags, codec, seq, w, h = _HEADER.unpack_from(message, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a video message")
+    return bool(flags & FLAG_KEYFRAME), codec, seq, w, h, message[_HEADER.size:]
@@ -0,0 +1,169 @@
+"""状态推送流（SSE）
+
+所有订阅者都挂在同一个 asyncio 事件循环上，一个连接只是一个协程：
+  - 连上后先推一次完整快照（event: snapshot），之后只推有变化的字段（event: delta）
+  - 每个客户端用 ?interval= 自己决定最快多久收一次，期间的变化会合并
+  - 同一版本、同一基准的 delta 只序列化一次，所有订阅者共用同一份 bytes
+
+请求示例：GET /stream?code=<配对码>&interval=1  （也可以用 X-Secret-Code 头）
+同一个端口还可以挂别的 StatsHub（serve 的 extra 参数），例如 /alerts 推送告警状态。
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+STREAM_PORT = 8766  # 紧挨着投屏引擎的 8765
+_MISSING = object()
+
+
+class StatsHub:
+    """保存最新快照并唤醒所有订阅者"""
+
+    def __init__(self, snapshot=None):
+        self.loop = None
+        self.snapshot = dict(snapshot or {})
+        self.version = 0
+        self.subscribers = 0
+        self._changed = None
+        self._cache = {}
+
+    def bind(self, loop):
+        self.loop = loop
+        self._changed = loop.create_future()
+
+    def publish_threadsafe(self, snapshot):
+        """采集线程调用：把新快照交给事件循环"""
+        loop = self.loop
+        if loop is None:
+            self.snapshot = snapshot
+            return
+        loop.call_soon_threadsafe(self.publish, snapshot)
+
+    def publish(self, snapshot):
+        if snapshot == self.snapshot:
+            return  # 数值没变就不打扰任何人
+        self.snapshot = snapshot
+        self.version += 1
+        self._cache.clear()
+        fut, self._changed = self._changed, self.loop.create_future()
+        fut.set_result(None)
+
+    async def wait_newer(self, version, timeout):
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(self._changed), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def encode(self, base_version=None, base=None):
+        """基于 base 生成当前版本的 SSE 帧；base 为 None 时发完整快照"""
+        data = self._cache.get(base_version)
+        if data is None:
+            if base is None:
+                event, body = "snapshot", self.snapshot
+            else:
+                event = "delta"
+                body = {k: v for k, v in self.snapshot.items() if base.get(k, _MISSING) != v}
+            payload = json.dumps(body, separators=(',', ':'))
+            data = f"event: {event}\nid: {self.version}\ndata: {payload}\n\n".encode('utf-8')
+            self._cache[base_version] = data
+        return data
+
+    async def subscribe(self, writer, interval=1.0, keepalive=15.0):
+        """单个订阅者的推送循环，连接断开时返回"""
+        self.subscribers += 1
+        try:
+            writer.write(self.encode())
+            sent_version, sent = self.version, self.snapshot
+            last_send = time.monotonic()
+            await asyncio.wait_for(writer.drain(), 10)
+            while True:
+                if not await self.wait_newer(sent_version, keepalive):
+                    writer.write(b": ping\n\n")
+                    await asyncio.wait_for(writer.drain(), 10)
+                    continue
+                # 按客户端自己的速率限流，等待期间的多次变化合并成一次 delta
+                delay = last_send + interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer.write(self.encode(sent_version, sent))
+                sent_version, sent = self.version, self.snapshot
+                last_send = time.monotonic()
+                await asyncio.wait_for(writer.drain(), 10)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.subscribers -= 1
+
+
+def _http_response(writer, status, body):
+    data = json.dumps(body).encode('utf-8')
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(data)}\r\nAccess-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n".encode('latin-1')
+        + data
+    )
+
+
+async def handle_stream(hubs, check_code, reader, writer):
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        lines = head.decode('latin-1').split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            if key:
+                headers[key.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+
+        hub = hubs.get(url.path)
+        if method != "GET" or hub is None:
+            _http_response(writer, "404 Not Found", {"error": "Not Found"})
+            return
+        code = headers.get('x-secret-code') or query.get('code', [None])[0]
+        if not check_code(code):
+            _http_response(writer, "401 Unauthorized", {"error": "Auth Failed"})
+            return
+        try:
+            interval = min(max(float(query.get('interval', ['1'])[0]), 0.0), 60.0)
+        except ValueError:
+            interval = 1.0
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\nAccess-Control-Allow-Origin: *\r\n\r\n"
+        )
+        await hub.subscribe(writer, interval)
+    except (ValueError, ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+        pass
+    finally:
+        try:
+            await writer.drain()
+        except Exception:
+            pass
+        writer.close()
+
+
+async def serve(hub, host, port, check_code, extra=None, on_ready=None):
+    """extra：{路径: StatsHub}，和 /stream 共用端口和事件循环；on_ready() 在端口绑定成功后调用"""
+    hubs = {"/stream": hub, **(extra or {})}
+    loop = asyncio.get_running_loop()
+    for h in hubs.values():
+        h.bind(loop)
+    server = await asyncio.start_server(
+        lambda r, w: handle_stream(hubs, check_code, r, w), host, port
+    )
+    if on_ready is not None:
+        on_ready()
+    async with server:
+        await server.serve_forever()
+
+
+def run(hub, host, port, check_code, extra=None):
+    """独立线程入口：在该线程里跑一个事件循环"""
+    asyncio.run(serve(hub, host, port, check_code, extra))
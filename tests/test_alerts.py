@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from alerts import AlertEngine, QuantileSketch, RollingWindow, Rule
+
+
+def test_rule_parser():
+    rule = Rule("  cpu>=90.5   for 5m ")
+    assert (rule.text, rule.metric, rule.op, rule.threshold, rule.mode, rule.seconds) == (
+        "cpu>=90.5 for 5m", "cpu", ">=", 90.5, "for", 300)
+    assert rule.window is None
+    rule = Rule("gpu_temp < -5 p95 2h")
+    assert (rule.threshold, rule.mode, rule.seconds, rule.window.kind) == (-5, "p95", 7200, "p95")
+    assert Rule("ram > 85 avg 30").seconds == 30  # 不写单位按秒算
+    for bad in ("cpu > 90", "cpu = 90 for 5m", "cpu > ninety for 5m", "cpu > 90 median 5m", "cpu > 90 for 5d", ""):
+        with pytest.raises(ValueError):
+            Rule(bad)
+    assert AlertEngine.validate(["cpu  >  90 for 5m"]) == ["cpu > 90 for 5m"]
+
+
+def test_rolling_average_expires_old_samples():
+    window = RollingWindow(10, "avg")
+    assert window.value() is None
+    for t, v in enumerate([10, 20, 30]):
+        window.add(float(t), v)
+    assert window.value() == 20 and not window.full(2)
+    window.add(11.0, 60)  # t=0、1 已经在窗口外
+    assert window.value() == 45 and window.full(11)
+
+
+@pytest.mark.parametrize("kind, pick", [("max", max), ("min", min)])
+def test_rolling_extremes_match_a_rescan(kind, pick):
+    rng = random.Random(7)
+    window = RollingWindow(30, kind)
+    history = []
+    for t in range(500):
+        v = rng.uniform(0, 100)
+        window.add(float(t), v)
+        history.append((t, v))
+        assert window.value() == pick(x for s, x in history if s > t - 30)
+    assert len(window._extremes) <= 30
+
+
+def test_quantile_sketch_relative_error_and_removal():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(3, 1) for _ in range(5000)] + [0.0] * 100
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    ordered = sorted(values)
+    for q in (0.01, 0.5, 0.9, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    assert sketch.quantile(0) == 0.0
+    for v in values:
+        sketch.remove(v)
+    assert sketch.count == 0 and sketch.buckets == {} and sketch.keys == [] and sketch.quantile(0.5) is None
+
+
+def test_for_rule_needs_the_condition_to_hold_for_the_whole_window():
+    rule = Rule("cpu > 90 for 10s")
+    assert [rule.observe(float(t), 95) for t in range(0, 12, 2)] == [False] * 5 + [True]
+    assert rule.observe(12.0, 50) is False
+    assert rule.observe(13.0, 95) is False  # 重新计时
+
+
+def test_window_rule_keeps_state_until_the_window_is_full():
+    rule = Rule("ram > 85 avg 10s")
+    assert rule.observe(0.0, 99) is False
+    assert rule.observe(5.0, 99) is False  # 只看了 5 秒，不下结论
+    assert rule.observe(10.0, 99) is True
+
+
+def test_events_fire_resolve_and_page_by_cursor():
+    seen = []
+    engine = AlertEngine(["cpu > 90 for 2s", "ram > 50 max 5s"], on_event=seen.append)
+    for t in range(6):
+        engine.observe(float(t), {"cpu": 95, "ram": 10, "gpu": True})
+    assert [(e["rule"], e["state"], e["t"]) for e in seen] == [("cpu > 90 for 2s", "firing", 2.0)]
+    assert engine.active()[0]["rule"] == "cpu > 90 for 2s"
+    cursor = engine.since()["cursor"]
+
+    engine.observe(6.0, {"cpu": 10, "ram": "n/a"})  # 不是数字的值跳过
+    page = engine.since(cursor)
+    assert [(e["rule"], e["state"], e["value"]) for e in page["events"]] == [("cpu > 90 for 2s", "ok", 10)]
+    assert page["cursor"] == cursor + 1 and page["active"] == []
+    assert engine.since(page["cursor"])["events"] == []
+    assert engine.states()["ram > 50 max 5s"]["state"] == "ok"
+
+
+def test_event_queue_is_bounded():
+    engine = AlertEngine(["cpu > 90 for 0s"], max_events=3)
+    for t in range(10):
+        engine.observe(float(t), {"cpu": 95 if t % 2 else 10})
+    page = engine.since(0)
+    assert page["cursor"] == 9 and [e["id"] for e in page["events"]] == [7, 8, 9]
+
+
+def test_set_rules_keeps_unchanged_rules_and_resolves_removed_ones():
+    seen = []
+    engine = AlertEngine(["cpu > 90 for 2s", "ram > 50 avg 2s"], on_event=seen.append)
+    for t in range(4):
+        engine.observe(float(t), {"cpu": 95, "ram": 80})
+    assert {e["rule"] for e in seen} == {"cpu > 90 for 2s", "ram > 50 avg 2s"}
+    cursor = engine.since()["cursor"]
+    kept = engine.rules[0]
+
+    resolved = engine.set_rules(["cpu  >  90 for 2s", "gpu > 50 for 1m"], t=4.0)
+    assert engine.rules[0] is kept and kept.firing  # 规范化后文本相同：窗口和状态都留着
+    assert [(e["rule"], e["state"], e["removed"], e["t"]) for e in resolved] == [("ram > 50 avg 2s", "ok", True, 4.0)]
+    assert seen[-1] == resolved[0]
+    page = engine.since(cursor)
+    assert page["events"] == resolved
+    assert [a["rule"] for a in page["active"]] == ["cpu > 90 for 2s"]
+    assert page["rules"] == ["cpu > 90 for 2s", "gpu > 50 for 1m"]
+    # 保留下来的规则照常恢复
+    engine.observe(5.0, {"cpu": 10})
+    assert engine.since(page["cursor"])["events"][0]["state"] == "ok"
@@ -0,0 +1,101 @@
+from collections import namedtuple
+
+from breakdown import Breakdown, CounterDeltas
+
+CpuTimes = namedtuple('CpuTimes', 'user nice system idle iowait irq softirq steal guest guest_nice')
+Net = namedtuple('Net', 'bytes_sent bytes_recv')
+Disk = namedtuple('Disk', 'read_bytes write_bytes')
+Part = namedtuple('Part', 'device mountpoint fstype')
+Usage = namedtuple('Usage', 'total used free percent')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_counter_deltas_rates_per_second():
+    clock = Clock()
+    deltas = CounterDeltas(clock)
+    assert deltas.update(("eth0", "wlan0"), [(0, 0), (10, 10)]) is None  # 第一轮只建立基准
+    clock.now += 2
+    assert deltas.update(("eth0", "wlan0"), [(200, 100), (10, 50)]) == [[100, 50], [0, 20]]
+
+
+def test_counter_wraparound_or_reset_counts_as_zero():
+    clock = Clock()
+    deltas = CounterDeltas(clock)
+    deltas.update(("eth0",), [(2 ** 32 - 10, 5000)])
+    clock.now += 1
+    # 32 位计数器回绕 / 网卡重置：不会出现负的速率
+    assert deltas.update(("eth0",), [(20, 0)]) == [[0, 0]]
+    clock.now += 1
+    assert deltas.update(("eth0",), [(120, 300)]) == [[100, 300]]
+
+
+def test_counter_rows_changing_rebuilds_the_baseline():
+    clock = Clock()
+    deltas = CounterDeltas(clock)
+    deltas.update(("eth0",), [(0, 0)])
+    clock.now += 1
+    assert deltas.update(("eth0", "usb0"), [(100, 100), (0, 0)]) is None  # 插了块网卡
+    clock.now += 1
+    assert deltas.update(("eth0", "usb0"), [(200, 100), (5, 5)]) == [[100, 0], [5, 5]]
+    assert deltas.update(("eth0", "usb0"), [(300, 100), (5, 5)]) is None  # 时间没走
+
+
+def cpu(user=0.0, system=0.0, idle=0.0, iowait=0.0, guest=0.0):
+    return CpuTimes(user, 0.0, system, idle, iowait, 0.0, 0.0, 0.0, guest, 0.0)
+
+
+def test_per_cpu_percent_from_deltas():
+    rounds = [
+        [cpu(10, 10, 80), cpu(0, 0, 100), cpu(50, 0, 50, 0, 50)],
+        # 核 0：20 忙 / 40 总；核 1：全空闲 + iowait；核 2：guest 已经算在 user 里，不重复计
+        [cpu(20, 20, 100), cpu(0, 0, 150, 50), cpu(100, 0, 50, 0, 100)],
+        # 计数器被重置（虚拟机迁移之类）：增量按 0 算，不出负数；核 1 没有任何时间流逝
+        [cpu(0, 0, 0), cpu(0, 0, 150, 50), cpu(150, 0, 50, 0, 150)],
+    ]
+    it = iter(rounds)
+    breakdown = Breakdown(cpu_times=lambda: next(it), clock=Clock())
+    assert breakdown.cpus() is None
+    assert breakdown.cpus() == [50.0, 0.0, 100.0]
+    assert breakdown.cpus() == [0.0, 0.0, 100.0]
+
+
+def test_cpu_count_change_rebuilds_baseline():
+    rounds = iter([[cpu(1, 1, 1)], [cpu(2, 2, 2), cpu(1, 1, 1)], [cpu(3, 2, 3), cpu(1, 2, 3)]])
+    breakdown = Breakdown(cpu_times=lambda: next(rounds), clock=Clock())
+    assert breakdown.cpus() is None
+    assert breakdown.cpus() is None  # 热插拔 CPU
+    assert breakdown.cpus() == [50.0, 33.3]
+
+
+def test_io_nics_disks_and_partitions():
+    clock = Clock()
+    net = {"eth0": Net(0, 0)}
+    disk = {"sda": Disk(0, 0)}
+    usage = {"/": Usage(100, 40, 60, 40.0)}
+
+    def disk_usage(mount):
+        if mount not in usage:
+            raise PermissionError(mount)
+        return usage[mount]
+
+    breakdown = Breakdown(cpu_times=lambda: [cpu(1, 1, 1)], net_counters=lambda: net, disk_counters=lambda: disk,
+                          partitions=lambda: [Part("/dev/sda1", "/", "ext4"), Part("/dev/sda1", "/", "ext4"),
+                                              Part("/dev/sr0", "/media/cd", "iso9660")],
+                          disk_usage=disk_usage, clock=clock)
+    assert breakdown.io() == {}  # 第一轮都没有基准
+    clock.now += 0.5
+    net["eth0"] = Net(1000, 333)
+    disk["sda"] = Disk(512, 0)
+    out = breakdown.io()
+    assert out["nics"] == {"eth0": {"up": 2000.0, "down": 666.0}}
+    assert out["disks"] == {"sda": {"read": 1024.0, "write": 0.0}}
+    assert out["cpus"] == [0.0]
+    assert breakdown.partitions() == [
+        {"mount": "/", "device": "/dev/sda1", "fstype": "ext4", "total": 100, "used": 40, "percent": 40.0}]
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from collectors import Collector, CollectorScheduler, Snapshot
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_snapshot_is_read_only():
+    snap = Snapshot({"cpu": 1})
+    with pytest.raises(TypeError):
+        snap["cpu"] = 2
+    with pytest.raises(TypeError):
+        snap.update(ram=3)
+    assert Snapshot(snap, ram=3) == {"cpu": 1, "ram": 3}
+
+
+def test_each_collector_runs_on_its_own_interval():
+    clock = FakeClock()
+    published = []
+    scheduler = CollectorScheduler(initial={"gpu": 0}, on_update=published.append, clock=clock)
+    calls = {"fast": 0, "slow": 0}
+
+    @scheduler.collector("fast", interval=0.5)
+    def fast():
+        calls["fast"] += 1
+        return {"cpu": calls["fast"]}
+
+    @scheduler.collector("slow", interval=2.0)
+    def slow():
+        calls["slow"] += 1
+        return {"disk": calls["slow"]}
+
+    for _ in range(9):  # 0 .. 4 秒
+        scheduler.run_pending()
+        clock.now += 0.5
+    assert calls == {"fast": 9, "slow": 3}
+    assert scheduler.snapshot() == {"gpu": 0, "cpu": 9, "disk": 3}
+    assert all(isinstance(snap, Snapshot) for snap in published)
+
+
+def test_duplicate_name_is_rejected():
+    scheduler = CollectorScheduler()
+    scheduler.register(Collector("cpu", dict))
+    with pytest.raises(ValueError):
+        scheduler.register(Collector("cpu", dict))
+
+
+def test_falling_behind_realigns_instead_of_catching_up():
+    clock = FakeClock()
+    scheduler = CollectorScheduler(clock=clock)
+    runs = []
+    scheduler.register(Collector("cpu", lambda: runs.append(clock.now) or {}, interval=1.0))
+    scheduler.run_pending()
+    clock.now += 10
+    scheduler.run_pending()
+    scheduler.run_pending()
+    assert len(runs) == 2
+
+
+def test_errors_are_recorded_and_do_not_stop_others():
+    clock = FakeClock()
+    scheduler = CollectorScheduler(clock=clock)
+    scheduler.register(Collector("broken", lambda: 1 / 0))
+    scheduler.register(Collector("ok", lambda: {"ram": 50}))
+    scheduler.run_pending()
+    health = scheduler.health()
+    assert health["broken"]["errors"] == 1 and "ZeroDivisionError" in health["broken"]["last_error"]
+    assert health["ok"]["runs"] == 1
+    assert scheduler.snapshot() == {"ram": 50}
+
+
+def test_slow_collector_goes_stale_without_blocking_fast_one():
+    scheduler = CollectorScheduler()
+    release = threading.Event()
+
+    @scheduler.collector("gpu", interval=0.05, timeout=0.1)
+    def gpu():
+        release.wait(5)
+        return {"gpu": 1}
+
+    @scheduler.collector("cpu", interval=0.05)
+    def cpu():
+        return {"cpu": time.monotonic()}
+
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not scheduler.health()["gpu"]["stale"]:
+            time.sleep(0.02)
+        health = scheduler.health()
+        assert health["gpu"]["stale"] and health["gpu"]["timeouts"] == 1
+        assert health["cpu"]["runs"] >= 2
+        release.set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and "gpu" not in scheduler.snapshot():
+            time.sleep(0.02)
+        assert scheduler.snapshot()["gpu"] == 1
+    finally:
+        release.set()
+        scheduler.stop()
@@ -0,0 +1,100 @@
+import json
+
+import discovery
+from discovery import Beacon, DiscoveryProtocol, RateLimiter, parse_probe, parse_reply, probe
+
+
+def test_parse_probe_versions_and_codes():
+    assert parse_probe(b"FIND_SERVER:2222", "2222") == 1  # 老客户端不带版本号
+    assert parse_probe(probe("2222"), "2222") == discovery.PROTOCOL
+    assert parse_probe(b"FIND_SERVER:2222:7\n", "2222") == 7
+    assert parse_probe(b"FIND_SERVER:1111", "2222") is None
+    assert parse_probe(b"FIND_SERVER:2222:x", "2222") is None
+    assert parse_probe(b"FIND_ME:2222", "2222") is None
+    assert parse_probe(b"\xff\xfe", "2222") is None
+
+
+def test_parse_probe_code_with_colons():
+    assert parse_probe(b"FIND_SERVER:a:b", "a:b") == 1
+    assert parse_probe(b"FIND_SERVER:a:b:2", "a:b") == 2
+    assert parse_probe(b"FIND_SERVER:a:b:2", "a:b:2") == 1  # 整个配对码对上了就是老客户端
+    assert parse_probe(b"FIND_SERVER:a:2", "a:b") is None
+    assert parse_probe(b"FIND_SERVER:a", "a:b") is None
+
+
+def make_beacon(stats=None):
+    stats = {"cpu": 12.4, "ram": 50.6, "gpu": None} if stats is None else stats
+    return Beacon(port=lambda: 5000, specs=lambda: {"cpu": "x"}, stats=lambda: stats, code=lambda: "2222",
+                  hostname="box")
+
+
+def test_reply_format_and_mac():
+    payload = make_beacon().payload()
+    head, mac, body = payload.split(b" ", 2)
+    assert head == b"HERE_I_AM:2" and len(mac) == discovery.MAC_SIZE * 2
+    assert json.loads(body) == {"p": 5000, "h": "box", "s": make_beacon().specs_hash(), "l": [12, 51, 0]}
+    info = parse_reply(payload, "2222")
+    assert info == {"port": 5000, "hostname": "box", "specs": make_beacon().specs_hash(), "load": [12, 51, 0]}
+    assert parse_reply(payload, "1111") is None  # 配对码不同，mac 对不上
+    assert parse_reply(payload.replace(b"5000", b"5001"), "2222") is None
+    assert parse_reply(b"HERE_I_AM", "2222") == {}  # 老版本：没有端口
+    assert parse_reply(b"HERE_I_AM:3 abc {}", "2222") is None
+
+
+def test_payload_is_cached_until_something_changes():
+    stats = {"cpu": 10.2, "ram": 20, "gpu": 0}
+    beacon = make_beacon(stats)
+    first = beacon.payload()
+    stats["cpu"] = 10.4  # 取整后没变
+    assert beacon.payload() is first and beacon.builds == 1
+    stats["cpu"] = 11
+    assert beacon.payload() is not first and beacon.builds == 2
+
+
+class Transport:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+
+
+def test_old_probe_gets_bare_reply_new_probe_gets_versioned_reply():
+    # 老版本 Dart 客户端按整包相等判断 HERE_I_AM，不能给它发带版本的应答
+    logs = []
+    proto = DiscoveryProtocol(make_beacon(), logs.append)
+    proto.connection_made(Transport())
+    proto.datagram_received(b"FIND_SERVER:2222", ("10.0.0.2", 1))
+    proto.datagram_received(b"FIND_SERVER:2222:2", ("10.0.0.3", 1))
+    proto.datagram_received(b"FIND_SERVER:1111:2", ("10.0.0.4", 1))
+    proto.datagram_received(b"FIND_SERVER:2222:2" + b" " * discovery.MAX_PROBE, ("10.0.0.5", 1))
+    sent = proto.transport.sent
+    assert sent[0] == (b"HERE_I_AM", ("10.0.0.2", 1))
+    assert sent[1][0].startswith(b"HERE_I_AM:2 ") and sent[1][1] == ("10.0.0.3", 1)
+    assert len(sent) == 2
+    assert len(logs) == 2
+    # 同一个设备一分钟内只记一次日志
+    proto.datagram_received(b"FIND_SERVER:2222", ("10.0.0.2", 1))
+    assert len(proto.transport.sent) == 3 and len(logs) == 2
+
+
+def test_rate_limiter_per_source_token_bucket():
+    now = [0.0]
+    limiter = RateLimiter(rate=2.0, burst=3, max_sources=2, clock=lambda: now[0])
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow("b")  # 别的地址不受影响
+    now[0] = 0.5  # 补回一个令牌
+    assert limiter.allow("a") and not limiter.allow("a")
+    now[0] = 100.0  # 最多攒 burst 个
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.dropped == 3
+    limiter.allow("c")  # 只记 max_sources 个地址，最久没动静的 b 被挤掉
+    assert set(limiter._buckets) == {"a", "c"}
+
+
+def test_flood_from_one_source_is_dropped_before_parsing():
+    proto = DiscoveryProtocol(make_beacon(), lambda line: None, limiter=RateLimiter(rate=0, burst=2))
+    proto.connection_made(Transport())
+    for _ in range(10):
+        proto.datagram_received(b"FIND_SERVER:2222:2", ("10.0.0.9", 1))
+    assert len(proto.transport.sent) == 2 and proto.limiter.dropped == 8
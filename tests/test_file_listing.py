@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from file_listing import DirCache, iter_json, scan_dir
+
+
+@pytest.fixture
+def folder(tmp_path):
+    (tmp_path / "b.txt").write_bytes(b"12345")
+    (tmp_path / "A.log").write_bytes(b"1")
+    (tmp_path / "zdir").mkdir()
+    (tmp_path / "Adir").mkdir()
+    return tmp_path
+
+
+def test_scan_dir_lists_folders_first_case_insensitive(folder):
+    items = scan_dir(folder)
+    assert [(i["name"], i["type"], i["size"]) for i in items] == [
+        ("Adir", "dir", 0), ("zdir", "dir", 0), ("A.log", "file", 1), ("b.txt", "file", 5)]
+    assert items[0]["path"] == os.path.join(str(folder), "Adir")
+
+
+def test_broken_symlink_is_listed_without_size(folder):
+    try:
+        os.symlink(folder / "missing", folder / "dangling")
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks not available")
+    entry = next(i for i in scan_dir(folder) if i["name"] == "dangling")
+    assert entry["type"] == "file" and entry["size"] == 0
+
+
+def test_iter_json_streams_a_valid_array(folder):
+    items = json.loads("".join(iter_json(folder)))
+    assert sorted(i["name"] for i in items) == ["A.log", "Adir", "b.txt", "zdir"]
+    assert json.loads("".join(iter_json(folder / "Adir"))) == []
+
+
+def test_iter_json_raises_before_streaming(tmp_path):
+    with pytest.raises(OSError):
+        iter_json(tmp_path / "nope")
+
+
+def test_cache_hits_until_directory_changes(folder):
+    now = [0.0]
+    cache = DirCache(ttl=30, clock=lambda: now[0])
+    first = cache.listing(str(folder))
+    assert cache.listing(str(folder)) is first
+    (folder / "c.txt").write_bytes(b"")
+    st = os.stat(folder)
+    os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))  # 有的文件系统 mtime 精度很粗
+    second = cache.listing(str(folder))
+    assert second is not first and "c.txt" in [i["name"] for i in second]
+    now[0] = 31.0  # ttl 过期后即使 mtime 没变也重新扫描
+    assert cache.listing(str(folder)) is not second
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    dirs = []
+    for name in "abc":
+        d = tmp_path / name
+        d.mkdir()
+        for i in range(3):
+            (d / f"{i}.txt").write_bytes(b"")
+        dirs.append(str(d))
+    cache = DirCache(maxsize=2)
+    a = cache.listing(dirs[0])
+    cache.listing(dirs[1])
+    assert cache.listing(dirs[0]) is a
+    cache.listing(dirs[2])  # 挤掉最久没用的 b
+    assert cache.listing(dirs[0]) is a
+    assert list(cache._items) == [dirs[2], dirs[0]]
+
+    small = DirCache(max_items=4)
+    small.listing(dirs[0])
+    small.listing(dirs[1])
+    assert list(small._items) == [dirs[1]]
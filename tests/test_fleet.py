@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+
+import fleet
+import wire_format
+
+
+async def start_stub(mode):
+    """假探针：ok 回 JSON，compact 回紧凑格式，hang 收下请求不回，stall 只回第一个请求，close 每次回完就断开"""
+    requests = []
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                requests.append(head)
+                if mode == "hang" or (mode == "stall" and len(requests) > 1):
+                    await asyncio.sleep(3600)
+                if b"X-Secret-Code: 2222" not in head:
+                    body, ctype = b'{"error":"code"}', "application/json"
+                    writer.write(b"HTTP/1.1 401 UNAUTHORIZED\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (ctype.encode(), len(body), body))
+                elif mode == "compact":
+                    body = wire_format.encode_snapshot(time.time(), {"cpu": 12.5, "ram": 40})
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (wire_format.content_type().encode(), len(body), body))
+                else:
+                    body = json.dumps({"cpu": 50.0, "ram": 60.0}).encode()
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (len(body), body))
+                await writer.drain()
+                if mode == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1], requests
+
+
+def test_hanging_peer_times_out_without_delaying_the_round():
+    async def main():
+        stubs = {mode: await start_stub(mode) for mode in ("ok", "compact", "hang", "stall", "close")}
+        gateway = fleet.Fleet(lambda: "2222", peers=[('127.0.0.1', port) for _, port, _ in stubs.values()],
+                              discovery=False, timeout=0.3, log=lambda line: None)
+        peers = {mode: next(p for p in gateway.peers.values() if p.port == port)
+                 for mode, (_, port, _) in stubs.items()}
+        try:
+            for _ in range(3):
+                start = time.monotonic()
+                await gateway.poll_all()
+                # 卡住的那台只占自己的 timeout，整轮不会拖到 2～3 倍
+                assert time.monotonic() - start < 0.3 + 0.2
+
+            snap = gateway.snapshot()
+            assert (snap["online"], snap["total"]) == (3, 5)
+            hosts = {h["port"]: h for h in snap["hosts"]}
+            assert hosts[peers["ok"].port]["stats"] == {"cpu": 50.0, "ram": 60.0}
+            assert hosts[peers["compact"].port]["stats"] == {"cpu": 12.5, "ram": 40.0}
+            for mode in ("ok", "compact", "close"):
+                view = hosts[peers[mode].port]
+                assert view["online"] and view["error"] is None and view["age"] < 1
+            hung = hosts[peers["hang"].port]
+            assert not hung["online"] and hung["error"] == "timeout" and hung["stats"] is None
+            assert peers["hang"].failures == 3
+            # 复用的连接超时了不会再重连重试一遍
+            stalled = hosts[peers["stall"].port]
+            assert stalled["error"] == "timeout" and stalled["stats"] == {"cpu": 50.0, "ram": 60.0}
+
+            # 长连接复用：正常的主机三轮只连一次，每次回完就断开的也照样能用
+            assert len(stubs["ok"][2]) == 3
+            assert len(stubs["close"][2]) == 3
+        finally:
+            for peer in gateway.peers.values():
+                peer.close()
+            for server, _, _ in stubs.values():
+                server.close()
+
+    asyncio.run(main())
+
+
+def test_peer_going_away_is_reported_and_goes_stale():
+    async def main():
+        server, port, _ = await start_stub("ok")
+        gateway = fleet.Fleet(lambda: "2222", peers=[('127.0.0.1', port)], discovery=False, timeout=0.3,
+                              log=lambda line: None)
+        peer = next(iter(gateway.peers.values()))
+        await gateway.poll_all()
+        assert peer.error is None and peer.last_ok is not None
+        server.close()
+        await server.wait_closed()
+        peer.close()  # 对方进程退出，长连接也没了
+        await asyncio.sleep(0.1)
+        await gateway.poll_all()
+        view = gateway.snapshot()["hosts"][0]
+        assert not view["online"] and view["error"].startswith("connect failed")
+        assert view["stats"] == {"cpu": 50.0, "ram": 60.0}  # 保留最后一次的数据，靠 age 判断新鲜度
+        assert view["age"] >= 0.1
+
+    asyncio.run(main())
+
+
+def test_wrong_code_is_an_http_error():
+    async def main():
+        server, port, _ = await start_stub("ok")
+        gateway = fleet.Fleet(lambda: "9999", peers=[('127.0.0.1', port)], discovery=False, timeout=0.3,
+                              log=lambda line: None)
+        try:
+            await gateway.poll_all()
+            view = gateway.snapshot()["hosts"][0]
+            assert view["error"] == "HTTP 401" and not view["online"]
+        finally:
+            for peer in gateway.peers.values():
+                peer.close()
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_parse_peers_and_local_duplicates_merge():
+    assert fleet.parse_peers("127.0.0.1:5101, 10.0.0.8:5000,:5002") == [
+        ("127.0.0.1", 5101), ("10.0.0.8", 5000), ("127.0.0.1", 5002)]
+    gateway = fleet.Fleet(lambda: "2222", peers=[('127.0.0.1', 5000)], discovery=False)
+    gateway.add_peer('localhost', [5000, 5001])
+    assert len(gateway.peers) == 1
@@ -0,0 +1,76 @@
+import io
+import time
+
+from gpu_sampler import TypeperfParser, TypeperfSampler
+
+HEADER = ('"(PDH-CSV 4.0)","\\\\PC\\GPU Engine(pid_1_luid_0x0_0x1_phys_0_eng_0_engtype_3D)\\Utilization Percentage",'
+          '"\\\\PC\\GPU Engine(pid_2_luid_0x0_0x1_phys_0_eng_0_engtype_3D)\\Utilization Percentage",'
+          '"\\\\PC\\GPU Engine(pid_2_luid_0x0_0x1_phys_0_eng_1_engtype_VideoDecode)\\Utilization Percentage"\n')
+
+
+def test_parser_sums_per_engine_type_and_takes_busiest():
+    parser = TypeperfParser()
+    assert parser.feed('\n') is None
+    assert parser.feed(HEADER) is None
+    assert parser.feed('"10/18/2026 10:00:00.000","20.5","30.0","45.0"\n') == 50.5
+    assert parser.feed('"10/18/2026 10:00:01.000","5","5","45.0"\n') == 45.0
+
+
+def test_parser_skips_noise_and_empty_columns():
+    parser = TypeperfParser()
+    assert parser.feed('"10/18/2026 10:00:00.000","1","2","3"') is None  # 还没见到表头
+    parser.feed(HEADER)
+    assert parser.feed('Exiting, please wait...') is None
+    assert parser.feed('"10/18/2026 10:00:00.000"," ","","12"') == 12.0  # 进程退出后列变空
+    assert parser.feed('"10/18/2026 10:00:00.000","","",""') is None
+
+
+def test_parser_without_engine_types_sums_and_caps():
+    parser = TypeperfParser()
+    parser.feed('"(PDH-CSV 4.0)","\\\\PC\\GPU(0)\\Load","\\\\PC\\GPU(1)\\Load"')
+    assert parser.feed('"t","70","60"') == 100.0
+
+
+class FakeProc:
+    def __init__(self, lines):
+        self.stdout = io.StringIO(''.join(lines))
+        self.terminated = False
+
+    def poll(self):
+        return 0 if self.terminated else None
+
+    def terminate(self):
+        self.terminated = True
+
+    def wait(self, timeout=None):
+        return 0
+
+
+def test_sampler_keeps_one_process_and_reports_latest_value():
+    procs = []
+
+    def popen(cmd, **kwargs):
+        assert cmd[0] == 'typeperf' and '-si' in cmd
+        procs.append(FakeProc([HEADER, '"t","10","0","0"\n', '"t","20","0","0"\n']))
+        return procs[-1]
+
+    sampler = TypeperfSampler(popen=popen, backoff=60)
+    assert sampler.read() is None
+    assert sampler._stream_once() is True
+    assert sampler.read() == 20.0
+    assert len(procs) == 1
+
+
+def test_sampler_value_expires_and_failures_back_off():
+    now = [0.0]
+    sampler = TypeperfSampler(popen=lambda cmd, **kw: FakeProc([]), clock=lambda: now[0], max_age=5,
+                              backoff=0.01, max_backoff=0.01)
+    sampler.value, sampler.updated = 33.0, 0.0
+    now[0] = 6.0
+    assert sampler.read() is None
+    sampler.start()
+    deadline = time.monotonic() + 5
+    while sampler.failures < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sampler.stop()
+    assert sampler.failures >= 2
@@ -0,0 +1,101 @@
+import glob
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import platform_adapters
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write(root, rel, text):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_linux_platform_reads_specs_from_fake_root(tmp_path):
+    root = str(tmp_path)
+    _write(root, 'etc/os-release', 'NAME="Debian"\nPRETTY_NAME="Debian GNU/Linux 12 (bookworm)"\n')
+    _write(root, 'proc/cpuinfo', 'processor\t: 0\nmodel name\t: AMD  Ryzen 7\n')
+    _write(root, 'proc/meminfo', 'MemTotal:  16777216 kB\nMemFree:  1 kB\nMemAvailable:  4194304 kB\n')
+    _write(root, 'sys/class/drm/card0/device/vendor', '0x1002\n')
+    _write(root, 'sys/class/drm/card0/device/uevent', 'DRIVER=amdgpu\n')
+    _write(root, 'sys/class/drm/card0/device/gpu_busy_percent', '37\n')
+    adapter = platform_adapters.LinuxPlatform(root)
+    specs = adapter.specs()
+    assert specs["os"] == "Debian GNU/Linux 12 (bookworm)"
+    assert (specs["cpu"], specs["gpu"], specs["ram"]) == ("AMD Ryzen 7", "AMD (amdgpu)", "16.0 GB")
+    assert adapter.ram_percent() == 75.0
+    assert adapter.gpu_load() == (37.0, 0)
+    assert not adapter.autostart_supported and adapter.set_autostart(True) is False
+
+
+def test_generic_platform_needs_no_windows_libraries():
+    adapter = platform_adapters.GenericPlatform()
+    assert adapter.gpu_load() == (0, 0) and 0 <= adapter.ram_percent() <= 100
+    assert {"os", "cpu", "gpu"} <= set(adapter.specs())
+    for module in ("winreg", "wmi", "GPUtil"):
+        assert module not in sys.modules or sys.platform == "win32"
+
+
+def _free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _run_headless(app_dir, *args, env=None):
+    """起一个 --headless 探针，等到它把配对码写进日志，返回日志内容"""
+    log_file = os.path.join(app_dir, 'server_monitor.log')
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    proc = subprocess.Popen(
+        [sys.executable, 'main_server.py', '--headless', '--port', str(_free_port()),
+         '--stream-port', str(_free_port()), *args],
+        cwd=app_dir, env=dict(os.environ, **(env or {})), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if os.path.exists(log_file):
+                with open(log_file, encoding='utf-8') as f:
+                    text = f.read()
+                if '[🔑]' in text:
+                    return text
+            assert proc.poll() is None, "headless agent exited early"
+            time.sleep(0.1)
+        raise AssertionError("no pairing code logged")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def _config(app_dir):
+    with open(os.path.join(app_dir, 'config.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX SIGTERM")
+def test_headless_pairing_code_is_persisted_and_logged(tmp_path):
+    pytest.importorskip("flask_cors")
+    app_dir = str(tmp_path)
+    for path in glob.glob(os.path.join(REPO, '*.py')):
+        shutil.copy(path, app_dir)
+
+    first = _run_headless(app_dir)
+    code = _config(app_dir)["secret_code"]
+    assert f"配对码: {code}" in first
+    assert f"配对码: {code}" in _run_headless(app_dir)  # 重启后不变
+
+    override = _run_headless(app_dir, '--code', 'abc:123')
+    assert "abc:123" not in override and "--code" in override
+    assert _config(app_dir)["secret_code"] == code  # --code 不写进配置文件
+    _run_headless(app_dir, env={"SERVER_MONITOR_CODE": "env-code"})
+    assert _config(app_dir)["secret_code"] == code
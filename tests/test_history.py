@@ -0,0 +1,66 @@
+import pytest
+
+from history import History, HistoryTier
+
+
+def test_samples_in_one_bucket_are_averaged():
+    tier = HistoryTier(step=10, capacity=4)
+    tier.add(100, {"cpu": 10.0})
+    tier.add(105, {"cpu": 30.0})
+    tier.add(110, {"cpu": 50.0})  # 进入下一个桶，上一个桶落盘
+    ts, cols = tier.since(0, ["cpu"])
+    assert ts == [100.0] and cols == {"cpu": [20.0]}
+
+
+def test_ring_buffer_keeps_only_capacity_newest():
+    tier = HistoryTier(step=1, capacity=3)
+    for t in range(6):
+        tier.add(t, {"ram": float(t)})
+    ts, cols = tier.since(-1, ["ram"])
+    assert ts == [2.0, 3.0, 4.0] and cols["ram"] == [2.0, 3.0, 4.0]
+    assert tier.wrapped() and tier.oldest() == 2.0
+
+
+def test_missing_metric_becomes_none():
+    tier = HistoryTier(step=1, capacity=4)
+    tier.add(0, {"cpu": 1.0, "gpu": 5.0})
+    tier.add(1, {"cpu": 2.0})
+    tier.add(2, {"cpu": 3.0})
+    _, cols = tier.since(-1, ["cpu", "gpu"])
+    assert cols == {"cpu": [1.0, 2.0], "gpu": [5.0, None]}
+
+
+def test_record_skips_non_numeric_and_caps_metrics():
+    history = History(tiers=((1, 10),), max_metrics=2)
+    for t in range(3):
+        history.record(t, {"cpu": t, "ram": 50, "gpu": 7, "online": True, "name": "pc"})
+    assert history.metrics == ["cpu", "ram"]
+    assert set(history.query()["metrics"]) == {"cpu", "ram"}
+
+
+def test_query_cursor_returns_only_new_samples():
+    history = History(tiers=((1, 60),))
+    for t in range(1000, 1005):
+        history.record(t, {"cpu": t - 1000})
+    first = history.query(["cpu"])
+    assert first["t"] == [1000.0, 1001.0, 1002.0, 1003.0] and first["cursor"] == 1003.0
+    for t in range(1005, 1007):
+        history.record(t, {"cpu": t - 1000})
+    second = history.query(["cpu"], since=first["cursor"])
+    assert second["t"] == [1004.0, 1005.0] and second["metrics"]["cpu"] == [4.0, 5.0]
+    assert history.query(["cpu"], since=second["cursor"])["t"] == []
+
+
+def test_downsampled_tier_is_picked_when_fine_tier_wrapped():
+    history = History(tiers=((1, 10), (5, 10)))
+    for t in range(31):
+        history.record(t, {"cpu": t})
+    fine = history.query(since=25)
+    assert fine["resolution"] == 1
+    coarse = history.query(since=0)
+    assert coarse["resolution"] == 5
+    assert coarse["t"] == [5.0, 10.0, 15.0, 20.0, 25.0]
+    assert coarse["metrics"]["cpu"] == [7.0, 12.0, 17.0, 22.0, 27.0]
+    assert history.query(since=0, resolution=1)["resolution"] == 1
+    with pytest.raises(ValueError):
+        history.query(resolution=2)
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+import input_channel as ic
+from input_control import InputDispatcher, RecordingBackend
+
+CODE = "2222"
+ADDR = ("10.0.0.5", 40000)
+
+
+@pytest.fixture
+def channel():
+    backend = RecordingBackend(screen=(1000, 500))
+    channel = ic.InputChannel(InputDispatcher(backend), lambda: CODE, max_sessions=2)
+    channel.backend = backend
+    return channel
+
+
+def send(channel, session, seq, opcode=ic.OP_MOVE, a=100, b=0, code=CODE, addr=ADDR):
+    return channel.handle([(ic.encode_packet(code, opcode, session, seq, a, b), addr)])
+
+
+def test_packet_round_trip_and_bad_mac():
+    data = ic.encode_packet(CODE, ic.OP_ABS_MOVE, 7, 3, 65535, -1)
+    assert len(data) == ic.PACKET_SIZE
+    assert ic.decode_packet(CODE, data) == (ic.OP_ABS_MOVE, 7, 3, 65535, -1)
+    assert ic.decode_packet("9999", data) is None  # 配对码不对
+    tampered = bytearray(data)
+    tampered[12] ^= 1  # 改了 seq，mac 对不上
+    assert ic.decode_packet(CODE, bytes(tampered)) is None
+    assert ic.decode_packet(CODE, data[:-1]) is None
+    old = ic._HEADER.pack(ic.MAGIC, 1, ic.OP_MOVE, 7, 3, 0, 0)
+    assert ic.decode_packet(CODE, old + ic._mac(CODE, old)) is None  # 版本不对
+
+
+def test_bad_mac_is_dropped_without_reply(channel):
+    session = channel.open_session()
+    assert send(channel, session, 1, code="9999") == 0
+    assert channel.dropped == 1 and channel.backend.calls == []
+
+
+def test_replayed_sequence_is_executed_once(channel):
+    session = channel.open_session()
+    assert send(channel, session, 1) == 1
+    assert send(channel, session, 1) == 0
+    # 从别的端口重放也一样：去重状态跟着 session 走
+    assert send(channel, session, 1, addr=("10.0.0.5", 40001)) == 0
+    assert channel.backend.calls == [("move_rel", 1, 0)]
+
+
+def test_out_of_order_moves_still_apply_but_stale_absolute_is_dropped(channel):
+    session = channel.open_session()
+    assert send(channel, session, 5) == 1
+    assert send(channel, session, 3) == 1  # 相对移动乱序到达照常累加
+    assert send(channel, session, 4, ic.OP_ABS_MOVE, 0, 0) == 0  # 比已处理的最新包旧的绝对位置
+    assert send(channel, session, 2, ic.OP_ABS_DOWN, 0, 0) == 1  # 带按下的不能丢
+    assert channel.backend.calls == [("move_rel", 1, 0), ("move_rel", 1, 0), ("move_to", 0, 0), ("mouse_down", "left")]
+
+
+def test_sequence_outside_the_replay_window_is_dropped(channel):
+    session = channel.open_session()
+    top = ic.REPLAY_WINDOW + 10
+    assert send(channel, session, top) == 1
+    assert send(channel, session, top - ic.REPLAY_WINDOW) == 0  # 刚好出窗口
+    assert send(channel, session, top - ic.REPLAY_WINDOW + 1) == 1  # 窗口里最旧的还认
+    assert send(channel, session, top - ic.REPLAY_WINDOW + 1) == 0
+
+
+def test_window_bitmap_tracks_each_sequence():
+    state = ic._Session(1)
+    assert state.check(3) == (True, True)
+    assert state.check(1) == (True, False)
+    assert state.check(2) == (True, False)
+    assert state.check(2) == (False, False)
+    assert state.check(0) == (False, False)  # seq 0 留给握手
+    assert state.check(3 + ic.REPLAY_WINDOW) == (True, True)
+    assert state.check(3) == (False, False)
+
+
+def test_unknown_and_expired_sessions_get_reset(channel):
+    class Sock:
+        sent = []
+
+        def sendto(self, data, addr):
+            self.sent.append((ic.decode_packet(CODE, data), addr))
+
+    channel.sock = Sock()
+    assert send(channel, 12345, 1) == 0
+    assert Sock.sent == [((ic.OP_RESET, 12345, 0, 0, 0), ADDR)]
+
+    first = channel.open_session()
+    assert send(channel, first, 1) == 1
+    channel.open_session()
+    channel.open_session()  # max_sessions=2：最久没用过的 first 被挤掉
+    assert first not in channel.sessions
+    Sock.sent.clear()
+    assert send(channel, first, 2) == 0
+    assert Sock.sent == [((ic.OP_RESET, first, 0, 0, 0), ADDR)]
+
+
+def test_hello_over_udp_then_reset_rehandshakes():
+    backend = RecordingBackend(screen=(1000, 500))
+    channel = ic.InputChannel(InputDispatcher(backend), lambda: CODE, host='127.0.0.1', port=0).bind()
+    threading.Thread(target=channel.serve_forever, daemon=True).start()
+    client = ic.InputClient(CODE, port=channel.port)
+    try:
+        first = client.handshake()
+        assert first in channel.sessions
+        client.move(1, 0)
+        deadline = time.monotonic() + 2
+        while not backend.calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        channel.sessions.clear()  # 服务端重启 / session 被挤掉
+        client.move(2, 0)  # 这一包收到 RESET
+        while client.session == first and time.monotonic() < deadline:
+            client.move(3, 0)
+            time.sleep(0.05)
+        assert client.session != first and client.session in channel.sessions
+        while ("move_rel", 3, 0) not in backend.calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backend.calls[0] == ("move_rel", 1, 0) and ("move_rel", 3, 0) in backend.calls
+    finally:
+        client.sock.close()  # 服务端线程是 daemon，阻塞在 recvfrom 上随进程退出
@@ -0,0 +1,69 @@
+import pytest
+
+from input_control import InputDispatcher, RecordingBackend
+
+
+@pytest.fixture
+def backend():
+    return RecordingBackend(screen=(1000, 500))
+
+
+def test_consecutive_moves_merge_into_one_call(backend):
+    dispatcher = InputDispatcher(backend)
+    events = [{"t": i, "action": "move", "dx": 1.5, "dy": -1} for i in range(4)]
+    assert dispatcher.apply_batch(events) == 1
+    assert backend.calls == [("move_rel", 6, -4)]
+
+
+def test_events_replay_in_timestamp_order_and_clicks_break_merging(backend):
+    dispatcher = InputDispatcher(backend)
+    events = [
+        {"t": 3, "action": "move", "dx": 5, "dy": 0},
+        {"t": 1, "action": "move", "dx": 1, "dy": 0},
+        {"t": 2, "action": "left_down"},
+        {"t": 2, "action": "left_up"},  # 同一时间戳保持原顺序
+        {"t": 4, "action": "scroll", "dy": 0.5},
+        {"t": 5, "action": "scroll", "dy": 0.5},
+    ]
+    assert dispatcher.apply_batch(events) == 5
+    assert backend.calls == [("move_rel", 1, 0), ("mouse_down", "left"), ("mouse_up", "left"),
+                             ("move_rel", 5, 0), ("scroll", 20)]
+
+
+def test_only_last_absolute_move_is_applied(backend):
+    dispatcher = InputDispatcher(backend)
+    events = [{"t": i, "action": "absolute_move", "x": i / 10, "y": 0.5} for i in range(5)]
+    events.append({"t": 9, "action": "absolute_move_down", "x": 2, "y": None})
+    assert dispatcher.apply_batch(events) == 2
+    assert backend.calls == [("move_to", 400, 250), ("move_to", 1000, 250), ("mouse_down", "left")]
+
+
+def test_fractional_moves_accumulate_across_batches(backend):
+    dispatcher = InputDispatcher(backend)
+    for _ in range(3):
+        dispatcher.apply_batch([{"action": "move", "dx": 0.4, "dy": 0}], sensitivity=1.0)
+    assert backend.calls == [("move_rel", 1, 0)]
+    dispatcher.apply({"action": "move", "dx": 2, "dy": 1, "sensitivity": 2})
+    assert backend.calls[-1] == ("move_rel", 4, 2)
+
+
+@pytest.mark.parametrize("events", [
+    {"action": "move"},
+    [{"action": "move", "t": None, "dx": 1}, "click"],
+    [{"action": "move", "t": "soon"}],
+    [{"action": "move", "dx": float("nan")}],
+    [{"action": "move", "dy": True}],
+    [{"action": "absolute_move", "x": [1]}],
+])
+def test_invalid_batches_are_rejected_before_anything_runs(backend, events):
+    dispatcher = InputDispatcher(backend)
+    with pytest.raises(ValueError):
+        dispatcher.apply_batch(events)
+    assert backend.calls == []
+
+
+def test_null_fields_fall_back_to_defaults(backend):
+    dispatcher = InputDispatcher(backend)
+    dispatcher.apply_batch([{"t": None, "action": "move", "dx": None, "dy": 3}, {"action": "task_view"},
+                            {"action": "unknown"}])
+    assert backend.calls == [("move_rel", 0, 3), ("hotkey", "win", "tab")]
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from linux_probe import LinuxProbe, PreadFile
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "pread"), reason="os.pread is POSIX-only")
+
+
+def _write(root, rel, text):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = str(tmp_path)
+    _write(root, 'proc/cpuinfo', "processor\t: 0\nmodel name\t: AMD Ryzen 7 5800X 8-Core Processor\n\n"
+                                 "processor\t: 1\nmodel name\t: AMD Ryzen 7 5800X 8-Core Processor\n")
+    _write(root, 'proc/meminfo', "MemTotal:       16384000 kB\nMemFree:         2048000 kB\n"
+                                 "MemAvailable:    4096000 kB\nCached:          1024000 kB\n")
+    _write(root, 'sys/class/drm/card0/device/vendor', "0x1002\n")
+    _write(root, 'sys/class/drm/card0/device/uevent', "DRIVER=amdgpu\nPCI_ID=1002:73BF\n")
+    _write(root, 'sys/class/drm/card0/device/gpu_busy_percent', "37\n")
+    _write(root, 'sys/class/drm/card0/device/hwmon/hwmon3/temp1_input', "54500\n")
+    _write(root, 'sys/class/drm/card1/device/vendor', "0x8086\n")
+    _write(root, 'sys/class/drm/card1/device/uevent', "DRIVER=i915\n")
+    _write(root, 'sys/class/drm/card1/device/gpu_busy_percent', "12\n")
+    _write(root, 'sys/class/drm/card0-HDMI-A-1/status', "connected\n")
+    return root
+
+
+def test_specs(root):
+    probe = LinuxProbe(root)
+    assert probe.cpu_model() == "AMD Ryzen 7 5800X 8-Core Processor"
+    assert probe.gpu_names() == ["AMD (amdgpu)", "Intel (i915)"]  # 显示接口目录不算显卡
+    assert probe.meminfo()["MemTotal"] == 16384000 * 1024
+    assert probe.meminfo(("MemFree",)) == {"MemFree": 2048000 * 1024}
+    probe.close()
+
+
+def test_arm_cpuinfo_falls_back_to_hardware(tmp_path):
+    _write(str(tmp_path), 'proc/cpuinfo', "processor\t: 0\nBogoMIPS\t: 108.00\n\nHardware\t: BCM2835\n")
+    assert LinuxProbe(str(tmp_path)).cpu_model() == "BCM2835"
+    assert LinuxProbe(str(tmp_path / "missing")).cpu_model() is None
+
+
+def test_samples_reread_open_files(root):
+    probe = LinuxProbe(root)
+    assert probe.ram_percent() == 75.0
+    assert probe.gpu_load() == (37.0, 54.5)
+    # 文件内容变了，常开的 fd 下次从偏移 0 读到新值
+    _write(root, 'proc/meminfo', "MemTotal:       16384000 kB\nMemFree:  1 kB\nMemAvailable:    8192000 kB\n")
+    _write(root, 'sys/class/drm/card1/device/gpu_busy_percent', "90\n")
+    assert probe.ram_percent() == 50.0
+    assert probe.gpu_load() == (90.0, 0)  # 取最忙的那块卡
+    probe.close()
+
+
+def test_unreadable_counters(root):
+    _write(root, 'sys/class/drm/card0/device/gpu_busy_percent', "garbage\n")
+    os.remove(os.path.join(root, 'sys/class/drm/card1/device/gpu_busy_percent'))
+    probe = LinuxProbe(root)
+    assert probe.gpu_load() == (0.0, 54.5)
+    os.remove(os.path.join(root, 'sys/class/drm/card0/device/hwmon/hwmon3/temp1_input'))
+    assert LinuxProbe(root).gpu_load() is None
+    assert LinuxProbe(str(root) + "/nothing").ram_percent() is None
+
+
+def test_pread_file(tmp_path):
+    path = _write(str(tmp_path), 'value', "42\n")
+    f = PreadFile(path)
+    assert f.read_int() == 42
+    _write(str(tmp_path), 'value', "7\n")
+    assert f.read() == "7\n"
+    f.close()
+    f.close()
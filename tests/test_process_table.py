@@ -0,0 +1,102 @@
+import contextlib
+from collections import namedtuple
+
+import psutil
+import pytest
+
+import process_table
+from process_table import ProcessTable
+
+io_t = namedtuple('pio', 'read_bytes write_bytes')
+
+
+class FakeProcess:
+    table = {}
+    created = 0
+
+    def __init__(self, pid):
+        if pid not in self.table:
+            raise psutil.NoSuchProcess(pid)
+        FakeProcess.created += 1
+        self.pid = pid
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+    def _row(self):
+        row = self.table.get(self.pid)
+        if row is None:
+            raise psutil.NoSuchProcess(self.pid)
+        return row
+
+    def name(self):
+        return self._row()["name"]
+
+    def memory_percent(self):
+        return self._row()["mem"]
+
+    def cpu_percent(self, interval=None):
+        return self._row()["cpu"]
+
+    def io_counters(self):
+        io = self._row()["io"]
+        if io is None:
+            raise psutil.AccessDenied(self.pid)
+        return io_t(io, 0)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    FakeProcess.table = {
+        1: {"name": "init", "mem": 0.1, "cpu": 0.0, "io": None},
+        10: {"name": "chrome", "mem": 12.0, "cpu": 40.0, "io": 1000},
+        11: {"name": "Chrome Helper", "mem": 3.0, "cpu": 80.0, "io": 0},
+        12: {"name": "python", "mem": 5.0, "cpu": 20.0, "io": 500},
+    }
+    FakeProcess.created = 0
+    monkeypatch.setattr(process_table.psutil, "pids", lambda: sorted(FakeProcess.table))
+    monkeypatch.setattr(process_table.psutil, "Process", FakeProcess)
+    monkeypatch.setattr(process_table.psutil, "cpu_count", lambda: 2)
+    now = [0.0]
+    t = ProcessTable(max_age=5.0, idle_after=30.0, clock=lambda: now[0])
+    t.now = now
+    return t
+
+
+def test_top_sorts_filters_and_scales_cpu(table):
+    assert [r["pid"] for r in table.top("memory", 2)] == [10, 12]
+    assert [r["cpu_percent"] for r in table.top("cpu", 3)] == [40.0, 20.0, 10.0]  # 按 2 核折算
+    assert [r["name"] for r in table.top("memory", 10, name="chrome")] == ["chrome", "Chrome Helper"]
+    with pytest.raises(ValueError):
+        table.top("disk")
+
+
+def test_results_are_cached_until_next_refresh(table):
+    first = table.top("memory", 2)
+    assert table.top("memory", 2) is first
+    table.now[0] = 10.0  # 超过 max_age，下次查询同步刷新
+    assert table.top("memory", 2) is not first
+
+
+def test_process_objects_are_reused_and_io_rate_uses_previous_refresh(table):
+    table.refresh()
+    assert FakeProcess.created == 4
+    FakeProcess.table[10]["io"] = 5000
+    del FakeProcess.table[12]
+    table.now[0] = 2.0
+    table.refresh()
+    assert FakeProcess.created == 4  # 没有为老进程重新建 Process
+    rows = {r["pid"]: r for r in table.rows}
+    assert 12 not in rows
+    assert rows[10]["io"] == 2000.0 and rows[1]["io"] == 0.0
+
+
+def test_background_refresh_only_while_someone_is_watching(table):
+    table.refresh_if_wanted()
+    assert table.version == 0
+    table.top()
+    table.refresh_if_wanted()
+    assert table.version == 2
+    table.now[0] = 100.0
+    table.refresh_if_wanted()
+    assert table.version == 2
@@ -0,0 +1,162 @@
+import asyncio
+
+from screen_hub import ScreenHub
+
+KEY, DELTA = b"K", b"D"
+
+
+class FakePipeline:
+    def __init__(self):
+        self.profiles = ()
+        self.forced = []
+        self.started = self.stopped = False
+        self.seq = 0
+
+    def start(self, on_packet, profiles):
+        self.started, self.on_packet, self.profiles = True, on_packet, tuple(profiles)
+
+    def stop(self):
+        self.stopped = True
+
+    def set_profiles(self, profiles):
+        self.profiles = tuple(profiles)
+
+    def force_keyframe(self, profile=None):
+        self.forced.append(profile)
+
+    def stats(self):
+        return {"profiles": [list(p) for p in self.profiles]}
+
+    def emit(self, profile, data):
+        self.seq += 1
+        self.on_packet(self.seq, 0.0, data, profile)
+
+
+HIGH, LOW = (80, 1920), (50, 1280)
+
+
+def _hub(pipelines):
+    def factory(source):
+        pipelines.append(FakePipeline())
+        return pipelines[-1]
+    return ScreenHub(factory, lambda source: (lambda data: data == KEY))
+
+
+async def _next(sub):
+    return await asyncio.wait_for(sub.next_packet(), 1)
+
+
+async def _flush():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_viewers_of_one_source_share_pipeline_and_bytes():
+    async def main():
+        pipelines = []
+        hub = _hub(pipelines)
+        a = hub.subscribe("screen", HIGH)
+        b = hub.subscribe("screen", HIGH)
+        other = hub.subscribe("other", HIGH)
+        assert len(pipelines) == 2 and a.channel is b.channel is not other.channel
+        assert pipelines[0].forced == [HIGH, HIGH]  # 每个新观看者都要一个关键帧
+        frame = bytes(KEY)
+        pipelines[0].emit(HIGH, frame)
+        await _flush()
+        assert (await _next(a)).data is (await _next(b)).data is frame
+
+        hub.unsubscribe(a)
+        assert not pipelines[0].stopped
+        hub.unsubscribe(b)
+        assert pipelines[0].stopped and list(hub.channels) == ["other"]
+
+    asyncio.run(main())
+
+
+def test_slow_viewer_skips_without_breaking_delta_chain():
+    async def main():
+        pipelines = []
+        hub = _hub(pipelines)
+        fast = hub.subscribe("screen", HIGH)
+        slow = hub.subscribe("screen", HIGH)
+        pipe = pipelines[0]
+        pipe.emit(HIGH, KEY)
+        await _flush()
+        assert (await _next(fast)).data == KEY
+        pipe.emit(HIGH, DELTA)  # slow 还没取走关键帧：这个增量接不上，保留槽位里的关键帧
+        await _flush()
+        assert (await _next(fast)).data == DELTA
+        assert (await _next(slow)).data == KEY
+        assert slow.needs_keyframe and slow.skipped == 1
+        pipe.emit(HIGH, DELTA)
+        await _flush()
+        assert slow._slot is None and fast._slot.data == DELTA  # slow 等关键帧，fast 照常收增量
+        pipe.emit(HIGH, KEY)
+        await _flush()
+        assert (await _next(slow)).data == KEY and not slow.needs_keyframe
+
+    asyncio.run(main())
+
+
+def test_forced_keyframes_are_rate_limited_per_profile():
+    async def main():
+        pipelines = []
+        hub = _hub(pipelines)
+        fast = hub.subscribe("screen", HIGH)
+        slow = hub.subscribe("screen", HIGH)
+        channel, pipe = fast.channel, pipelines[0]
+        channel.keyframe_gap = 0.2
+        pipe.forced.clear()
+        pipe.emit(HIGH, KEY)
+        await _flush()
+        await _next(fast)
+        for _ in range(50):
+            pipe.emit(HIGH, DELTA)
+            await _flush()
+            await _next(fast)
+        # 最近一次强制关键帧（slow 加入时）不到 keyframe_gap：合并成一次延后的请求
+        assert pipe.forced == [] and HIGH in channel._pending
+        await asyncio.sleep(0.3)
+        assert pipe.forced == [HIGH]
+        pipe.emit(HIGH, KEY)
+        await _flush()
+        assert not slow.needs_keyframe and HIGH not in channel._pending
+
+    asyncio.run(main())
+
+
+def test_switch_keeps_old_profile_until_new_keyframe():
+    async def main():
+        pipelines = []
+        hub = _hub(pipelines)
+        a = hub.subscribe("screen", HIGH)
+        b = hub.subscribe("screen", HIGH)
+        pipe = pipelines[0]
+        pipe.emit(HIGH, KEY)
+        await _flush()
+        await _next(a)
+        await _next(b)
+
+        b.switch(LOW)
+        assert pipe.profiles == (HIGH, LOW) and len(pipelines) == 1
+        pipe.emit(HIGH, DELTA)
+        pipe.emit(LOW, DELTA)  # 新档位还没出关键帧
+        await _flush()
+        assert (await _next(b)).profile == HIGH
+        pipe.emit(LOW, KEY)
+        await _flush()
+        packet = await _next(b)
+        assert (packet.profile, packet.data) == (LOW, KEY) and b.profile == LOW and b.pending is None
+        assert pipe.profiles == (HIGH, LOW)
+
+        a.switch(LOW)  # 这一档已经在编码：要一个关键帧才能接上
+        assert pipe.forced[-1] == LOW
+        pipe.emit(LOW, KEY)
+        await _flush()
+        assert a.profile == LOW and pipe.profiles == (LOW,)
+
+        b.switch(HIGH)
+        b.switch(LOW)  # 还没切过去就换回来：取消
+        assert b.pending is None and pipe.profiles == (LOW,)
+
+    asyncio.run(main())
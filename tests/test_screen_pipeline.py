@@ -0,0 +1,108 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from screen_pipeline import DropOldestQueue, ScreenPipeline, StageTimer, make_prepare
+
+
+def test_drop_oldest_queue_keeps_newest():
+    dropped = []
+    q = DropOldestQueue(2, on_drop=lambda: dropped.append(1))
+    for i in range(5):
+        q.put(i)
+    assert (q.get(), q.get(), q.dropped, len(dropped)) == (3, 4, 3, 3)
+    assert q.get(timeout=0.01) is None
+    q.close()
+    assert q.get() is None
+
+
+def test_stage_timer_snapshot():
+    timer = StageTimer()
+    timer.record("encode", 0.002)
+    timer.record("encode", 0.004)
+    timer.count("unchanged", 2)
+    snap = timer.snapshot()
+    assert snap["stages"]["encode"]["count"] == 2 and snap["stages"]["encode"]["avg_ms"] == 3.0
+    assert snap["stages"]["encode"]["max_ms"] == 4.0 and snap["counters"] == {"unchanged": 2}
+
+
+def test_prepare_downscales_and_drops_alpha():
+    img = np.zeros((100, 400, 4), dtype=np.uint8)
+    assert make_prepare(200)(img).shape == (50, 200, 3)
+    assert make_prepare(1920)(img).shape == (100, 400, 3)
+
+
+class Source:
+    """前 3 帧各不相同，之后画面静止"""
+
+    def __init__(self):
+        self.i = 0
+
+    def grab(self):
+        self.i += 1
+        return np.full((64, 256, 4), min(self.i, 3), dtype=np.uint8)
+
+    def close(self):
+        pass
+
+
+class Encoder:
+    stateful = True
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.forced = 0
+
+    def force_keyframe(self):
+        self.forced += 1
+
+    def encode(self, frame):
+        return (self.profile, frame.shape)
+
+
+def _collect(pipeline, profiles, until):
+    packets = []
+    done = threading.Event()
+
+    def on_packet(seq, captured, data, profile):
+        packets.append((seq, data, profile))
+        if until(packets):
+            done.set()
+
+    pipeline.start(on_packet, profiles)
+    assert done.wait(5)
+    return packets
+
+
+def test_pipeline_encodes_each_profile_and_skips_unchanged_frames():
+    pipeline = ScreenPipeline(Source, Encoder, fps=200, queue_size=8)
+    try:
+        packets = _collect(pipeline, [(80, 256), (50, 128)], lambda p: len(p) >= 6)
+        time.sleep(0.1)
+        assert len(packets) == 6  # 静止画面不再编码
+        assert {data for _, data, _ in packets} == {((80, 256), (64, 256, 3)), ((50, 128), (32, 128, 3))}
+        assert pipeline.timer.snapshot()["counters"]["unchanged"] > 0
+
+        # 换一组档位：画面静止也要给新档位出一帧，旧档位的编码器被丢掉
+        pipeline.set_profiles([(50, 128), (30, 64)])
+        deadline = time.monotonic() + 5
+        while not any(p == (30, 64) for _, _, p in packets) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert any(p == (30, 64) for _, _, p in packets)
+        time.sleep(0.05)
+        assert {p for (_, p) in pipeline._encoders} == {(50, 128), (30, 64)}
+        assert pipeline.stats()["profiles"] == [[50, 128], [30, 64]]
+
+        count = len(packets)
+        pipeline.force_keyframe((30, 64))
+        deadline = time.monotonic() + 5
+        while len(packets) == count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pipeline._encoders[(0, (30, 64))].forced == 1
+        assert pipeline._encoders[(0, (50, 128))].forced == 0
+    finally:
+        pipeline.stop()
@@ -0,0 +1,74 @@
+from screen_rate import LEVELS, RateController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tick(rate, clock, send_seconds, steps, dt=0.1):
+    changes = 0
+    for _ in range(steps):
+        clock.now += dt
+        rate.on_sent(send_seconds)
+        changes += rate.update()
+    return changes
+
+
+def test_congestion_lowers_quality_then_frame_rate():
+    clock = Clock()
+    rate = RateController(target_latency=0.1, clock=clock)
+    assert rate.profile() == LEVELS[0]
+    _tick(rate, clock, 0.5, 30)  # 3 秒持续拥塞，每 0.5 秒降一档
+    assert rate.level == len(LEVELS) - 1
+    assert rate.interval > rate.min_interval
+    assert rate.interval <= rate.max_interval
+
+
+def test_recovery_restores_frame_rate_before_quality():
+    clock = Clock()
+    rate = RateController(target_latency=0.1, clock=clock)
+    _tick(rate, clock, 0.5, 40)
+    _tick(rate, clock, 0.001, 10)  # 平滑后的延迟先降下来
+    slow_interval = rate.interval
+    _tick(rate, clock, 0.001, 30)
+    assert rate.interval < slow_interval and rate.level == len(LEVELS) - 1
+    _tick(rate, clock, 0.001, 200)
+    assert rate.interval == rate.min_interval and rate.level == 0
+
+
+def test_client_limits_cap_width_and_fps():
+    rate = RateController(max_width=1280, fps=30, clock=Clock())
+    assert rate.profile() == (88, 1280)
+    assert rate.min_interval == 1 / 30
+
+
+def test_ack_window_blocks_until_acked_or_lost():
+    clock = Clock()
+    rate = RateController(target_latency=0.1, lost_after=2.0, clock=clock)
+    rate.on_sent(0.0)
+    assert rate.can_send()  # 没见过 ack 的老客户端不受窗口限制
+    rate.on_ack()
+    rate.on_sent(0.0)
+    clock.now += 0.05
+    assert rate.can_send() and rate.inflight() == 1
+    clock.now += 0.2
+    assert not rate.can_send()
+    rate.on_ack()
+    assert rate.can_send() and abs(rate.latency - 0.05) < 0.01
+    rate.on_sent(0.0)
+    clock.now += 3.0  # ack 丢了：超过 lost_after 就放行
+    assert rate.can_send() and rate.inflight() == 0
+
+
+def test_stalled_link_is_detected_without_new_acks():
+    clock = Clock()
+    rate = RateController(target_latency=0.1, clock=clock)
+    rate.on_sent(0.0)
+    rate.on_ack()  # 延迟测量正常
+    rate.on_sent(0.0)
+    clock.now += 1.0  # 之后 ack 不再回来
+    assert rate.update() and rate.level == 1
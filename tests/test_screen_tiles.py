@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from screen_tiles import JpegEncoder, TileDecoder, TileEncoder, changed_grid, grid_to_rects, is_keyframe
+
+
+def _frame(h=256, w=320):
+    return np.full((h, w, 3), 128, dtype=np.uint8)
+
+
+def test_changed_grid_finds_single_pixel_change():
+    prev = _frame()
+    cur = prev.copy()
+    cur[130, 200] = (0, 0, 0)
+    grid = changed_grid(prev, cur, 64)
+    assert grid.shape == (4, 5)
+    assert [tuple(i) for i in np.argwhere(grid)] == [(2, 3)]
+
+
+def test_grid_to_rects_merges_runs_and_aligned_rows():
+    grid = np.array([[1, 1, 0, 0, 1],
+                     [1, 1, 0, 0, 0],
+                     [0, 0, 0, 1, 1]], dtype=bool)
+    rects = sorted(grid_to_rects(grid, 64, 300, 150))
+    # 最右一列被画面宽度截断，最后一行被画面高度截断
+    assert rects == [(0, 0, 128, 128), (192, 128, 108, 22), (256, 0, 44, 64)]
+
+
+def test_encoder_sends_keyframe_then_only_changed_tiles():
+    now = [0.0]
+    encoder = TileEncoder(tile=64, clock=lambda: now[0])
+    decoder = TileDecoder()
+    first = encoder.encode(_frame())
+    assert is_keyframe(first)
+    assert encoder.encode(_frame()) is None  # 画面没变
+
+    cur = _frame()
+    cur[10:20, 70:90] = 255
+    delta = encoder.encode(cur)
+    assert not is_keyframe(delta) and len(delta) < len(first)
+    decoder.apply(first)
+    canvas = decoder.apply(delta)
+    assert canvas[15, 80].min() > 200 and np.abs(canvas.astype(int) - cur).mean() < 2  # JPEG 有损
+
+    now[0] = 5.0  # 超过关键帧间隔
+    cur = cur.copy()
+    cur[0, 0] = 0
+    assert is_keyframe(encoder.encode(cur))
+    encoder.force_keyframe()
+    assert is_keyframe(encoder.encode(cur))
+
+
+def test_large_change_becomes_keyframe():
+    encoder = TileEncoder(tile=64, full_ratio=0.5, clock=lambda: 0.0)
+    encoder.encode(_frame())
+    cur = _frame()
+    cur[:200] = 0
+    assert is_keyframe(encoder.encode(cur))
+
+
+def test_jpeg_encoder_is_stateless():
+    data = JpegEncoder(quality=70).encode(_frame())
+    assert data[:2] == b"\xff\xd8" and not JpegEncoder.stateful and TileEncoder.stateful
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("av")
+
+import screen_video
+from screen_video import VideoEncoder, is_keyframe, parse_header
+
+MODES = [pytest.param(mode, marks=pytest.mark.skipif(not screen_video.available(mode), reason=f"no {mode}"))
+         for mode in screen_video.CODECS]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1 / 30
+        return self.now
+
+
+def frames(count, h=120, w=160):
+    rng = np.random.default_rng(1)
+    base = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    for i in range(count):
+        frame = base.copy()
+        frame[(i * 7) % h:(i * 7) % h + 10, :] = 255  # 一条移动的白条
+        yield frame
+
+
+def encode_all(encoder, images):
+    return [data for data in (encoder.encode(img) for img in images) if data is not None]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_first_packet_is_a_keyframe_then_deltas(mode):
+    encoder = VideoEncoder(mode, quality=60, keyframe_interval=10, clock=Clock())
+    packets = encode_all(encoder, frames(8))
+    assert len(packets) >= 6  # 零延迟配置：每一帧都立刻出包
+    flags = [is_keyframe(p) for p in packets]
+    assert flags[0] and not any(flags[1:])
+    keyframe, codec, seq, w, h, payload = parse_header(packets[0])
+    assert (keyframe, codec, seq, w, h) == (True, screen_video.CODECS[mode][0], 1, 160, 120)
+    assert [parse_header(p)[2] for p in packets] == list(range(1, len(packets) + 1))
+    if mode == 'h264':
+        assert payload.startswith(b"\x00\x00\x00\x01") or payload.startswith(b"\x00\x00\x01")  # Annex-B
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_force_keyframe(mode):
+    encoder = VideoEncoder(mode, quality=60, keyframe_interval=10, clock=Clock())
+    images = list(frames(10))
+    encode_all(encoder, images[:5])
+    encoder.force_keyframe()
+    packets = encode_all(encoder, images[5:])
+    assert is_keyframe(packets[0])
+    assert not any(is_keyframe(p) for p in packets[1:])
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_size_change_reopens_with_keyframe_and_even_dimensions(mode):
+    encoder = VideoEncoder(mode, quality=60, clock=Clock())
+    encode_all(encoder, frames(3))
+    packets = encode_all(encoder, frames(2, h=101, w=75))
+    keyframe, _, _, w, h, _ = parse_header(packets[0])
+    assert keyframe and (w, h) == (74, 100)  # yuv420p 要偶数宽高
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_stream_decodes(mode):
+    import av
+    encoder = VideoEncoder(mode, quality=80, clock=Clock())
+    decoder = av.CodecContext.create('h264' if mode == 'h264' else 'vp8', 'r')
+    decoded = []
+    for data in encode_all(encoder, frames(5)):
+        # 每条消息是完整的一帧，客户端可以直接整包送进解码器
+        decoded.extend(decoder.decode(av.Packet(parse_header(data)[5])))
+    assert len(decoded) == 5 and (decoded[0].width, decoded[0].height) == (160, 120)
+
+
+def test_unavailable_mode_and_bad_header():
+    with pytest.raises(RuntimeError):
+        VideoEncoder('mpeg2')
+    assert not is_keyframe(b"\xff\xd8jpeg")
+    with pytest.raises(ValueError):
+        parse_header(b"XX" + bytes(20))
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+import screen_server
+from screen_hub import ScreenHub
+
+MONITORS = [
+    {"left": -1920, "top": 0, "width": 3840, "height": 1080},  # 0：所有显示器拼起来
+    {"left": 0, "top": 0, "width": 1920, "height": 1080},
+    {"left": -1920, "top": 0, "width": 1920, "height": 1080},
+]
+
+
+def test_resolve_view_picks_monitor_and_clips_region():
+    assert screen_server.resolve_view(MONITORS, 2) == {"left": -1920, "top": 0, "width": 1920, "height": 1080}
+    assert screen_server.resolve_view(MONITORS, 9) == {"left": 0, "top": 0, "width": 1920, "height": 1080}
+    assert screen_server.resolve_view(MONITORS, 2, (1800, 1000, 400, 400)) == \
+        {"left": -120, "top": 1000, "width": 120, "height": 80}
+    assert screen_server.resolve_view(MONITORS[:1], 1)["width"] == 3840  # 只有一块整屏
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("10,20,300,200", (10, 20, 300, 200)),
+    ([-5, 0, 64, 64], (0, 0, 64, 64)),
+    ("1,2,3", None),
+    ("a,b,c,d", None),
+    ([0, 0, 8, 8], None),
+    (None, None),
+])
+def test_parse_region(value, expected):
+    assert screen_server.parse_region(value) == expected
+
+
+class FakePipeline:
+    profiles = ()
+
+    def __init__(self, source):
+        self.source = source
+        self.stopped = False
+
+    def start(self, on_packet, profiles):
+        self.profiles = tuple(profiles)
+
+    def set_profiles(self, profiles):
+        self.profiles = tuple(profiles)
+
+    def force_keyframe(self, profile=None):
+        pass
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_viewer_switches_view_on_the_same_connection(monkeypatch):
+    async def main():
+        pipelines = []
+        hub = ScreenHub(lambda source: pipelines.append(FakePipeline(source)) or pipelines[-1])
+        monkeypatch.setattr(screen_server, "HUB", hub)
+        viewer = screen_server.Viewer({"monitor": "2", "region": "0,0,800,600", "max_width": "1280"})
+        assert viewer.sub.channel.pipeline.source == screen_server.StreamSource('jpeg', 2, (0, 0, 800, 600))
+        assert viewer.sub.profile == (88, 1280)
+
+        viewer.set_view(1, None)
+        assert [p.source.monitor for p in pipelines] == [2, 1]
+        assert pipelines[0].stopped and list(hub.channels) == [screen_server.StreamSource('jpeg', 1, None)]
+        viewer.set_view(1, None)  # 没变就不重新订阅
+        assert len(pipelines) == 2
+        viewer.close()
+        assert pipelines[1].stopped and not hub.channels
+
+    asyncio.run(main())
+
+
+def test_params_are_clamped():
+    viewer_params = {"monitor": "99", "fps": "0", "max_width": "abc"}
+    assert screen_server._int_param(viewer_params, "monitor", 1, 0, 16) == 16
+    assert screen_server._int_param(viewer_params, "fps", 60, 1, 60) == 1
+    assert screen_server._int_param(viewer_params, "max_width", 1920, 320, 3840) == 1920
+
+
+def test_non_object_messages_are_ignored():
+    class Socket:
+        def __init__(self, messages):
+            self.messages = messages
+
+        async def __aiter__(self):
+            for message in self.messages:
+                yield message
+
+    class Viewer:
+        acks = 0
+
+        def on_ack(self):
+            self.acks += 1
+
+    viewer = Viewer()
+    messages = ["[]", "1", '"ack"', "null", "not json", b"\x00", '{"type": "ack"}']
+    asyncio.run(screen_server._serve_requests(Socket(messages), viewer))
+    assert viewer.acks == 1
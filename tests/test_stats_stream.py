@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from stats_stream import StatsHub, handle_stream
+
+
+def test_delta_contains_only_changed_fields_and_is_shared():
+    async def main():
+        hub = StatsHub({"cpu": 1, "ram": 2})
+        hub.bind(asyncio.get_running_loop())
+        base_version, base = hub.version, hub.snapshot
+        assert hub.encode().startswith(b"event: snapshot\nid: 0\n")
+        hub.publish({"cpu": 1, "ram": 3, "gpu": 4})
+        frame = hub.encode(base_version, base)
+        assert frame.startswith(b"event: delta\nid: 1\n")
+        assert json.loads(frame.split(b"data: ", 1)[1]) == {"ram": 3, "gpu": 4}
+        assert hub.encode(base_version, base) is frame  # 同一基准只序列化一次
+        hub.publish({"cpu": 1, "ram": 3, "gpu": 4})
+        assert hub.version == 1  # 数值没变不算新版本
+
+    asyncio.run(main())
+
+
+async def _open(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    return reader, writer, head
+
+
+async def _event(reader):
+    event = {}
+    for line in (await reader.readuntil(b"\n\n")).decode().splitlines():
+        key, _, value = line.partition(": ")
+        event[key] = value
+    return event["event"], json.loads(event["data"])
+
+
+def test_stream_pushes_snapshot_then_merged_deltas():
+    async def main():
+        hub = StatsHub({"cpu": 10, "ram": 20})
+        hub.bind(asyncio.get_running_loop())
+        server = await asyncio.start_server(
+            lambda r, w: handle_stream({"/stream": hub}, lambda code: code == "2222", r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            _, writer, head = await _open(port, "/stream?code=nope")
+            assert head.startswith(b"HTTP/1.1 401")
+            writer.close()
+            _, writer, head = await _open(port, "/other?code=2222")
+            assert head.startswith(b"HTTP/1.1 404")
+            writer.close()
+
+            reader, writer, head = await _open(port, "/stream?code=2222&interval=0.2")
+            assert b"text/event-stream" in head
+            assert await _event(reader) == ("snapshot", {"cpu": 10, "ram": 20})
+            # 限流窗口里的两次变化合并成一个 delta
+            hub.publish({"cpu": 11, "ram": 20})
+            hub.publish({"cpu": 12, "ram": 20})
+            assert await asyncio.wait_for(_event(reader), 5) == ("delta", {"cpu": 12})
+            assert hub.subscribers == 1
+            writer.close()
+
+    asyncio.run(main())
+
+
+def test_publish_threadsafe_before_bind_just_stores():
+    hub = StatsHub()
+    hub.publish_threadsafe({"cpu": 5})
+    assert hub.snapshot == {"cpu": 5} and hub.version == 0
@@ -0,0 +1,125 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+import transfers
+
+DATA = bytes(range(256)) * 40  # 10KB
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = flask.Flask(__name__)
+
+    @app.route("/ranged/<name>")
+    def ranged(name):
+        return transfers.send_ranged(str(tmp_path / name))
+
+    @app.route("/compressed/<name>/<encoding>")
+    def compressed(name, encoding):
+        return transfers.send_compressed(str(tmp_path / name), encoding)
+
+    @app.route("/zip")
+    def folder():
+        return transfers.stream_zip(str(tmp_path / "dir"), compress=bool(flask.request.args.get("compress")))
+
+    (tmp_path / "data.bin").write_bytes(DATA)
+    return app.test_client()
+
+
+def test_full_download_has_validators(client):
+    resp = client.get("/ranged/data.bin")
+    assert resp.status_code == 200 and resp.data == DATA
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.headers["ETag"].strip('"') and resp.headers["Last-Modified"]
+    assert "attachment" in resp.headers["Content-Disposition"]
+
+
+def test_range_resumes_from_offset(client):
+    resp = client.get("/ranged/data.bin", headers={"Range": "bytes=1000-"})
+    assert resp.status_code == 206 and resp.data == DATA[1000:]
+    assert resp.headers["Content-Range"] == f"bytes 1000-{len(DATA) - 1}/{len(DATA)}"
+    resp = client.get("/ranged/data.bin", headers={"Range": "bytes=-10"})
+    assert resp.status_code == 206 and resp.data == DATA[-10:]
+
+
+def test_range_past_the_end_is_416(client):
+    resp = client.get("/ranged/data.bin", headers={"Range": f"bytes={len(DATA)}-"})
+    assert resp.status_code == 416
+    assert resp.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+
+def test_if_range_only_resumes_the_same_file(client, tmp_path):
+    etag = client.get("/ranged/data.bin").headers["ETag"]
+    resp = client.get("/ranged/data.bin", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert resp.status_code == 206 and resp.data == DATA[100:]
+    # 文件变了（大小 / mtime 变了 ETag 就变）：不能接着拼，整份重发
+    (tmp_path / "data.bin").write_bytes(DATA + b"more")
+    resp = client.get("/ranged/data.bin", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert resp.status_code == 200 and resp.data == DATA + b"more"
+    assert client.get("/ranged/data.bin", headers={"If-None-Match": etag}).status_code == 200
+    new_etag = resp.headers["ETag"]
+    assert client.get("/ranged/data.bin", headers={"If-None-Match": new_etag}).status_code == 304
+
+
+def test_pick_encoding(monkeypatch):
+    monkeypatch.setattr(transfers, "zstandard", None)
+    assert transfers.pick_encoding("a.log", "auto", "gzip, zstd") == "gzip"
+    assert transfers.pick_encoding("a.log", "zstd", "gzip, zstd") is None  # 没装 zstandard
+    monkeypatch.setattr(transfers, "zstandard", object())
+    assert transfers.pick_encoding("a.log", "auto", "gzip;q=0.5, zstd") == "zstd"
+    assert transfers.pick_encoding("a.log", "auto", "gzip") == "gzip"
+    assert transfers.pick_encoding("a.log", "gzip", "zstd") is None  # 客户端不接受 gzip
+    assert transfers.pick_encoding("a.log", "auto", "identity") is None
+    assert transfers.pick_encoding("a.log", "brotli", "gzip, zstd") is None
+    assert transfers.pick_encoding("a.log", "", "gzip") is None
+    # 图片 / 压缩包本来就压过了
+    assert transfers.pick_encoding("a.jpg", "auto", "gzip") is None
+    assert transfers.pick_encoding("a.zip", "gzip", "gzip") is None
+    assert transfers.pick_encoding("notes.TXT", "gzip", "gzip") == "gzip"
+    assert transfers.pick_encoding("page.htm", "gzip", "gzip") == "gzip"  # 按 MIME 判断
+
+
+def test_gzip_stream(client, tmp_path):
+    text = b"line of log output\n" * 50000
+    (tmp_path / "big.log").write_bytes(text)
+    resp = client.get("/compressed/big.log/gzip")
+    assert resp.headers["Content-Encoding"] == "gzip" and resp.headers["Vary"] == "Accept-Encoding"
+    assert resp.headers["ETag"].endswith('-gzip"')
+    assert len(resp.data) < len(text) // 20
+    assert gzip.decompress(resp.data) == text
+
+
+def test_zstd_stream(client, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    text = b"line of log output\n" * 50000
+    (tmp_path / "big.log").write_bytes(text)
+    resp = client.get("/compressed/big.log/zstd")
+    assert resp.headers["Content-Encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(resp.data) == text
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_stream_zip_contains_the_whole_tree(client, tmp_path, compress):
+    root = tmp_path / "dir"
+    (root / "sub" / "deeper").mkdir(parents=True)
+    files = {
+        "a.txt": b"hello",
+        "sub/b.bin": DATA * 100,  # 1MB，跨好几个 CHUNK_SIZE
+        "sub/deeper/中文.txt": "内容".encode(),
+        "empty": b"",
+    }
+    for name, data in files.items():
+        (root / name).write_bytes(data)
+    resp = client.get("/zip?compress=1" if compress else "/zip")
+    assert resp.mimetype == "application/zip"
+    assert "dir.zip" in resp.headers["Content-Disposition"]
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == files
+        kinds = {info.compress_type for info in zf.infolist()}
+        assert kinds == {zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED}
@@ -0,0 +1,85 @@
+import pytest
+
+import wire_format
+from wire_format import FIELDS, decode, encode, encode_snapshot
+
+
+@pytest.mark.parametrize("n", [0, 1, 63, 64, -1, -64, -65, 127, 128, 300, -300, 2 ** 40, -(2 ** 40)])
+def test_zigzag_varint_round_trip(n):
+    out = bytearray()
+    wire_format._put_signed(out, n)
+    assert wire_format._get_signed(bytes(out), 0) == (n, len(out))
+
+
+def test_small_values_take_one_byte():
+    for n in (0, 1, -1, 63, -64):
+        out = bytearray()
+        wire_format._put_signed(out, n)
+        assert len(out) == 1
+    out = bytearray()
+    wire_format._put_varint(out, 300)
+    assert bytes(out) == b"\xac\x02"
+
+
+def test_round_trip_with_negative_deltas_and_gaps():
+    ts = [1700000000.0, 1700000001.0, 1700000001.5, 1700000000.9]  # 时间也可以倒退
+    columns = {
+        "cpu": [50.0, 12.3, 99.9, 0.0],
+        "ram": [None, 40.0, None, 41.2],
+        "gpu": [float("nan"), float("inf"), True, 7],
+        "net_up": ["bad", 1e6, -5.5, None],
+    }
+    got_ts, got = decode(encode(ts, columns))
+    assert got_ts == ts
+    assert got["cpu"] == [50.0, 12.3, 99.9, 0.0]
+    assert got["ram"] == [None, 40.0, None, 41.2]
+    assert got["gpu"] == [None, None, None, 7.0]  # NaN / inf / bool 都算缺失
+    assert got["net_up"] == [None, 1000000.0, -5.5, None]
+    assert got["disk"] == [None] * 4  # 没给的字段整列缺失
+    assert list(got) == list(FIELDS)
+
+
+def test_quantization_keeps_one_decimal():
+    _, got = decode(encode([0.0], {"cpu": [12.345], "ram": [12.35]}))
+    assert got["cpu"] == [12.3] and got["ram"] == [12.4]
+    assert wire_format._quantize(-0.04) == 0
+
+
+def test_bitmap_spans_several_bytes():
+    count = 20
+    values = [i if i % 3 else None for i in range(count)]
+    data = encode([float(i) for i in range(count)], {"cpu": values})
+    _, got = decode(data)
+    assert got["cpu"] == [None if v is None else float(v) for v in values]
+
+
+def test_layout_of_a_full_column():
+    data = encode([1.0, 2.0], {name: [1, 1] for name in FIELDS})
+    # magic, 版本, 样本数 2, 时间 1000 (varint 2 字节) 和差 1000 (2 字节)
+    assert data[:3] == b"SM\x01" and data[3] == 2
+    # 每个字段：标志 0 + 第一个值 10 + 差 0
+    assert data[8:] == b"\x00\x14\x00" * len(FIELDS)
+
+
+def test_snapshot_and_empty_payload():
+    ts, got = decode(encode_snapshot(12.5, {"cpu": 1.5, "gpu_temp": None}))
+    assert ts == [12.5] and got["cpu"] == [1.5] and got["gpu_temp"] == [None]
+    ts, got = decode(encode([], {}))
+    assert ts == [] and all(v == [] for v in got.values())
+
+
+def test_bad_magic_and_unknown_version_are_rejected():
+    data = bytearray(encode([1.0], {"cpu": [1]}))
+    with pytest.raises(ValueError):
+        decode(b"{}" + bytes(data[2:]))
+    data[2] = wire_format.VERSION + 1
+    with pytest.raises(ValueError, match="version"):
+        decode(bytes(data))
+
+
+def test_accept_negotiation():
+    assert wire_format.accepts(f"{wire_format.MIME}, application/json")
+    assert wire_format.accepts(f"text/html;q=0.5, {wire_format.MIME.upper()};q=1")
+    assert not wire_format.accepts("application/json")
+    assert not wire_format.accepts(None)
+    assert wire_format.content_type() == f"{wire_format.MIME}; v={wire_format.VERSION}"
@@ -0,0 +1,241 @@
+import asyncio
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from wsgi_server import WSGIServer
+
+FILE_DATA = bytes(range(256)) * 1024  # 256KB
+
+
+def make_app(path):
+    app = flask.Flask(__name__)
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return flask.request.get_data()
+
+    @app.route("/big")
+    def big():
+        # 没有 Content-Length、超过 first_chunk：交给 stream_workers 分块发
+        return flask.Response((b"x" * 1000 for _ in range(300)), mimetype="application/octet-stream")
+
+    @app.route("/file")
+    def file():
+        return flask.send_file(path, conditional=True)
+
+    @app.route("/empty")
+    def empty():
+        return "", 204
+
+    def raw(environ, start_response):
+        if environ['PATH_INFO'] == '/raw/boom':
+            raise RuntimeError("boom")
+
+        def broken():
+            yield b"y" * 100000
+            raise RuntimeError("disk gone")
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return broken()
+
+    def dispatch(environ, start_response):
+        if environ['PATH_INFO'].startswith('/raw/'):
+            return raw(environ, start_response)
+        return app(environ, start_response)
+
+    return dispatch
+
+
+async def read_response(reader, method="GET"):
+    """读一个完整响应：(状态码, 头, 响应体)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    code = int(lines[0].split(" ")[1])
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        if key:
+            headers[key.strip().lower()] = value.strip()
+    if method == "HEAD" or code in (204, 304) or code < 200:
+        return code, headers, b""
+    if headers.get("transfer-encoding") == "chunked":
+        parts = []
+        while True:
+            n = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            if n == 0:
+                await reader.readuntil(b"\r\n")
+                return code, headers, b"".join(parts)
+            parts.append(await reader.readexactly(n))
+            await reader.readexactly(2)
+    if "content-length" in headers:
+        return code, headers, await reader.readexactly(int(headers["content-length"]))
+    return code, headers, await reader.read()
+
+
+def run_server(tmp_path, test, **kwargs):
+    path = tmp_path / "data.bin"
+    path.write_bytes(FILE_DATA)
+    logs = []
+
+    async def main():
+        server = await WSGIServer(make_app(str(path)), '127.0.0.1', 0, log=logs.append, **kwargs).start()
+        try:
+            async def connect():
+                return await asyncio.open_connection('127.0.0.1', server.port)
+            await asyncio.wait_for(test(connect), 10)
+        finally:
+            server.server.close()
+            await server.server.wait_closed()
+            server.workers.shutdown()
+            server.streamers.shutdown()
+
+    asyncio.run(main())
+    return logs
+
+
+def test_keep_alive_serves_several_requests_on_one_connection(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello")
+        code, headers, body = await read_response(reader)
+        assert (code, body, headers["connection"]) == (200, b"hello", "keep-alive")
+        writer.write(b"GET /empty HTTP/1.1\r\nHost: x\r\n\r\n")
+        code, headers, _ = await read_response(reader)
+        assert code == 204 and "content-length" not in headers
+        writer.write(b"HEAD /file HTTP/1.1\r\nHost: x\r\n\r\n")
+        code, headers, _ = await read_response(reader, "HEAD")
+        assert code == 200 and headers["content-length"] == str(len(FILE_DATA))
+        writer.write(b"GET /empty HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+        code, headers, _ = await read_response(reader)
+        assert headers["connection"] == "close"
+        assert await reader.read() == b""  # 服务端关闭了连接
+        writer.close()
+
+    run_server(tmp_path, test)
+
+
+def test_http10_closes_unless_keep_alive(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"GET /big HTTP/1.0\r\n\r\n")
+        code, headers, body = await read_response(reader)
+        # HTTP/1.0 没有分块编码：不带长度，发完就断开
+        assert code == 200 and "transfer-encoding" not in headers and headers["connection"] == "close"
+        assert body == b"x" * 300000
+        writer.close()
+
+    run_server(tmp_path, test)
+
+
+def test_chunked_request_body_and_100_continue(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\nExpect: 100-continue\r\n\r\n")
+        assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 100 Continue")
+        writer.write(b"5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\n\r\n")
+        code, _, body = await read_response(reader)
+        assert (code, body) == (200, b"hello world")
+        writer.close()
+
+    run_server(tmp_path, test)
+
+
+@pytest.mark.parametrize("body", [
+    b"zz\r\nhello\r\n0\r\n\r\n",      # 长度不是十六进制
+    b"-5\r\nhello\r\n0\r\n\r\n",      # 负数
+    b"3\r\nhello\r\n0\r\n\r\n",       # 块数据比声明的长
+])
+def test_bad_chunk_framing_is_400(tmp_path, body):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n" + body)
+        code, headers, _ = await read_response(reader)
+        assert code == 400 and headers["connection"] == "close"
+        writer.close()
+
+    run_server(tmp_path, test)
+
+
+def test_bad_request_line_and_content_length_are_400(tmp_path):
+    async def test(connect):
+        for request in (b"NONSENSE\r\n\r\n", b"POST /echo HTTP/1.1\r\nContent-Length: lots\r\n\r\n"):
+            reader, writer = await connect()
+            writer.write(request)
+            code, _, _ = await read_response(reader)
+            assert code == 400
+            writer.close()
+
+    run_server(tmp_path, test)
+
+
+def test_oversized_body_is_413(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 2048\r\n\r\n")
+        code, _, _ = await read_response(reader)
+        assert code == 413
+        writer.close()
+        reader, writer = await connect()
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n800\r\n")
+        code, _, _ = await read_response(reader)
+        assert code == 413
+        writer.close()
+
+    run_server(tmp_path, test, max_body=1024)
+
+
+def test_send_file_full_range_and_304(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"GET /file HTTP/1.1\r\nHost: x\r\n\r\n")
+        code, headers, body = await read_response(reader)
+        assert code == 200 and body == FILE_DATA
+        writer.write(b"GET /file HTTP/1.1\r\nHost: x\r\nRange: bytes=1000-1999\r\n\r\n")
+        code, headers, body = await read_response(reader)
+        assert code == 206 and body == FILE_DATA[1000:2000]
+        writer.write(b"GET /file HTTP/1.1\r\nHost: x\r\nRange: bytes=-100\r\n\r\n")
+        code, _, body = await read_response(reader)
+        assert code == 206 and body == FILE_DATA[-100:]
+        writer.write(f"GET /file HTTP/1.1\r\nHost: x\r\nIf-None-Match: {headers['etag']}\r\n\r\n".encode())
+        code, _, body = await read_response(reader)
+        assert code == 304 and body == b""
+        # 304 之后连接还能接着用
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 2\r\n\r\nok")
+        assert (await read_response(reader))[2] == b"ok"
+        writer.close()
+
+    run_server(tmp_path, test)
+
+
+def test_streamed_response_is_chunked(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"GET /big HTTP/1.1\r\nHost: x\r\n\r\n")
+        code, headers, body = await read_response(reader)
+        assert code == 200 and headers["transfer-encoding"] == "chunked"
+        assert body == b"x" * 300000
+        writer.write(b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 2\r\n\r\nok")
+        assert (await read_response(reader))[2] == b"ok"
+        writer.close()
+
+    run_server(tmp_path, test)
+
+
+def test_app_errors_are_logged(tmp_path):
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"GET /raw/boom HTTP/1.1\r\nHost: x\r\n\r\n")
+        code, _, _ = await read_response(reader)
+        assert code == 500
+        writer.close()
+        # 响应头已经发出去之后出错：只能断开，分块编码没有结束标记
+        reader, writer = await connect()
+        writer.write(b"GET /raw/broken HTTP/1.1\r\nHost: x\r\n\r\n")
+        with pytest.raises(asyncio.IncompleteReadError):
+            await read_response(reader)
+        writer.close()
+
+    logs = run_server(tmp_path, test, first_chunk=1024)
+    assert any("/raw/boom" in line and "boom" in line for line in logs)
+    assert any("/raw/broken" in line and "disk gone" in line for line in logs)
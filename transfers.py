@@ -0,0 +1,161 @@
+"""文件传输：断点续传、按需压缩、文件夹流式打包
+
+- send_ranged：Range / If-Range 断点续传，ETag 由 大小 + mtime 生成，
+  WSGI 服务器提供 wsgi.file_wrapper 时自动走零拷贝 sendfile
+- send_compressed：文本类文件边读边压（gzip，装了 zstandard 时支持 zstd），
+  压缩流没法按字节续传，所以带 Range 的请求永远走 send_ranged
+- stream_zip：文件夹边遍历边写 zip，不落临时文件
+"""
+import mimetypes
+import os
+import zipfile
+import zlib
+from urllib.parse import quote
+
+from flask import Response, send_file
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/xml', 'application/javascript', 'application/x-sh',
+    'application/sql', 'image/svg+xml',
+}
+COMPRESSIBLE_EXTS = {
+    '.log', '.txt', '.csv', '.tsv', '.json', '.xml', '.md', '.ini', '.cfg', '.conf',
+    '.yaml', '.yml', '.py', '.js', '.css', '.html', '.sql', '.dart', '.bat', '.ps1',
+}
+
+
+def file_etag(st):
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _disposition(filename):
+    # 中文文件名走 RFC 5987 的 filename* 写法
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def is_compressible(path):
+    if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTS:
+        return True
+    mime, _ = mimetypes.guess_type(path)
+    return bool(mime) and (mime.startswith('text/') or mime in COMPRESSIBLE_TYPES)
+
+
+def pick_encoding(path, requested, accept_encoding):
+    """根据 ?compress= 与 Accept-Encoding 选压缩算法，不压缩时返回 None
+
+    requested: gzip / zstd / auto（auto 优先 zstd，其次 gzip）；为空表示不压缩。
+    """
+    if not requested or not is_compressible(path):
+        return None
+    accepted = {e.split(';')[0].strip().lower() for e in accept_encoding.split(',')}
+    zstd_ok = zstandard is not None and 'zstd' in accepted
+    if requested == 'zstd':
+        return 'zstd' if zstd_ok else None
+    if requested == 'gzip':
+        return 'gzip' if 'gzip' in accepted else None
+    if requested == 'auto':
+        if zstd_ok:
+            return 'zstd'
+        return 'gzip' if 'gzip' in accepted else None
+    return None
+
+
+def send_ranged(path):
+    st = os.stat(path)
+    return send_file(
+        path,
+        as_attachment=True,
+        conditional=True,
+        etag=file_etag(st),
+        last_modified=st.st_mtime,
+    )
+
+
+def send_compressed(path, encoding):
+    f = open(path, 'rb')
+
+    def generate():
+        if encoding == 'zstd':
+            comp = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            comp = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip 头
+        with f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out = comp.compress(chunk)
+                if out:
+                    yield out
+            yield comp.flush()
+
+    mime = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return Response(generate(), mimetype=mime, headers={
+        'Content-Encoding': encoding,
+        'Content-Disposition': _disposition(os.path.basename(path)),
+        'Vary': 'Accept-Encoding',
+        'ETag': f'"{file_etag(os.fstat(f.fileno()))}-{encoding}"',
+    })
+
+
+class _ZipSink:
+    """zipfile 的输出端：不可 seek，只攒字节，由生成器定期取走"""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+def stream_zip(folder, compress=False):
+    """把整个文件夹流式打包成 zip，读不了的文件直接跳过"""
+    folder = os.path.abspath(folder)
+    method = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+
+    def generate():
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, 'w', compression=method, allowZip64=True) as zf:
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    full = os.path.join(root, name)
+                    try:
+                        info = zipfile.ZipInfo.from_file(full, os.path.relpath(full, folder))
+                        info.compress_type = method
+                        src = open(full, 'rb')
+                    except (OSError, ValueError):
+                        continue
+                    with src, zf.open(info, 'w', force_zip64=True) as dst:
+                        while True:
+                            chunk = src.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            dst.write(chunk)
+                            if sink.size >= CHUNK_SIZE:
+                                yield sink.drain()
+                    if sink.size:
+                        yield sink.drain()
+        yield sink.drain()
+
+    name = os.path.basename(folder.rstrip('\\/')) or 'folder'
+    return Response(generate(), mimetype='application/zip',
+                    headers={'Content-Disposition': _disposition(f"{name}.zip")})
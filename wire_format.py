@@ -0,0 +1,145 @@
+"""紧凑的状态数据格式：列式 + 差分 + varint（/status 按 Accept 协商启用）
+
+    magic 'SM' | 版本(1) | 样本数(varint) | 时间列 | 每个字段一列（顺序见 FIELDS）
+
+  - 时间列：第一个是 Unix 毫秒，之后是和前一个的差（zigzag varint），每秒一个样本只要两个字节
+  - 数值列：先一个标志字节（0 = 全部有值；1 = 后面跟一个位图，第 i 位为 1 表示第 i 个样本有值），
+    然后是有值样本按 SCALE 量化后的整数，同样第一个存原值、之后存差
+  - 字段顺序和精度由版本号决定，加字段就升版本；客户端看到不认识的版本退回 JSON
+"""
+import math
+
+MIME = "application/vnd.server-monitor.stats"
+MAGIC = b'SM'
+VERSION = 1
+
+# 版本 1 的字段顺序
+FIELDS = ("cpu", "ram", "disk", "gpu", "gpu_temp", "net_up", "net_down")
+# 量化精度：和 /status 的 JSON 一样保留一位小数
+SCALE = 10
+
+
+def accepts(accept_header):
+    """客户端的 Accept 里有没有本格式（忽略参数）"""
+    return any(part.split(';', 1)[0].strip().lower() == MIME for part in (accept_header or '').split(','))
+
+
+def content_type():
+    return f"{MIME}; v={VERSION}"
+
+
+# ---------- varint ----------
+
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _put_signed(out, n):
+    # zigzag：小的负数也只占一个字节
+    _put_varint(out, (n << 1) if n >= 0 else ((-n << 1) - 1))
+
+
+def _get_varint(data, pos):
+    shift = result = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _get_signed(data, pos):
+    n, pos = _get_varint(data, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+
+def _put_column(out, values):
+    """整数列：第一个存原值，之后存差"""
+    prev = 0
+    for v in values:
+        _put_signed(out, v - prev)
+        prev = v
+
+
+def _get_column(data, pos, count):
+    values, prev = [], 0
+    for _ in range(count):
+        delta, pos = _get_signed(data, pos)
+        prev += delta
+        values.append(prev)
+    return values, pos
+
+
+def _quantize(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) or math.isinf(value) else round(value * SCALE)
+
+
+# ---------- 编码 / 解码 ----------
+
+def encode(ts, columns):
+    """ts：秒（float）列表；columns：{字段: 数值列表}（None / NaN 表示缺失，没给的字段整列缺失）"""
+    count = len(ts)
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _put_varint(out, count)
+    _put_column(out, [round(t * 1000) for t in ts])
+    for name in FIELDS:
+        raw = columns.get(name)
+        values = [_quantize(v) for v in raw] if raw is not None else [None] * count
+        present = [v for v in values if v is not None]
+        if len(present) == count:
+            out.append(0)
+        else:
+            out.append(1)
+            bitmap = bytearray((count + 7) // 8)
+            for i, v in enumerate(values):
+                if v is not None:
+                    bitmap[i >> 3] |= 1 << (i & 7)
+            out += bitmap
+        _put_column(out, present)
+    return bytes(out)
+
+
+def encode_snapshot(t, snapshot):
+    """单个样本（/status 当前值）"""
+    return encode([t], {name: [snapshot.get(name)] for name in FIELDS})
+
+
+def encode_history(result):
+    """History.query() 的结果（列式 JSON 同一份数据）"""
+    return encode(result["t"], result["metrics"])
+
+
+def decode(data):
+    """返回 (ts, {字段: 数值列表})，缺失为 None（测试和调试用，客户端照着实现）"""
+    if data[:2] != MAGIC:
+        raise ValueError("not a stats payload")
+    if data[2] != VERSION:
+        raise ValueError(f"unsupported stats version {data[2]}")
+    count, pos = _get_varint(data, 3)
+    millis, pos = _get_column(data, pos, count)
+    columns = {}
+    for name in FIELDS:
+        flag = data[pos]
+        pos += 1
+        if flag:
+            bitmap = data[pos:pos + (count + 7) // 8]
+            pos += len(bitmap)
+            mask = [bool(bitmap[i >> 3] >> (i & 7) & 1) for i in range(count)]
+        else:
+            mask = [True] * count
+        values, pos = _get_column(data, pos, sum(mask))
+        it = iter(values)
+        columns[name] = [next(it) / SCALE if m else None for m in mask]
+    return [m / 1000 for m in millis], columns
@@ -0,0 +1,341 @@
+"""HTTP 服务：asyncio 前端 + 有界线程池跑 Flask（WSGI）
+
+  - 连接的收发、HTTP/1.1 keep-alive、请求体读取都在一个 asyncio 事件循环里，空闲连接不占线程
+  - 路由函数（Flask 视图）在固定大小的 workers 线程池里执行，并发再高也只有这么多线程
+  - 响应体超过 first_chunk 还没结束的（下载、zip、流式目录）交给单独的 stream_workers 池继续读；
+    写 socket 时等 drain，慢客户端不会把文件读进内存
+  - environ['wsgi.file_wrapper'] 是本模块的 FileWrapper：send_file 的响应（包括 Range）
+    直接在事件循环里 loop.sendfile，不经过 stream_workers
+事件循环可以和 SSE 状态流、投屏引擎共用（见 main_server.serve_async）。
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+
+_NO_BODY = (204, 304)
+
+
+class _Closed(Exception):
+    """客户端已经断开"""
+
+
+class FileWrapper:
+    """wsgi.file_wrapper（PEP 3333）：服务器认得它就用 sendfile 发送，否则照常按块迭代"""
+
+    def __init__(self, file, block_size=64 * 1024):
+        self.file = file
+        self.block_size = block_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self.file.read(self.block_size)
+        if data:
+            return data
+        raise StopIteration
+
+    # werkzeug 处理 Range 时靠这几个方法跳到起始位置
+    def seekable(self):
+        return self.file.seekable()
+
+    def seek(self, *args):
+        self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _file_source(result):
+    """响应体整个来自一个文件时返回 (文件, 起始偏移)，否则 None"""
+    if isinstance(result, FileWrapper):
+        return result.file, result.file.tell()
+    # Range 请求：werkzeug 在外面再包一层 _RangeWrapper，还没开始迭代时 start_byte 就是偏移
+    inner = getattr(result, 'iterable', None)
+    if isinstance(inner, FileWrapper) and getattr(result, 'read_length', None) == 0:
+        return inner.file, result.start_byte
+    return None
+
+
+class WSGIServer:
+    def __init__(self, app, host='0.0.0.0', port=5000, workers=8, stream_workers=16,
+                 keepalive_timeout=15.0, max_body=64 * 1024 * 1024, first_chunk=64 * 1024, log=print):
+        self.app = app
+        self.log = log
+        self.host = host
+        self.port = port
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body = max_body
+        self.first_chunk = first_chunk
+        self.workers = ThreadPoolExecutor(workers, thread_name_prefix="http-worker")
+        self.streamers = ThreadPoolExecutor(stream_workers, thread_name_prefix="http-stream")
+        self.loop = None
+        self.server = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=64 * 1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    # ---------- 请求 ----------
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    return  # 客户端关闭或 keep-alive 超时
+                request = self._parse_head(head, writer)
+                if request is None:
+                    return
+                environ, version, headers = request
+                body = await self._read_body(reader, writer, headers, version)
+                if body is None:
+                    return
+                environ['wsgi.input'] = io.BytesIO(body)
+                environ['CONTENT_LENGTH'] = str(len(body))
+                if not await self._respond(writer, environ, version, headers):
+                    return
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError, _Closed):
+            pass
+        finally:
+            writer.close()
+
+    def _parse_head(self, head, writer):
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            self._error(writer, 400)
+            return None
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            if key:
+                key = key.strip().lower()
+                value = value.strip()
+                headers[key] = f"{headers[key]},{value}" if key in headers else value
+
+        path, _, query = target.partition("?")
+        sockname = writer.get_extra_info('sockname') or (self.host, self.port)
+        peername = writer.get_extra_info('peername') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': method.upper(),
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': str(sockname[0]),
+            'SERVER_PORT': str(sockname[1]),
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': str(peername[0]),
+            'REMOTE_PORT': str(peername[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.input_terminated': True,
+            'wsgi.file_wrapper': FileWrapper,
+        }
+        for key, value in headers.items():
+            if key == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            elif key != 'content-length':
+                environ['HTTP_' + key.upper().replace('-', '_')] = value
+        return environ, version, headers
+
+    async def _read_body(self, reader, writer, headers, version):
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(f"{version} 100 Continue\r\n\r\n".encode('latin-1'))
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            parts, size = [], 0
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                try:
+                    n = int(line.split(b";", 1)[0], 16)
+                except ValueError:
+                    n = -1
+                if n < 0:
+                    self._error(writer, 400)  # 分块长度不是十六进制数
+                    return None
+                size += n
+                if size > self.max_body:
+                    self._error(writer, 413)
+                    return None
+                if n == 0:
+                    await reader.readuntil(b"\r\n")  # 不支持 trailer，直接跳过空行
+                    return b"".join(parts)
+                parts.append(await reader.readexactly(n))
+                if await reader.readexactly(2) != b"\r\n":
+                    self._error(writer, 400)  # 块数据比声明的长度长
+                    return None
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._error(writer, 400)
+            return None
+        if length > self.max_body:
+            self._error(writer, 413)
+            return None
+        return await reader.readexactly(length) if length else b""
+
+    def _error(self, writer, code):
+        status = HTTPStatus(code)
+        body = status.phrase.encode('latin-1')
+        writer.write(f"HTTP/1.1 {code} {status.phrase}\r\nContent-Type: text/plain\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body)
+
+    # ---------- 响应 ----------
+
+    def _call_app(self, environ):
+        """在 workers 线程里执行：跑视图函数，先读出最多 first_chunk 字节的响应体"""
+        state = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            state['status'], state['headers'] = status, response_headers
+            return lambda data: state.setdefault('written', []).append(data)
+
+        result = self.app(environ, start_response)
+        source = _file_source(result)
+        length = next((v for k, v in state.get('headers', ()) if k.lower() == 'content-length'), None)
+        if source is not None and length is not None and not state.get('written'):
+            # 文件响应不在线程里读，交给事件循环 sendfile，调用方负责 close
+            return state['status'], state['headers'], [], None, result, (*source, int(length))
+        chunks, size, iterator = list(state.pop('written', [])), 0, iter(result)
+        try:
+            for chunk in iterator:
+                if chunk:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.first_chunk:
+                        # 剩下的交给 stream_workers，调用方负责 close
+                        return state['status'], state['headers'], chunks, iterator, result, None
+        except BaseException:
+            getattr(result, 'close', lambda: None)()
+            raise
+        getattr(result, 'close', lambda: None)()
+        return state['status'], state['headers'], chunks, None, None, None
+
+    async def _respond(self, writer, environ, version, headers):
+        """返回 True 表示连接可以继续复用"""
+        method = environ['REQUEST_METHOD']
+        try:
+            status, response_headers, chunks, rest, result, sendfile = await self.loop.run_in_executor(
+                self.workers, self._call_app, environ)
+        except Exception as e:
+            self.log(f"[❌] HTTP {method} {environ['PATH_INFO']} 处理失败: {e!r}")
+            self._error(writer, 500)
+            return False
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = (version == 'HTTP/1.1' and connection != 'close') or \
+                     (version == 'HTTP/1.0' and connection == 'keep-alive')
+        code = int(status.split(" ", 1)[0])
+        has_body = method != 'HEAD' and code not in _NO_BODY and code >= 200
+        names = {name.lower() for name, _ in response_headers}
+        chunked = False
+        if has_body and 'content-length' not in names:
+            if rest is None:
+                size = sum(len(c) for c in chunks)
+                response_headers = list(response_headers) + [('Content-Length', str(size))]
+            elif version == 'HTTP/1.1':
+                chunked = True
+                response_headers = list(response_headers) + [('Transfer-Encoding', 'chunked')]
+            else:
+                keep_alive = False
+        response_headers = [(k, v) for k, v in response_headers if k.lower() != 'connection']
+        response_headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+
+        head = f"HTTP/1.1 {status}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in response_headers) + "\r\n"
+        writer.write(head.encode('latin-1'))
+        if sendfile is not None:
+            try:
+                if has_body:
+                    await self._sendfile(writer, *sendfile)
+                else:
+                    await writer.drain()
+            finally:
+                result.close()
+            return keep_alive
+        if has_body:
+            self._write_body(writer, chunks, chunked)
+        await writer.drain()
+
+        if rest is not None:
+            try:
+                if has_body:
+                    await self.loop.run_in_executor(self.streamers, self._pump, writer, rest, chunked)
+            except (ConnectionError, _Closed):
+                raise
+            except Exception as e:
+                # 响应头已经发出去了，没法再回 500，只能断开让客户端知道不完整
+                self.log(f"[⚠️] HTTP {method} {environ['PATH_INFO']} 响应中断: {e!r}")
+                return False
+            finally:
+                getattr(result, 'close', lambda: None)()
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        return keep_alive
+
+    @staticmethod
+    def _write_body(writer, chunks, chunked):
+        data = b"".join(chunks)
+        if not data:
+            return
+        if chunked:
+            writer.write(b"%x\r\n" % len(data) + data + b"\r\n")
+        else:
+            writer.write(data)
+
+    async def _sendfile(self, writer, file, offset, count):
+        await writer.drain()
+        if writer.is_closing():
+            raise _Closed()
+        # 不支持零拷贝的平台 / 文件对象上 asyncio 自己退回普通读写
+        await self.loop.sendfile(writer.transport, file, offset, count)
+
+    def _pump(self, writer, iterator, chunked, batch=256 * 1024):
+        """在 stream_workers 线程里执行：攒够一批（send_file 每块只有 8KB）交给事件循环写、等 drain，再读下一批"""
+        parts, size = [], 0
+        for chunk in iterator:
+            if chunk:
+                parts.append(chunk)
+                size += len(chunk)
+                if size >= batch:
+                    self._hand_over(writer, parts, chunked)
+                    parts, size = [], 0
+        if parts:
+            self._hand_over(writer, parts, chunked)
+
+    def _hand_over(self, writer, parts, chunked):
+        asyncio.run_coroutine_threadsafe(self._send(writer, b"".join(parts), chunked), self.loop).result()
+
+    @classmethod
+    async def _send(cls, writer, chunk, chunked):
+        if writer.is_closing():
+            raise _Closed()
+        cls._write_body(writer, [chunk], chunked)
+        await writer.drain()
+
+
+def run(app, host='0.0.0.0', port=5000, **kwargs):
+    """独立线程入口：在该线程里跑一个事件循环"""
+    asyncio.run(WSGIServer(app, host, port, **kwargs).serve())